@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import sys
@@ -9,34 +10,43 @@ from api.llm_agent import router as llm_agent_router
 from api.service_management import router as service_management_router
 from api.config_management import router as config_management_router
 from api.tool_catalog import router as tool_catalog_router
-from api.deps import app_state
+from api.deps import app_state, set_components, FastJSONResponse
 from plugins.json_mcp import MCPConfig, MCPConfigAPI
 from core.registry import ServiceRegistry
 from core.orchestrator import MCPOrchestrator
+from config.config import load_app_config
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     handlers=[logging.StreamHandler(sys.stdout), logging.FileHandler("mcp_service.log")])
 logger = logging.getLogger(__name__)
 
+# Prefer uvloop when available; uvicorn's "auto" loop/http settings already pick uvloop and httptools,
+# this also covers scripts that import the app and drive it with a plain asyncio loop.
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 async def lifespan(app: FastAPI):
     logger.info("Application startup: Initializing components...")
     config_dir = os.path.dirname(__file__)
     mcp_config_handler = MCPConfig(os.path.join(config_dir, "mcp.json"))
     config = mcp_config_handler.load_config()
-    config_api = MCPConfigAPI(os.path.join(config_dir, "mcp.json"))
-    app_state["config_api"] = config_api
+    # Share the handler and the parsed config so mcp.json is not read again
+    config_api = MCPConfigAPI(mcp_config=mcp_config_handler, loaded_config=config)
     registry = ServiceRegistry()
-    orchestrator = MCPOrchestrator(config=config, registry=registry)
+    # The orchestrator also needs the environment settings (llm_config, react_*), mcp.json keys take precedence
+    orchestrator = MCPOrchestrator(config={**load_app_config(), **config}, registry=registry)
     await orchestrator.setup()
     await orchestrator.start_monitoring()
     logger.info("Registering services from mcp.json...")
     register_result = await config_api.register_services(orchestrator)
     if register_result.get("status") == "success":
-        logger.info(f"Services registered: {register_result.get('message')}")
+        logger.info("Services registered: %s", register_result.get('message'))
     else:
-        logger.error(f"Service registration failed: {register_result.get('message')}")
-    app_state["orchestrator"] = orchestrator
-    app_state["registry"] = registry
+        logger.error("Service registration failed: %s", register_result.get('message'))
+    set_components(orchestrator=orchestrator, registry=registry, config_api=config_api)
     app_state["mcp_config"] = mcp_config_handler
     logger.info("Components initialized and background tasks started.")
     yield
@@ -44,10 +54,11 @@ async def lifespan(app: FastAPI):
     orch = app_state.get("orchestrator")
     if orch:
         await orch.cleanup()
+    set_components()
     app_state.clear()
     logger.info("Application shutdown complete.")
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -1,26 +1,44 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from core.orchestrator import MCPOrchestrator
 from core.registry import ServiceRegistry
 from plugins.json_mcp import MCPConfigAPI
 from fastapi import HTTPException
 
+try:
+    import orjson  # noqa: F401  ORJSONResponse needs it at render time
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as FastJSONResponse
+
 # 全局应用状态
 app_state: Dict[str, Any] = {}
 
+# 依赖提供者直接读取的组件引用，由lifespan在初始化完成后设置一次
+_orchestrator: Optional[MCPOrchestrator] = None
+_registry: Optional[ServiceRegistry] = None
+_config_api: Optional[MCPConfigAPI] = None
+
+def set_components(orchestrator: Optional[MCPOrchestrator] = None,
+                   registry: Optional[ServiceRegistry] = None,
+                   config_api: Optional[MCPConfigAPI] = None) -> None:
+    """发布已初始化的组件（同时写入app_state），传入None即清除"""
+    global _orchestrator, _registry, _config_api
+    _orchestrator, _registry, _config_api = orchestrator, registry, config_api
+    app_state["orchestrator"] = orchestrator
+    app_state["registry"] = registry
+    app_state["config_api"] = config_api
+
 def get_orchestrator() -> MCPOrchestrator:
-    orchestrator = app_state.get("orchestrator")
-    if orchestrator is None:
+    if _orchestrator is None:
         raise HTTPException(status_code=503, detail="Service not ready (Orchestrator not initialized)")
-    return orchestrator
+    return _orchestrator
 
 def get_registry() -> ServiceRegistry:
-    registry = app_state.get("registry")
-    if registry is None:
+    if _registry is None:
         raise HTTPException(status_code=503, detail="Service not ready (Registry not initialized)")
-    return registry
+    return _registry
 
 def get_config_api() -> MCPConfigAPI:
-    config_api = app_state.get("config_api")
-    if config_api is None:
+    if _config_api is None:
         raise HTTPException(status_code=503, detail="Service not ready (Config API not initialized)")
-    return config_api 
+    return _config_api 
@@ -4,17 +4,37 @@ from core.orchestrator import MCPOrchestrator
 from api.models import UnifiedQueryRequest
 from api.service_management import get_orchestrator
 from fastapi.responses import StreamingResponse
-import uuid, json, logging
+import json, logging
+
+try:
+    from orjson import dumps as _dumps
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Static parts of the stream error event; only the JSON-escaped message is encoded per error
+_ERR_FRAME_PREFIX = b'data: {"is_final":true,"result":"Error processing streaming query: '
+_ERR_FRAME_SUFFIX = b'"}\n\n'
+
+def _sse_frame(event_id: int, response: Any, _dumps=_dumps) -> bytes:
+    return b"id: %d\ndata: %s\n\n" % (event_id, _dumps(response))
+
 class StreamableHTTPResponse(StreamingResponse):
     def __init__(self, query, orchestrator, mode="react", stream_type="step", status_code=200):
         self.query = query
         self.orchestrator = orchestrator
         self.mode = mode
         self.stream_type = stream_type
+        # Resolve the event source once so the per-event loop has no dispatch
+        if stream_type == "step":
+            self._source = orchestrator.stream_process_query
+        elif stream_type == "token":
+            self._source = orchestrator.stream_process_query_token
+        else:
+            raise ValueError(f"Unsupported stream type: {stream_type}")
         media_type = "text/event-stream"
         headers = {
             "Cache-Control": "no-cache",
@@ -28,29 +48,23 @@ class StreamableHTTPResponse(StreamingResponse):
             headers=headers
         )
     async def stream_generator(self):
+        # SSE event ids only need to be unique within this stream, a counter is enough
+        event_id = 0
+        frame = _sse_frame
         try:
-            if self.stream_type == "step":
-                async for response in self.orchestrator.stream_process_query(self.query):
-                    event_id = f"event-{uuid.uuid4()}"
-                    yield f"id: {event_id}\ndata: {json.dumps(response)}\n\n"
-            elif self.stream_type == "token":
-                async for response in self.orchestrator.stream_process_query_token(self.query):
-                    event_id = f"event-{uuid.uuid4()}"
-                    yield f"id: {event_id}\ndata: {json.dumps(response)}\n\n"
-            else:
-                error_msg = {"error": f"Unsupported stream type: {self.stream_type}"}
-                yield f"data: {json.dumps(error_msg)}\n\n"
+            async for response in self._source(self.query):
+                event_id += 1
+                yield frame(event_id, response)
         except Exception as e:
-            logger.error(f"Error in stream generator: {e}", exc_info=True)
-            error_response = {"is_final": True, "result": f"Error processing streaming query: {str(e)}"}
-            yield f"data: {json.dumps(error_response)}\n\n"
+            logger.error("Error in stream generator: %s", e, exc_info=True)
+            yield _ERR_FRAME_PREFIX + _dumps(str(e))[1:-1] + _ERR_FRAME_SUFFIX
 
 @router.post("/mcp")
 async def unified_query_endpoint(
     payload: UnifiedQueryRequest,
     orchestrator: MCPOrchestrator = Depends(get_orchestrator)
 ):
-    logger.info(f"Received unified query: '{payload.query[:50]}...', mode: {payload.mode}, stream_type: {payload.stream_type}")
+    logger.info("Received unified query: '%.50s...', mode: %s, stream_type: %s", payload.query, payload.mode, payload.stream_type)
     try:
         if not payload.stream_type:
             result = await orchestrator.process_unified_query(
@@ -59,7 +73,7 @@ async def unified_query_endpoint(
                 include_trace=payload.include_trace
             )
             if isinstance(result, str) and result.startswith("Error:"):
-                logger.error(f"Error processing query: {result}")
+                logger.error("Error processing query: %s", result)
                 raise HTTPException(status_code=500, detail=result)
             return {"result": result}
         else:
@@ -70,10 +84,10 @@ async def unified_query_endpoint(
                 orchestrator=orchestrator
             )
     except ValueError as ve:
-        logger.error(f"Invalid request parameters: {ve}")
+        logger.error("Invalid request parameters: %s", ve)
         raise HTTPException(status_code=400, detail=str(ve))
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error processing unified query: {e}", exc_info=True)
+        logger.error("Error processing unified query: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}") 
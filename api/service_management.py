@@ -1,77 +1,85 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any, Optional
+from typing import Dict, Optional
 from core.registry import ServiceRegistry
-from core.orchestrator import MCPOrchestrator
+from core.orchestrator import MCPOrchestrator, ServiceConnectionError
 from api.models import RegisterRequest, ServiceInfoRequest
-from api.deps import get_orchestrator, get_registry
+from api.deps import get_orchestrator, get_registry, FastJSONResponse
+import asyncio
 import logging
+from functools import lru_cache
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=256)
+def _default_service_name(url: str) -> str:
+    """Derive a service name from its URL, e.g. http://host:8000/mcp -> host:8000"""
+    return url.rsplit('/', 2)[-2]
+
 @router.post("/register", response_model=Dict[str, str])
 async def register_service_endpoint(
     payload: RegisterRequest,
     orchestrator: MCPOrchestrator = Depends(get_orchestrator)
 ):
     server_url_str = str(payload.url)
-    service_name = payload.name or server_url_str.split('/')[-2]
-    logger.info(f"Received registration request, target URL: {server_url_str}, service name: {service_name}")
+    service_name = payload.name or _default_service_name(server_url_str)
+    logger.info("Received registration request, target URL: %s, service name: %s", server_url_str, service_name)
     try:
         success, message = await orchestrator.connect_service(server_url_str, service_name)
         if success:
-            logger.info(f"Service {service_name} ({server_url_str}) registered successfully: {message}")
+            logger.info("Service %s (%s) registered successfully: %s", service_name, server_url_str, message)
             return {"status": "success", "message": message}
         else:
-            logger.error(f"Service {service_name} ({server_url_str}) registration failed: {message}")
-            status_code = 500
-            is_connection_issue = False
-            if "502 Bad Gateway" in message: status_code = 502; is_connection_issue = True
-            elif "Connection failed" in message or "Network connection error" in message: status_code = 502; is_connection_issue = True
-            if is_connection_issue:
-                logger.info(f"Adding service {service_name} ({server_url_str}) to auto-reconnect list.")
-                orchestrator.pending_reconnection.add(server_url_str)
-            raise HTTPException(status_code=status_code, detail=message)
+            logger.error("Service %s (%s) registration failed: %s", service_name, server_url_str, message)
+            raise HTTPException(status_code=500, detail=message)
+    except ServiceConnectionError as conn_exc:
+        # Upstream unreachable (502 / network error): retry in the background
+        logger.error("Service %s (%s) registration failed: %s", service_name, server_url_str, conn_exc)
+        logger.info("Adding service %s (%s) to auto-reconnect list.", service_name, server_url_str)
+        orchestrator.pending_reconnection.add(server_url_str)
+        raise HTTPException(status_code=502, detail=str(conn_exc))
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        logger.error(f"Unknown error processing registration request (URL: {server_url_str}): {e}", exc_info=True)
+        logger.error("Unknown error processing registration request (URL: %s): %s", server_url_str, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected internal server error occurred while processing the registration request.")
 
-@router.get("/health", response_model=Dict[str, Any])
+@router.get("/health")
 async def get_health_status(
     registry: ServiceRegistry = Depends(get_registry),
     orchestrator: MCPOrchestrator = Depends(get_orchestrator)
 ):
-    service_statuses = registry.get_registered_services_details()
-    for status in service_statuses:
-        is_healthy = await orchestrator.is_service_healthy(status["url"])
-        status["status"] = "healthy" if is_healthy else "unhealthy"
-    return {
+    service_statuses, session_count, tool_count = registry.snapshot()
+    # Probe all services concurrently, an exception counts as unhealthy
+    health_results = await asyncio.gather(
+        *(orchestrator.is_service_healthy(status["url"]) for status in service_statuses),
+        return_exceptions=True
+    )
+    for status, is_healthy in zip(service_statuses, health_results):
+        status["status"] = "healthy" if is_healthy is True else "unhealthy"
+    return FastJSONResponse({
         "orchestrator_status": "running",
-        "active_services": registry.get_session_count(),
-        "total_tools": registry.get_tool_count(),
+        "active_services": session_count,
+        "total_tools": tool_count,
         "services": service_statuses
-    }
+    })
 
-@router.get("/service_info", response_model=Dict[str, Any])
+@router.get("/service_info")
 async def get_service_info(
     url: str,
     registry: ServiceRegistry = Depends(get_registry),
     orchestrator: MCPOrchestrator = Depends(get_orchestrator)
 ):
-    if not registry.has_service(url):
+    service_info = registry.try_get_service_info(url)
+    if service_info is None:
         raise HTTPException(status_code=404, detail=f"Service not found: {url}")
-    service_info = registry.get_service_info(url)
     is_healthy = await orchestrator.is_service_healthy(url)
     service_info["status"] = "healthy" if is_healthy else "unhealthy"
-    tools = registry.get_tools_for_service(url)
-    service_info["tools"] = [{"name": name, "description": tool.get("function", {}).get("description", "")} for name, tool in tools]
-    return service_info
+    return FastJSONResponse(service_info)
 
 @router.get("/services")
 async def list_services(
     registry: ServiceRegistry = Depends(get_registry)
 ):
     services = registry.get_registered_services_details()
-    return {"services": services} 
+    return FastJSONResponse({"services": services}) 
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 from core.registry import ServiceRegistry
-from api.deps import get_registry
+from api.deps import get_registry, FastJSONResponse
 
 router = APIRouter()
 
@@ -9,4 +9,4 @@ async def list_tools(
     registry: ServiceRegistry = Depends(get_registry)
 ):
     tools = registry.get_all_tools()
-    return {"tools": tools} 
+    return FastJSONResponse({"tools": tools}) 
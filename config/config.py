@@ -2,7 +2,7 @@ import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import logging
 from typing import Dict, Any, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 logger = logging.getLogger(__name__)
 
@@ -13,12 +13,19 @@ HTTP_TIMEOUT_SECONDS = 10
 RECONNECTION_INTERVAL_SECONDS = 60
 REACT_MAX_ITERATIONS = 5
 REACT_ENABLE_TRACE = False
+REACT_CACHE_TTL_SECONDS = 0
+REACT_MAX_CONTEXT_MESSAGES = 40
+REACT_MAX_CONTEXT_CHARS = 32768
+REACT_MAX_TOOL_RESULT_CHARS = 4096
+REACT_TOOL_TIMEOUT_SECONDS = 30
+REACT_EMIT_THINKING = True
+REACT_SPECULATIVE_TOOL_CALLS = False
 STREAMABLE_HTTP_ENDPOINT = "/mcp"
 
 @dataclass
 class LLMConfig:
     provider: str = "openai_compatible"
-    api_key: str = ""
+    api_key: str = field(default="", repr=False)  # 不出现在配置日志中
     model: str = ""
     base_url: Optional[str] = None
 
@@ -56,6 +63,13 @@ def load_app_config() -> Dict[str, Any]:
         "reconnection_interval": _get_env_int("RECONNECTION_INTERVAL_SECONDS", RECONNECTION_INTERVAL_SECONDS),
         "react_max_iterations": _get_env_int("REACT_MAX_ITERATIONS", REACT_MAX_ITERATIONS),
         "react_enable_trace": _get_env_bool("REACT_ENABLE_TRACE", REACT_ENABLE_TRACE),
+        "react_cache_ttl": _get_env_int("REACT_CACHE_TTL_SECONDS", REACT_CACHE_TTL_SECONDS),
+        "react_max_context_messages": _get_env_int("REACT_MAX_CONTEXT_MESSAGES", REACT_MAX_CONTEXT_MESSAGES),
+        "react_max_context_chars": _get_env_int("REACT_MAX_CONTEXT_CHARS", REACT_MAX_CONTEXT_CHARS),
+        "react_max_tool_result_chars": _get_env_int("REACT_MAX_TOOL_RESULT_CHARS", REACT_MAX_TOOL_RESULT_CHARS),
+        "react_tool_timeout": _get_env_int("REACT_TOOL_TIMEOUT_SECONDS", REACT_TOOL_TIMEOUT_SECONDS),
+        "react_emit_thinking": _get_env_bool("REACT_EMIT_THINKING", REACT_EMIT_THINKING),
+        "react_speculative_tool_calls": _get_env_bool("REACT_SPECULATIVE_TOOL_CALLS", REACT_SPECULATIVE_TOOL_CALLS),
         "streamable_http_endpoint": os.environ.get("STREAMABLE_HTTP_ENDPOINT", STREAMABLE_HTTP_ENDPOINT),
     }
     # 加载LLM配置
@@ -1,27 +1,36 @@
-import os, sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import asyncio
 import json
-import httpx
 import logging
-from datetime import datetime, timedelta
-from contextlib import AsyncExitStack
-from urllib.parse import urljoin
+import time
+from datetime import timedelta
 from typing import Dict, List, Optional, Any, Tuple, Set, Union, AsyncGenerator
 
 from core.base_client import EnhancedClientInterface
 from core.client_adapter import ClientAdapter
-from core.registry import ServiceRegistry
-from plugins.llm_factory import create_llm_client
-from plugins.react_agent import ReActAgent
-from core.transport import StreamableHTTPConfig, StreamableHTTPTransport
+from core.transport import create_pooled_http_client
 from fastmcp import Client
+from fastmcp.client.transports import StreamableHttpTransport
+
+try:
+    from orjson import loads as _loads
+except ImportError:  # orjson is optional, fall back to the stdlib decoder
+    _loads = json.loads
 
 logger = logging.getLogger(__name__)
 
 class EnhancedClient(EnhancedClientInterface):
     """扩展官方Client类，添加额外功能如ReAct代理和流式处理"""
     
+    # 重连时同时进行的探测数量上限
+    RECONNECTION_CONCURRENCY = 16
+    # 标准查询的系统消息，所有请求共享同一个字典，不可修改
+    SYSTEM_MESSAGE = {"role": "system", "content": "You are an intelligent assistant that can utilize available tools to answer questions."}
+    # 停止监控时等待任务结束的上限（秒）
+    MONITOR_STOP_TIMEOUT_SECONDS = 2.0
+    # 自适应心跳：失败后间隔减半的下限（秒），连续成功多少次后间隔加倍
+    HEARTBEAT_MIN_INTERVAL_SECONDS = 5.0
+    HEARTBEAT_SUCCESS_STREAK = 5
+    
     def __init__(self, server_url: str, **kwargs):
         """初始化增强客户端
         
@@ -29,13 +38,13 @@ class EnhancedClient(EnhancedClientInterface):
             server_url: 服务器URL
             **kwargs: 额外配置参数，包括：
                 - config: 配置字典
-                - heartbeat_interval: 心跳间隔（秒）
-                - heartbeat_timeout: 心跳超时（秒）
+                - heartbeat_interval: 心跳初始间隔（秒），运行中根据检查结果自适应调整
+                - heartbeat_timeout: 心跳超时（秒），也是自适应心跳间隔的上限
                 - reconnection_interval: 重连间隔（秒）
                 - http_timeout: HTTP超时（秒）
         """
-        # 创建官方Client实例
-        self.official_client = Client(server_url)
+        # 创建官方Client实例，底层HTTP连接使用连接池（HTTP/2可用时启用）
+        self.official_client = Client(self._create_transport(server_url))
         
         # 使用ClientAdapter包装官方Client
         self.adapter = ClientAdapter(self.official_client)
@@ -47,23 +56,60 @@ class EnhancedClient(EnhancedClientInterface):
         self.config = kwargs.get("config", {})
         self.llm_client = None
         self.react_agent = None
+        # LLM配置在初始化时绑定，避免每次查询都从config中查找
+        self._model_name: Optional[str] = None
+        self._provider: Optional[str] = None
+        self._llm_config_ok = False
         
         # 心跳和重连配置
         self.heartbeat_interval = timedelta(seconds=int(kwargs.get("heartbeat_interval", 60)))
         self.heartbeat_timeout = timedelta(seconds=int(kwargs.get("heartbeat_timeout", 180)))
         self.reconnection_interval = timedelta(seconds=int(kwargs.get("reconnection_interval", 60)))
         self.http_timeout = int(kwargs.get("http_timeout", 10))
+        # 自适应心跳间隔：失败时减半以尽快发现恢复，连续成功后加倍以减少健康服务的探测
+        self._cur_hb_interval = self.heartbeat_interval.total_seconds()
+        self._hb_min = min(self.HEARTBEAT_MIN_INTERVAL_SECONDS, self._cur_hb_interval)
+        self._hb_max = max(self.heartbeat_timeout.total_seconds(), self._cur_hb_interval)
+        self._hb_success_streak = 0
         
         # 心跳和重连任务
         self.heartbeat_task = None
         self.reconnection_task = None
-        self.pending_reconnection = set()
+        self.pending_reconnection = set()  # 待重连URL（去重）
+        self._reconnection_queue: asyncio.Queue = asyncio.Queue()  # 新的待重连URL，唤醒重连循环
+        
+        # 查询分发表，在初始化时构建，避免每次查询进行字符串比较
+        # 非流式：键为(是否react模式, 是否包含轨迹)；非react模式忽略轨迹参数
+        self._query_dispatch = {
+            (True, False): self.process_query_with_react,
+            (True, True): self.process_query_with_trace,
+            (False, False): self.process_query,
+            (False, True): self.process_query,
+        }
+        # 流式：键为stream_type，处理方法返回异步生成器
+        self._stream_dispatch = {
+            "step": self.stream_process_query,
+            "token": self.stream_process_query_token,
+        }
         
         # 初始化LLM客户端（如果配置了）
         llm_config = self.config.get("llm_config")
         if llm_config:
             self._initialize_llm_client(llm_config)
     
+    @staticmethod
+    def _create_transport(server_url: str) -> Union[StreamableHttpTransport, str]:
+        """为服务URL创建使用连接池HTTP客户端的传输
+        
+        mcp会在会话结束时关闭工厂创建的AsyncClient，因此每个会话各自持有一个连接池，
+        会话存续期间的所有请求复用该连接池。
+        """
+        try:
+            return StreamableHttpTransport(server_url, httpx_client_factory=create_pooled_http_client)
+        except TypeError:
+            # 旧版fastmcp不支持httpx_client_factory，交给Client自动推断传输
+            return server_url
+    
     def _initialize_llm_client(self, llm_config):
         """初始化LLM客户端和ReAct代理"""
         try:
@@ -81,8 +127,15 @@ class EnhancedClient(EnhancedClientInterface):
                 logger.error("ReAct Agent将无法初始化，流式功能将不可用")
                 return
             
+            # LLM相关模块只在配置了LLM时才需要，延迟导入以加快模块加载
+            from plugins.llm_factory import create_llm_client
+            from plugins.react_agent import ReActAgent
+            
             self.llm_client = create_llm_client(llm_config)
             if self.llm_client:
+                self._model_name = llm_config.model
+                self._provider = llm_config.provider
+                self._llm_config_ok = True
                 logger.info(f"{llm_config.provider.capitalize()} Client initialized with model {llm_config.model}.")
                 # Initialize ReAct agent if LLM client is available
                 try:
@@ -108,6 +161,7 @@ class EnhancedClient(EnhancedClientInterface):
         """
         # 使用adapter的上下文管理器
         await self.adapter.__aenter__()
+        await self.warmup()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -117,6 +171,19 @@ class EnhancedClient(EnhancedClientInterface):
         # 使用adapter的上下文管理器
         await self.adapter.__aexit__(exc_type, exc_val, exc_tb)
     
+    async def warmup(self):
+        """
+        预热工具列表和健康状态缓存
+        
+        并发获取工具定义和执行健康检查，使二者的往返时间重叠，
+        首次查询和随后的健康检查可直接命中adapter的缓存
+        """
+        await asyncio.gather(
+            self.adapter.get_all_tools(),
+            self.adapter.is_service_healthy(force=True),
+            return_exceptions=True,
+        )
+    
     # 实现BaseClient接口方法，委托给adapter
     
     async def list_tools(self) -> List[Any]:
@@ -131,11 +198,10 @@ class EnhancedClient(EnhancedClientInterface):
         """检查服务连接状态，委托给adapter"""
         return await self.adapter.ping()
     
-    async def is_service_healthy(self) -> bool:
-        """检查服务健康状态，委托给adapter"""
+    async def is_service_healthy(self, force: bool = False) -> bool:
+        """检查服务健康状态，委托给adapter（带短时缓存，force=True时强制ping）"""
         try:
-            await self.ping()
-            return True
+            return await self.adapter.is_service_healthy(force=force)
         except Exception:
             return False
     
@@ -153,58 +219,139 @@ class EnhancedClient(EnhancedClientInterface):
             self.reconnection_task = asyncio.create_task(self._reconnection_loop())
 
     async def stop_monitoring(self):
-        """停止后台健康检查和重连监视器"""
-        tasks_to_stop = [self.heartbeat_task, self.reconnection_task]
-        task_names = ["Heartbeat", "Reconnection"]
-        for i, task in enumerate(tasks_to_stop):
-            name = task_names[i]
-            if task and not task.done():
-                task.cancel()
-                try: await task
-                except asyncio.CancelledError: logger.info(f"{name} monitor task cancelled.")
-                except Exception as e: logger.error(f"Error during {name} task cancellation: {e}", exc_info=True)
+        """停止后台健康检查和重连监视器
+        
+        同时取消两个任务，并以MONITOR_STOP_TIMEOUT_SECONDS为上限等待它们结束。
+        已停止时重复调用直接返回。
+        """
+        if self.heartbeat_task is None and self.reconnection_task is None:
+            return
+        named_tasks = {"Heartbeat": self.heartbeat_task, "Reconnection": self.reconnection_task}
+        tasks = {task: name for name, task in named_tasks.items() if task and not task.done()}
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=self.MONITOR_STOP_TIMEOUT_SECONDS)
+            for task in done:
+                if task.cancelled():
+                    logger.info(f"{tasks[task]} monitor task cancelled.")
+                elif task.exception() is not None:
+                    logger.error(f"Error during {tasks[task]} task cancellation: {task.exception()}", exc_info=task.exception())
+            for task in pending:
+                logger.error(f"{tasks[task]} monitor task did not cancel within {self.MONITOR_STOP_TIMEOUT_SECONDS}s")
         self.heartbeat_task = None
         self.reconnection_task = None
     
     async def _heartbeat_loop(self):
-        """后台循环，用于定期健康检查"""
+        """后台循环，用于定期健康检查
+        
+        最近的工具调用等正常通信已能证明连接可用，因此只在距上次成功通信满一个心跳间隔时才ping。
+        心跳间隔由_check_service_health根据检查结果调整。
+        """
         while True:
-            await asyncio.sleep(self.heartbeat_interval.total_seconds())
+            delay = self._cur_hb_interval - (time.monotonic() - self.adapter.last_contact)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
             await self._check_service_health()
+            # 检查失败时last_contact不会更新，等待一个完整间隔再检查，避免连续ping
+            if time.monotonic() - self.adapter.last_contact >= self._cur_hb_interval:
+                await asyncio.sleep(self._cur_hb_interval)
     
     async def _check_service_health(self):
-        """检查服务健康状态"""
+        """检查服务健康状态
+        
+        探测以http_timeout为上限，挂起的ping不会拖住心跳循环，超时即视为不健康。
+        """
         logger.debug("Running periodic health check...")
         try:
-            await self.ping()
-            logger.debug(f"Health check SUCCESS for: {self.base_url}")
+            healthy = await asyncio.wait_for(self.is_service_healthy(force=True), timeout=self.http_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Health check TIMED OUT for {self.base_url} after {self.http_timeout}s")
+            healthy = False
         except Exception as e:
             logger.warning(f"Health check FAILED for {self.base_url}: {e}")
-            self.pending_reconnection.add(self.base_url)
+            healthy = False
+        if healthy:
+            logger.debug(f"Health check SUCCESS for: {self.base_url}")
+            self._hb_success_streak += 1
+            if self._hb_success_streak >= self.HEARTBEAT_SUCCESS_STREAK and self._cur_hb_interval < self._hb_max:
+                self._cur_hb_interval = min(self._hb_max, self._cur_hb_interval * 2)
+                self._hb_success_streak = 0
+                logger.debug(f"Heartbeat interval raised to {self._cur_hb_interval}s")
+        else:
+            logger.warning(f"Health check FAILED for {self.base_url}")
+            self._hb_success_streak = 0
+            self._cur_hb_interval = max(self._hb_min, self._cur_hb_interval / 2)
+            self._schedule_reconnection(self.base_url)
+    
+    def _schedule_reconnection(self, url: str):
+        """将URL加入待重连队列，已在队列中的URL不会重复加入"""
+        if url not in self.pending_reconnection:
+            self.pending_reconnection.add(url)
+            self._reconnection_queue.put_nowait(url)
     
     async def _reconnection_loop(self):
-        """定期尝试重新连接服务的后台循环"""
+        """重连后台循环
+        
+        阻塞在队列上等待新失败的URL，服务一失败就立即尝试重连；仍失败的URL在reconnection_interval后重试。
+        等待重试期间新失败的URL同样会立即唤醒循环，不必等到已有URL的重试时间。
+        """
+        interval = self.reconnection_interval.total_seconds()
+        retry_at: Dict[str, float] = {}  # 仍失败的URL -> 下次重试的monotonic时间
         while True:
-            await asyncio.sleep(self.reconnection_interval.total_seconds())
-            await self._attempt_reconnections()
+            urls_to_retry = []
+            timeout = max(0.0, min(retry_at.values()) - time.monotonic()) if retry_at else None
+            try:
+                urls_to_retry.append(await asyncio.wait_for(self._reconnection_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                pass
+            while not self._reconnection_queue.empty():
+                urls_to_retry.append(self._reconnection_queue.get_nowait())
+            
+            # 加入已到重试时间的URL
+            now = time.monotonic()
+            for url, due in list(retry_at.items()):
+                if due <= now:
+                    del retry_at[url]
+                    if url in self.pending_reconnection:
+                        urls_to_retry.append(url)
+            if not urls_to_retry:
+                continue
+            
+            await self._attempt_reconnections(urls_to_retry)
+            next_retry = time.monotonic() + interval
+            for url in urls_to_retry:
+                if url in self.pending_reconnection:
+                    retry_at[url] = next_retry
     
-    async def _attempt_reconnections(self):
-        """尝试重新连接一次所有待重连的服务"""
-        if not self.pending_reconnection:
-            return  # 如果没有待重连的服务，跳过
-        
-        # 创建副本以避免迭代过程中修改集合的问题
-        urls_to_retry = list(self.pending_reconnection)
+    async def _attempt_reconnections(self, urls_to_retry: Optional[List[str]] = None):
+        """尝试重新连接一次指定的（默认所有）待重连服务"""
+        if urls_to_retry is None:
+            if not self.pending_reconnection:
+                return  # 如果没有待重连的服务，跳过
+            # 创建副本以避免迭代过程中修改集合的问题
+            urls_to_retry = list(self.pending_reconnection)
         logger.info(f"Attempting to reconnect {len(urls_to_retry)} service(s): {urls_to_retry}")
         
-        for url in urls_to_retry:
+        # 并发重试，避免单个挂起的服务拖慢其他服务；信号量限制同时进行的探测数量
+        semaphore = asyncio.Semaphore(self.RECONNECTION_CONCURRENCY)
+        await asyncio.gather(*(self._try_reconnect(url, semaphore) for url in urls_to_retry), return_exceptions=True)
+    
+    async def _try_reconnect(self, url: str, semaphore: asyncio.Semaphore):
+        """尝试重连单个服务，成功后从待重连集合中移除"""
+        async with semaphore:
             try:
-                await self.ping()
-                logger.info(f"Reconnection successful for: {url}")
-                self.pending_reconnection.discard(url)
+                healthy = await self.is_service_healthy(force=True)
             except Exception as e:
                 logger.warning(f"Reconnection attempt failed for {url}: {e}")
+                return
+            if healthy:
+                logger.info(f"Reconnection successful for: {url}")
+                self.pending_reconnection.discard(url)
+            else:
                 # 保持URL在self.pending_reconnection中，等待下一个周期
+                logger.warning(f"Reconnection attempt failed for {url}")
     
     async def process_unified_query(
         self, 
@@ -228,48 +375,44 @@ class EnhancedClient(EnhancedClientInterface):
             - 'step': 返回步骤级流式生成器
             - 'token': 返回令牌级流式生成器
         """
-        # 根据参数选择合适的处理方法
+        # 根据参数从分发表中选择合适的处理方法
         if not stream_type:
             # 非流式处理
-            if mode == "react":
-                if include_trace:
-                    return await self.process_query_with_trace(query)
-                else:
-                    return await self.process_query_with_react(query)
-            else:
-                return await self.process_query(query)
-        elif stream_type == "step":
-            # 步骤级流式处理
-            return self.stream_process_query(query)
-        elif stream_type == "token":
-            # 令牌级流式处理
-            return self.stream_process_query_token(query)
-        else:
-            raise ValueError(f"不支持的流式类型: {stream_type}")
+            return await self._query_dispatch[mode == "react", bool(include_trace)](query)
+        try:
+            handler = self._stream_dispatch[stream_type]
+        except KeyError:
+            raise ValueError(f"不支持的流式类型: {stream_type}") from None
+        # 流式处理，返回生成器
+        return handler(query)
 
+    async def _create_chat_completion(self, **kwargs) -> Any:
+        """调用LLM的chat.completions.create
+        
+        异步SDK直接await；同步SDK放到线程池执行，避免阻塞事件循环（心跳、流式响应等）。
+        取消时CancelledError照常向上传播。
+        """
+        create = self.llm_client.chat.completions.create
+        if asyncio.iscoroutinefunction(create):
+            return await create(**kwargs)
+        return await asyncio.to_thread(create, **kwargs)
+    
     async def process_query(self, query: str) -> Any:
         """使用标准方法处理用户查询"""
         if not self.llm_client: 
             return "Error: Language model client not configured."
 
-        messages = [
-            {"role": "system", "content": "You are an intelligent assistant that can utilize available tools to answer questions."},
-            {"role": "user", "content": query}
-        ]
-        
-        # 获取配置的模型名称
-        llm_config = self.config.get("llm_config")
-        if not llm_config or not llm_config.model:
+        if not self._llm_config_ok:
             return "Error: Language model name not configured."
-            
-        model_name = llm_config.model
+
+        messages = [self.SYSTEM_MESSAGE, {"role": "user", "content": query}]
+        model_name = self._model_name
         available_tools = await self.adapter.get_all_tools()
-        provider = llm_config.provider
-        logger.debug(f"Sending query to LLM ({provider}/{model_name}). Query: '{query[:50]}...'. Tools: {len(available_tools)}")
+        logger.debug(f"Sending query to LLM ({self._provider}/{model_name}). Query: '{query[:50]}...'. Tools: {len(available_tools)}")
 
         try:
             # 确保关键字参数匹配SDK的期望
-            response = self.llm_client.chat.completions.create(
+            response = await self._create_chat_completion(
                 model=model_name,
                 messages=messages,
                 tools=available_tools if available_tools else None
@@ -284,7 +427,7 @@ class EnhancedClient(EnhancedClientInterface):
                 logger.info(f"LLM requested tool call: '{function_name}'")
                 
                 try: 
-                    function_args = json.loads(tool_call.function.arguments)
+                    function_args = _loads(tool_call.function.arguments)
                 except json.JSONDecodeError as e: 
                     logger.error(f"Error parsing tool arguments: {e}")
                     return f"Error: Unable to parse parameters for tool '{function_name}'."
@@ -402,6 +545,7 @@ class EnhancedClient(EnhancedClientInterface):
     async def cleanup(self):
         """清理资源，包括停止监控任务"""
         await self.stop_monitoring()
-        # 断开adapter的连接
-        await self.adapter.__aexit__(None, None, None)
+        # 断开adapter的连接（已通过async with退出时跳过）
+        if self.adapter.is_connected:
+            await self.adapter.__aexit__(None, None, None)
         logger.info("Client resources cleaned up.")
@@ -1,11 +1,9 @@
-import os, sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 """
 客户端适配器，用于桥接官方Client接口和我们的功能
 """
 
 import logging
+import time
 from typing import Dict, Any, List, Optional, AsyncGenerator, Union, Tuple
 from fastmcp import Client
 
@@ -21,6 +19,11 @@ class ClientAdapter(BaseClient):
     同时添加了工具会话管理、健康检查和错误处理等功能。
     """
     
+    # 健康检查结果的缓存时间（秒），窗口内的重复检查直接返回缓存结果
+    HEALTH_CACHE_TTL_SECONDS = 1.0
+    # 格式化后的工具定义缓存时间（秒）
+    TOOLS_CACHE_TTL_SECONDS = 60.0
+    
     def __init__(self, client: Client):
         """
         初始化客户端适配器
@@ -31,6 +34,12 @@ class ClientAdapter(BaseClient):
         self.client = client
         self.tool_sessions = {}  # 工具名称到会话的映射
         self._connected = False  # 连接状态跟踪
+        self._health_checked_at = 0.0  # 上次健康检查的monotonic时间
+        self._health_cached = False  # 上次健康检查结果
+        self._last_contact = time.monotonic()  # 上次与服务器成功通信的monotonic时间
+        self._tools_cache: Optional[List[Dict[str, Any]]] = None  # get_all_tools的格式化结果
+        self._tools_cached_at = 0.0
+        self._schema_cache: Dict[str, Tuple[Any, Dict[str, Any]]] = {}  # 工具名 -> (原始工具对象, 格式化定义)
         
     async def __aenter__(self):
         """
@@ -49,20 +58,31 @@ class ClientAdapter(BaseClient):
         """
         实现异步上下文管理器的退出方法
         """
+        self.invalidate_tools_cache()
         if self._connected:
             logger.debug("Exiting ClientAdapter context, disconnecting client...")
             await self.client.__aexit__(exc_type, exc_val, exc_tb)
             self._connected = False
     
-    async def _ensure_connected(self):
+    async def _connect_slow(self):
         """
-        确保客户端已连接
+        连接客户端（慢路径）
         
-        如果客户端未连接，则尝试连接
+        调用方先检查self._connected，只有未连接时才调用此方法，
+        已连接时的常规调用不再产生额外的协程调用开销
         """
-        if not self._connected:
-            logger.debug("Client not connected, connecting now...")
-            await self.__aenter__()
+        logger.debug("Client not connected, connecting now...")
+        await self.__aenter__()
+    
+    @property
+    def is_connected(self) -> bool:
+        """客户端当前是否处于已连接状态"""
+        return self._connected
+    
+    @property
+    def last_contact(self) -> float:
+        """上次与服务器成功通信（list_tools/call_tool/ping）的monotonic时间"""
+        return self._last_contact
     
     async def get_session_for_tool(self, tool_name: str) -> Optional[Client]:
         """
@@ -75,7 +95,8 @@ class ClientAdapter(BaseClient):
             处理该工具的Client实例
         """
         # 在当前实现中，所有工具都由同一个Client处理
-        await self._ensure_connected()
+        if not self._connected:
+            await self._connect_slow()
         return self.client
     
     async def list_tools(self) -> List[Any]:
@@ -88,8 +109,11 @@ class ClientAdapter(BaseClient):
             工具定义列表
         """
         try:
-            await self._ensure_connected()
-            return await self.client.list_tools()
+            if not self._connected:
+                await self._connect_slow()
+            tools = await self.client.list_tools()
+            self._last_contact = time.monotonic()
+            return tools
         except Exception as e:
             logger.error(f"Error listing tools: {e}", exc_info=True)
             return []
@@ -108,9 +132,12 @@ class ClientAdapter(BaseClient):
             工具执行结果
         """
         try:
-            await self._ensure_connected()
+            if not self._connected:
+                await self._connect_slow()
             # 直接使用官方接口
-            return await self.client.call_tool(tool_name, arguments)
+            result = await self.client.call_tool(tool_name, arguments)
+            self._last_contact = time.monotonic()
+            return result
         except Exception as e:
             logger.error(f"Error calling tool '{tool_name}': {e}", exc_info=True)
             return f"Error: {str(e)}"
@@ -125,61 +152,91 @@ class ClientAdapter(BaseClient):
             服务是否可用
         """
         try:
-            await self._ensure_connected()
+            if not self._connected:
+                await self._connect_slow()
             await self.client.ping()
+            self._last_contact = time.monotonic()
             return True
         except Exception as e:
             logger.warning(f"Ping failed: {e}")
+            # 连接异常后工具列表可能已变化，重连后重新获取
+            self.invalidate_tools_cache()
             return False
     
-    async def is_service_healthy(self) -> bool:
+    async def is_service_healthy(self, force: bool = False) -> bool:
         """
         检查服务是否健康
         
-        实现BaseClient接口方法，使用ping方法检查健康状态
+        实现BaseClient接口方法，使用ping方法检查健康状态。
+        HEALTH_CACHE_TTL_SECONDS内的重复调用返回缓存结果，不再访问服务器。
+        
+        Args:
+            force: 为True时忽略缓存，强制ping（供心跳检测使用）
         
         Returns:
             服务健康状态
         """
-        return await self.ping()
+        if not force and time.monotonic() - self._health_checked_at < self.HEALTH_CACHE_TTL_SECONDS:
+            return self._health_cached
+        healthy = await self.ping()
+        self._health_cached = healthy
+        self._health_checked_at = time.monotonic()
+        return healthy
+    
+    def invalidate_tools_cache(self) -> None:
+        """清除get_all_tools的缓存，下次调用时重新获取并格式化"""
+        self._tools_cache = None
+        self._schema_cache = {}
+    
+    def _format_tool(self, tool: Any) -> Dict[str, Any]:
+        """将工具对象格式化为LLM工具定义，未变化的工具直接复用上次的结果"""
+        cached = self._schema_cache.get(tool.name)
+        if cached is not None and (cached[0] is tool or cached[0] == tool):
+            return cached[1]
+        
+        # 获取工具参数schema，格式正确的schema直接引用，不复制
+        parameters = getattr(tool, 'inputSchema', {}) or {}
+        if not isinstance(parameters, dict):
+            parameters = {"type": "object", "properties": parameters, "required": []}
+        elif parameters.get("type") != "object":
+            parameters = {"type": "object", "properties": parameters, "required": list(parameters)}
+        
+        # 创建LLM工具定义
+        tool_definition = {
+            "type": "function", 
+            "function": {
+                "name": tool.name, 
+                "description": getattr(tool, 'description', f"Tool {tool.name}"), 
+                "parameters": parameters
+            }
+        }
+        self._schema_cache[tool.name] = (tool, tool_definition)
+        return tool_definition
     
     async def get_all_tools(self) -> List[Dict[str, Any]]:
         """
         获取所有工具的格式化定义
         
+        结果缓存TOOLS_CACHE_TTL_SECONDS秒，断开连接或ping失败时失效。
+        返回的列表为共享缓存，调用方不应修改。
+        
         Returns:
             工具定义列表，格式化为LLM可用的格式
         """
+        if self._tools_cache is not None and time.monotonic() - self._tools_cached_at < self.TOOLS_CACHE_TTL_SECONDS:
+            return self._tools_cache
         try:
-            await self._ensure_connected()
-            # 获取工具列表
+            # 获取工具列表（list_tools内部负责连接）
             tools = await self.list_tools()
             
             # 处理工具定义
-            processed_tools = []
-            for tool in tools:
-                # 获取工具参数schema
-                parameters = getattr(tool, 'inputSchema', {}) or {}
-                
-                # 确保参数格式正确
-                if not isinstance(parameters, dict) or parameters.get("type") != "object":
-                    parameters = {
-                        "type": "object", 
-                        "properties": parameters, 
-                        "required": list(parameters.keys()) if isinstance(parameters, dict) else []
-                    }
-                
-                # 创建LLM工具定义
-                tool_definition = {
-                    "type": "function", 
-                    "function": {
-                        "name": tool.name, 
-                        "description": getattr(tool, 'description', f"Tool {tool.name}"), 
-                        "parameters": parameters
-                    }
-                }
-                processed_tools.append(tool_definition)
-                
+            format_tool = self._format_tool
+            processed_tools = [format_tool(tool) for tool in tools]
+            
+            # list_tools在出错时返回空列表，空结果不缓存，避免把故障结果保留一个TTL
+            if processed_tools:
+                self._tools_cache = processed_tools
+                self._tools_cached_at = time.monotonic()
             return processed_tools
         except Exception as e:
             logger.error(f"Error getting tools: {e}", exc_info=True)
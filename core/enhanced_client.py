@@ -9,16 +9,37 @@ ReAct (Reasoning + Acting) capabilities for improved tool usage.
 """
 
 import asyncio
+import json
 import logging
+import random
+import time
 from typing import Dict, List, Any, Optional, AsyncGenerator, Union, Tuple
 from datetime import datetime, timedelta
 from fastmcp import Client
 
 from plugins.llm_factory import create_llm_client
-from plugins.react_agent import ReActAgent
+from plugins.query_cache import SemanticQueryCache
+from plugins.react_agent import ReActAgent, _iter_stream
+
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _canonical_args(arguments: Any) -> bytes:
+        """Serialize tool arguments with sorted keys for use as a cache key"""
+        return orjson.dumps(arguments, option=orjson.OPT_SORT_KEYS)
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    _loads = json.loads
+
+    def _canonical_args(arguments: Any) -> str:
+        """Serialize tool arguments with sorted keys for use as a cache key"""
+        return json.dumps(arguments, sort_keys=True)
 
 logger = logging.getLogger(__name__)
 
+# Marks base_url as not supplied by a factory, so __init__ derives it from config_or_url
+_UNRESOLVED = object()
+
 class EnhancedFastMCPClient:
     """
     Enhanced FastMCP client with ReAct support
@@ -27,40 +48,118 @@ class EnhancedFastMCPClient:
     including query processing, streaming, and health monitoring.
     """
     
+    # System message for standard queries; shared by every request and never modified
+    SYSTEM_MESSAGE = {"role": "system", "content": "You are an intelligent assistant that can utilize available tools to answer questions."}
+    # Upper bound on cached tool results; the oldest entry is evicted first
+    TOOL_CACHE_MAX_ENTRIES = 256
+    # Maximum number of tool calls from one LLM response that run at the same time
+    TOOL_CALL_CONCURRENCY = 8
+    # Cap on the exponential reconnection backoff, and the random jitter added to spread retries (seconds)
+    RECONNECT_BACKOFF_MAX_SECONDS = 600.0
+    RECONNECT_JITTER_SECONDS = 5.0
+    
     def __init__(self, config_or_url: Any, **kwargs):
         """
         Initialize the enhanced client
         
         Args:
             config_or_url: FastMCP configuration or server URL
-            **kwargs: Additional configuration parameters
+            **kwargs: Additional configuration parameters, including:
+                - tool_cache_ttl: Mapping of tool name to result cache TTL in seconds;
+                  merged over config["tool_ttl"]
+                - tool_cache_default_ttl: TTL for tools without their own entry
+                  (default 0, i.e. only listed tools are cached)
+                - tool_no_cache: Tool names that are never cached (state-changing
+                  tools); merged with config["no_cache"]
+                - base_url: Pre-resolved server URL (set by from_url/from_config)
+                - query_cache_ttl: Seconds to cache non-streaming query results (0 disables)
+                - embedding_model: Embedding model used to match paraphrased queries in the
+                  query cache; without it only normalized exact matches hit
+                - query_cache_similarity: Minimum cosine similarity for a semantic hit
         """
         # Create FastMCP client
         self.client = Client(config_or_url)
         
         # Store configuration
         self.config = kwargs.get("config", {})
-        self.base_url = str(config_or_url) if isinstance(config_or_url, str) else None
+        base_url = kwargs.get("base_url", _UNRESOLVED)
+        if base_url is _UNRESOLVED:
+            base_url = config_or_url if isinstance(config_or_url, str) else None
+        self.base_url = base_url
         
         # Initialize LLM and ReAct components
         self.llm_client = None
         self.react_agent = None
         
         # Timing configuration
-        self.heartbeat_interval = timedelta(seconds=int(kwargs.get("heartbeat_interval", 60)))
-        self.heartbeat_timeout = timedelta(seconds=int(kwargs.get("heartbeat_timeout", 180)))
-        self.reconnection_interval = timedelta(seconds=int(kwargs.get("reconnection_interval", 60)))
+        # Timing is kept as float seconds; the timedelta properties below are for compatibility
+        self.heartbeat_interval_seconds = float(kwargs.get("heartbeat_interval", 60))
+        self.heartbeat_timeout_seconds = float(kwargs.get("heartbeat_timeout", 180))
+        self.reconnection_interval_seconds = float(kwargs.get("reconnection_interval", 60))
         self.http_timeout = int(kwargs.get("http_timeout", 10))
         
-        # Monitoring tasks
-        self.heartbeat_task = None
-        self.reconnection_task = None
+        # Supervisor task running the monitor loops concurrently
+        self._monitor_task: Optional[asyncio.Task] = None
         self.pending_reconnection = set()
+        self._reconnect_backoff: Dict[str, Tuple[int, float]] = {}  # url -> (consecutive failures, next retry monotonic time)
+        
+        # Tool result cache: (tool_name, canonical arguments) -> (expires_at, result).
+        # TTLs are per tool since freshness needs differ (reference data vs. live data);
+        # caching is opt-in and no_cache tools always reach the server.
+        self._tool_ttl: Dict[str, float] = {**(self.config.get("tool_ttl") or {}), **(kwargs.get("tool_cache_ttl") or {})}
+        self._tool_default_ttl = float(kwargs.get("tool_cache_default_ttl", self.config.get("tool_default_ttl", 0)) or 0)
+        self._no_cache = frozenset(self.config.get("no_cache") or ()) | frozenset(kwargs.get("tool_no_cache") or ())
+        self._tool_cache: Dict[Tuple[str, Union[str, bytes]], Tuple[float, Any]] = {}
+        
+        # Tool definitions are static for a session: list and format them once,
+        # then reuse the same list for every LLM request until reconnection.
+        self._tools_cache: Optional[List[Any]] = None
+        self._formatted_tools_cache: Optional[Tuple[Dict[str, Any], ...]] = None
+        
+        # Limits concurrent tool calls when the LLM requests several at once
+        self._call_semaphore = asyncio.Semaphore(self.TOOL_CALL_CONCURRENCY)
         
         # Initialize LLM client if configured
         llm_config = self.config.get("llm_config")
         if llm_config:
             self._initialize_llm_client(llm_config)
+        
+        # Query result cache; opt-in because answers may depend on live tool data
+        self._query_cache: Optional[SemanticQueryCache] = None
+        query_cache_ttl = float(kwargs.get("query_cache_ttl", 0) or 0)
+        if query_cache_ttl > 0:
+            self._embedding_model = kwargs.get("embedding_model")
+            embed = self._embed_query if self._embedding_model and self.llm_client else None
+            self._query_cache = SemanticQueryCache(
+                query_cache_ttl,
+                embed=embed,
+                threshold=float(kwargs.get("query_cache_similarity", 0.95)),
+            )
+    
+    @property
+    def heartbeat_interval(self) -> timedelta:
+        """Heartbeat interval as a timedelta"""
+        return timedelta(seconds=self.heartbeat_interval_seconds)
+    
+    @property
+    def heartbeat_timeout(self) -> timedelta:
+        """Heartbeat timeout as a timedelta"""
+        return timedelta(seconds=self.heartbeat_timeout_seconds)
+    
+    @property
+    def reconnection_interval(self) -> timedelta:
+        """Reconnection interval as a timedelta"""
+        return timedelta(seconds=self.reconnection_interval_seconds)
+    
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "EnhancedFastMCPClient":
+        """Create a client for a single server URL"""
+        return cls(url, base_url=url, **kwargs)
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **kwargs) -> "EnhancedFastMCPClient":
+        """Create a client from a FastMCP configuration dict (no single base URL)"""
+        return cls(config, base_url=None, **kwargs)
     
     def _initialize_llm_client(self, llm_config):
         """Initialize LLM client and ReAct agent"""
@@ -94,6 +193,13 @@ class EnhancedFastMCPClient:
         except Exception as e:
             logger.error(f"Error creating LLM client: {e}", exc_info=True)
     
+    async def _embed_query(self, text: str) -> List[float]:
+        """Embed a query with the LLM provider's embedding endpoint"""
+        response = await asyncio.to_thread(
+            self.llm_client.embeddings.create, model=self._embedding_model, input=text
+        )
+        return response.data[0].embedding
+    
     # Async context manager support
     async def __aenter__(self):
         """
@@ -102,6 +208,7 @@ class EnhancedFastMCPClient:
         Returns:
             EnhancedFastMCPClient instance
         """
+        self.invalidate_tools_cache()
         await self.client.__aenter__()
         return self
     
@@ -109,6 +216,7 @@ class EnhancedFastMCPClient:
         """
         Async context manager exit
         """
+        self.invalidate_tools_cache()
         await self.client.__aexit__(exc_type, exc_val, exc_tb)
     
     # Core FastMCP Client methods
@@ -117,15 +225,24 @@ class EnhancedFastMCPClient:
         """
         List available tools
         
+        Always asks the server; the result also refreshes the formatted tool
+        definitions used by process_query.
+        
         Returns:
             List of available tools
         """
-        return await self.client.list_tools()
+        tools = await self.client.list_tools()
+        self._set_tools(tools)
+        return tools
     
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """
         Call a tool with arguments
         
+        Results of cacheable tools are served from cache until their TTL expires;
+        identical arguments share one cache entry. A result may carry a
+        cache_ttl hint in its metadata that overrides the configured TTL.
+        
         Args:
             tool_name: Name of the tool to call
             arguments: Tool arguments
@@ -133,7 +250,92 @@ class EnhancedFastMCPClient:
         Returns:
             Tool execution result
         """
-        return await self.client.call_tool(tool_name, arguments)
+        if tool_name in self._no_cache:
+            return await self.client.call_tool(tool_name, arguments)
+        ttl = self._tool_ttl.get(tool_name, self._tool_default_ttl)
+        if not ttl or ttl <= 0:
+            return await self.client.call_tool(tool_name, arguments)
+        try:
+            key = (tool_name, _canonical_args(arguments))
+        except (TypeError, ValueError):
+            # Arguments that cannot be canonicalized are never cached
+            return await self.client.call_tool(tool_name, arguments)
+        
+        cached = self._tool_cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            logger.debug(f"Tool cache hit: '{tool_name}'")
+            return cached[1]
+        
+        result = await self.client.call_tool(tool_name, arguments)
+        self._tool_cache.pop(key, None)
+        hinted_ttl = self._result_ttl_hint(result)
+        if hinted_ttl is not None:
+            ttl = hinted_ttl
+            if ttl <= 0:
+                return result
+        if len(self._tool_cache) >= self.TOOL_CACHE_MAX_ENTRIES:
+            self._tool_cache.pop(next(iter(self._tool_cache)))
+        self._tool_cache[key] = (time.monotonic() + ttl, result)
+        return result
+    
+    @staticmethod
+    def _result_ttl_hint(result: Any) -> Optional[float]:
+        """
+        Read a Cache-Control-like TTL hint from a tool result's metadata
+        
+        Tools can return {"cache_ttl": seconds} (or "max_age") in the MCP result _meta;
+        0 means the result must not be cached.
+        
+        Returns:
+            The hinted TTL in seconds, or None when the result carries no hint
+        """
+        meta = getattr(result, "meta", None)
+        if not isinstance(meta, dict):
+            return None
+        hint = meta.get("cache_ttl", meta.get("max_age"))
+        try:
+            return float(hint) if hint is not None else None
+        except (TypeError, ValueError):
+            return None
+    
+    def invalidate_tools_cache(self) -> None:
+        """Forget the cached tool list so the next query lists and formats tools again"""
+        self._tools_cache = None
+        self._formatted_tools_cache = None
+    
+    def _set_tools(self, tools: List[Any]) -> None:
+        """Store a fresh tool list and precompute its LLM tool definitions"""
+        self._tools_cache = tools
+        self._formatted_tools_cache = tuple(
+            {
+                "type": "function",
+                "function": {
+                    "name": tool.name,
+                    "description": getattr(tool, 'description', f"Tool {tool.name}"),
+                    # MCP tools describe their arguments in inputSchema
+                    "parameters": getattr(tool, 'inputSchema', None) or getattr(tool, 'parameters', None) or {}
+                }
+            }
+            for tool in tools
+        )
+    
+    async def _get_formatted_tools(self) -> Tuple[Dict[str, Any], ...]:
+        """
+        Get tool definitions formatted for the LLM
+        
+        Definitions are precomputed when the tool list is fetched and the same
+        immutable tuple is shared by every later query until invalidation.
+        
+        Returns:
+            Tuple of LLM tool definitions
+        """
+        if self._formatted_tools_cache is None:
+            await self.list_tools()
+        return self._formatted_tools_cache
+    
+    def clear_tool_cache(self) -> None:
+        """Drop all cached tool results"""
+        self._tool_cache.clear()
     
     async def ping(self) -> bool:
         """
@@ -143,8 +345,9 @@ class EnhancedFastMCPClient:
             True if server is reachable
         """
         try:
-            # FastMCP doesn't have a direct ping method, so we'll use list_tools
-            await self.client.list_tools()
+            # MCP ping is a no-op round trip; unlike list_tools it does not make the
+            # server serialize every tool schema on each heartbeat
+            await self.client.ping()
             return True
         except Exception as e:
             logger.warning(f"Ping failed: {e}")
@@ -161,6 +364,31 @@ class EnhancedFastMCPClient:
     
     # Enhanced functionality
     
+    async def _create_chat_completion(self, **kwargs) -> Any:
+        """
+        Call the LLM's chat.completions.create without blocking the event loop
+        
+        Async SDK clients are awaited directly; sync clients run in a worker thread so
+        heartbeats, streaming responses and other queries keep running meanwhile.
+        """
+        create = self.llm_client.chat.completions.create
+        if asyncio.iscoroutinefunction(create):
+            return await create(**kwargs)
+        return await asyncio.to_thread(create, **kwargs)
+    
+    def _standard_messages(self, query: str) -> List[Dict[str, Any]]:
+        """Build the message list for a standard (non-ReAct) query"""
+        return [self.SYSTEM_MESSAGE, {"role": "user", "content": query}]
+    
+    def _llm_config_error(self) -> Optional[str]:
+        """Return an error message if the LLM is not usable, otherwise None"""
+        if not self.llm_client:
+            return "Error: Language model client not configured."
+        llm_config = self.config.get("llm_config")
+        if not llm_config or not llm_config.model:
+            return "Error: Language model name not configured."
+        return None
+    
     async def process_query(self, query: str) -> str:
         """
         Process a query using standard method
@@ -171,71 +399,38 @@ class EnhancedFastMCPClient:
         Returns:
             Query result
         """
-        if not self.llm_client:
-            return "Error: Language model client not configured."
-
-        messages = [
-            {"role": "system", "content": "You are an intelligent assistant that can utilize available tools to answer questions."},
-            {"role": "user", "content": query}
-        ]
+        error = self._llm_config_error()
+        if error:
+            return error
         
-        # Get configured model name
-        llm_config = self.config.get("llm_config")
-        if not llm_config or not llm_config.model:
-            return "Error: Language model name not configured."
-            
+        messages = self._standard_messages(query)
+        llm_config = self.config["llm_config"]
         model_name = llm_config.model
         provider = llm_config.provider
         
         try:
-            # Get available tools
-            tools = await self.client.list_tools()
-            
-            # Format tools for LLM
-            available_tools = []
-            for tool in tools:
-                tool_dict = {
-                    "type": "function",
-                    "function": {
-                        "name": tool.name,
-                        "description": getattr(tool, 'description', f"Tool {tool.name}"),
-                        "parameters": getattr(tool, 'parameters', {}) or {}
-                    }
-                }
-                available_tools.append(tool_dict)
+            # Get available tools (cached for the session)
+            available_tools = await self._get_formatted_tools()
             
             logger.debug(f"Sending query to LLM ({provider}/{model_name}). Query: '{query[:50]}...'. Tools: {len(available_tools)}")
             
             # Call LLM
-            response = self.llm_client.chat.completions.create(
+            response = await self._create_chat_completion(
                 model=model_name,
                 messages=messages,
-                tools=available_tools if available_tools else None
+                tools=list(available_tools) if available_tools else None
             )
             
             choice = response.choices[0]
             message = choice.message
             
-            # Handle tool calls
+            # Handle tool calls; several calls in one response run concurrently
             if choice.finish_reason == "tool_calls" and message.tool_calls:
-                tool_call = message.tool_calls[0]
-                function_name = tool_call.function.name
-                logger.info(f"LLM requested tool call: '{function_name}'")
-                
-                try:
-                    import json
-                    function_args = json.loads(tool_call.function.arguments)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error parsing tool arguments: {e}")
-                    return f"Error: Unable to parse parameters for tool '{function_name}'."
-                
-                try:
-                    # Call tool using FastMCP client
-                    result = await self.call_tool(function_name, function_args)
-                    return str(result)
-                except Exception as e:
-                    logger.error(f"Error calling tool: {e}", exc_info=True)
-                    return f"Error: An internal error occurred while calling tool '{function_name}'."
+                results = await asyncio.gather(*(
+                    self._invoke_one(tool_call.function.name, tool_call.function.arguments)
+                    for tool_call in message.tool_calls
+                ))
+                return "\n".join(results)
             # Handle direct responses
             else:
                 logger.info("LLM provided direct response")
@@ -245,6 +440,99 @@ class EnhancedFastMCPClient:
             logger.error(f"Error during LLM interaction or tool processing: {e}", exc_info=True)
             return f"Error: An unexpected error occurred while processing your request. ({type(e).__name__}: {e})"
     
+    async def stream_query(self, query: str) -> AsyncGenerator[str, None]:
+        """
+        Process a query using standard method, yielding the answer as the LLM produces it
+        
+        Content tokens are yielded as they arrive. Tool-call deltas are accumulated and the
+        tools run only after the provider reports finish_reason == "tool_calls"; their
+        results are yielded as the last chunk.
+        
+        Args:
+            query: User query
+            
+        Yields:
+            Answer text chunks, or a single error message
+        """
+        error = self._llm_config_error()
+        if error:
+            yield error
+            return
+        
+        model_name = self.config["llm_config"].model
+        try:
+            available_tools = await self._get_formatted_tools()
+            stream = await self._create_chat_completion(
+                model=model_name,
+                messages=self._standard_messages(query),
+                tools=list(available_tools) if available_tools else None,
+                stream=True
+            )
+            
+            tool_calls: Dict[int, Dict[str, str]] = {}  # index -> {"name", "arguments"}
+            finish_reason = None
+            # Sync SDK streams are read by one reader thread; closing the iterator stops it
+            chunks = _iter_stream(stream)
+            try:
+                async for chunk in chunks:
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    delta = choice.delta
+                    if delta.content:
+                        yield delta.content
+                    for tool_call_delta in getattr(delta, "tool_calls", None) or ():
+                        entry = tool_calls.setdefault(tool_call_delta.index, {"name": "", "arguments": ""})
+                        function = tool_call_delta.function
+                        if function is not None:
+                            if function.name:
+                                entry["name"] = function.name
+                            if function.arguments:
+                                entry["arguments"] += function.arguments
+                    if choice.finish_reason:
+                        finish_reason = choice.finish_reason
+                        break
+            finally:
+                await chunks.aclose()
+            
+            if finish_reason == "tool_calls" and tool_calls:
+                results = await asyncio.gather(*(
+                    self._invoke_one(entry["name"], entry["arguments"])
+                    for _, entry in sorted(tool_calls.items())
+                ))
+                yield "\n".join(results)
+        except Exception as e:
+            logger.error(f"Error during streaming LLM interaction or tool processing: {e}", exc_info=True)
+            yield f"Error: An unexpected error occurred while processing your request. ({type(e).__name__}: {e})"
+    
+    async def _invoke_one(self, function_name: str, raw_arguments: str) -> str:
+        """
+        Parse the arguments of one LLM tool call and execute it
+        
+        Args:
+            function_name: Name of the tool requested by the LLM
+            raw_arguments: JSON-encoded tool arguments from the LLM
+            
+        Returns:
+            Tool result as a string, or an error message
+        """
+        logger.info(f"LLM requested tool call: '{function_name}'")
+        
+        try:
+            function_args = _loads(raw_arguments)
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parsing tool arguments: {e}")
+            return f"Error: Unable to parse parameters for tool '{function_name}'."
+        
+        try:
+            # Call tool using FastMCP client
+            async with self._call_semaphore:
+                result = await self.call_tool(function_name, function_args)
+            return str(result)
+        except Exception as e:
+            logger.error(f"Error calling tool: {e}", exc_info=True)
+            return f"Error: An internal error occurred while calling tool '{function_name}'."
+    
     async def process_query_with_react(self, query: str) -> str:
         """
         Process a query using ReAct mode
@@ -364,15 +652,19 @@ class EnhancedFastMCPClient:
         Returns:
             Query result in the appropriate format
         """
-        # Non-streaming processing
+        # Non-streaming processing, served from the query cache when enabled
         if not stream_type:
-            if mode == "react":
-                if include_trace:
-                    return await self.process_query_with_trace(query)
-                else:
-                    return await self.process_query_with_react(query)
-            else:
-                return await self.process_query(query)
+            if self._query_cache is None:
+                return await self._process_non_streaming(query, mode, include_trace)
+            scope = (mode == "react", include_trace)
+            hit, result, vector = await self._query_cache.lookup(query, scope)
+            if hit:
+                return result
+            result = await self._process_non_streaming(query, mode, include_trace)
+            answer = result[0] if isinstance(result, tuple) else result
+            if isinstance(answer, str) and not answer.startswith("Error:"):
+                self._query_cache.store(query, scope, result, vector)
+            return result
         # Step-level streaming
         elif stream_type == "step":
             return self.stream_process_query(query)
@@ -382,73 +674,116 @@ class EnhancedFastMCPClient:
         else:
             raise ValueError(f"Unsupported stream type: {stream_type}")
     
+    async def _run_monitors(self) -> None:
+        """
+        Supervisor running the monitor loops; cancelling it cancels every loop
+        
+        A loop that fails does not cancel the others, and its exit is logged immediately.
+        """
+        logger.info(f"Starting heartbeat monitor. Interval: {self.heartbeat_interval_seconds}s")
+        heartbeat = asyncio.create_task(self._heartbeat_loop(), name="heartbeat monitor")
+        logger.info(f"Starting reconnection monitor. Interval: {self.reconnection_interval_seconds}s")
+        reconnection = asyncio.create_task(self._reconnection_loop(), name="reconnection monitor")
+        for task in (heartbeat, reconnection):
+            task.add_done_callback(self._log_monitor_exit)
+        await asyncio.gather(heartbeat, reconnection, return_exceptions=True)
+    
+    @staticmethod
+    def _log_monitor_exit(task: asyncio.Task) -> None:
+        """Log a monitor loop exiting"""
+        if task.cancelled():
+            logger.info(f"{task.get_name()} stopped.")
+        elif task.exception() is not None:
+            logger.error(f"{task.get_name()} exited with error: {task.exception()!r}", exc_info=task.exception())
+        else:
+            logger.warning(f"{task.get_name()} exited unexpectedly.")
+    
+    async def _process_non_streaming(self, query: str, mode: str, include_trace: bool) -> Union[str, Tuple[str, Optional[List[Dict[str, Any]]]]]:
+        """Run a non-streaming query in the requested mode"""
+        if mode == "react":
+            if include_trace:
+                return await self.process_query_with_trace(query)
+            return await self.process_query_with_react(query)
+        return await self.process_query(query)
+    
     async def start_monitoring(self) -> None:
         """Start health monitoring"""
-        # Start heartbeat monitor
-        if self.heartbeat_task is None or self.heartbeat_task.done():
-            logger.info(f"Starting heartbeat monitor. Interval: {self.heartbeat_interval.total_seconds()}s")
-            self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
-        # Start reconnection monitor
-        if self.reconnection_task is None or self.reconnection_task.done():
-            logger.info(f"Starting reconnection monitor. Interval: {self.reconnection_interval.total_seconds()}s")
-            self.reconnection_task = asyncio.create_task(self._reconnection_loop())
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._run_monitors())
     
     async def stop_monitoring(self) -> None:
         """Stop health monitoring"""
-        tasks_to_stop = [self.heartbeat_task, self.reconnection_task]
-        task_names = ["Heartbeat", "Reconnection"]
-        for i, task in enumerate(tasks_to_stop):
-            name = task_names[i]
-            if task and not task.done():
-                task.cancel()
-                try: 
-                    await task
-                except asyncio.CancelledError: 
-                    logger.info(f"{name} monitor task cancelled.")
-                except Exception as e: 
-                    logger.error(f"Error during {name} task cancellation: {e}", exc_info=True)
-        self.heartbeat_task = None
-        self.reconnection_task = None
+        task, self._monitor_task = self._monitor_task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            logger.info("Monitor tasks cancelled.")
+        except Exception as e:
+            logger.error(f"Error during monitor task cancellation: {e}", exc_info=True)
     
     async def _heartbeat_loop(self) -> None:
         """Heartbeat monitoring loop"""
         while True:
-            await asyncio.sleep(self.heartbeat_interval.total_seconds())
+            await asyncio.sleep(self.heartbeat_interval_seconds)
             await self._check_service_health()
     
     async def _check_service_health(self) -> None:
         """Check service health"""
         logger.debug("Running periodic health check...")
-        try:
-            await self.ping()
+        # ping() reports failure through its return value rather than raising
+        if await self.ping():
             logger.debug(f"Health check SUCCESS for: {self.base_url}")
-        except Exception as e:
-            logger.warning(f"Health check FAILED for {self.base_url}: {e}")
+        else:
+            logger.warning(f"Health check FAILED for {self.base_url}")
             self.pending_reconnection.add(self.base_url)
     
     async def _reconnection_loop(self) -> None:
         """Reconnection loop"""
         while True:
-            await asyncio.sleep(self.reconnection_interval.total_seconds())
+            await asyncio.sleep(self.reconnection_interval_seconds)
             await self._attempt_reconnections()
     
+    def _record_reconnect_failure(self, url: str) -> None:
+        """Record a failed reconnection and schedule the next retry with exponential backoff plus jitter"""
+        attempt = self._reconnect_backoff.get(url, (0, 0.0))[0]
+        delay = min(self.RECONNECT_BACKOFF_MAX_SECONDS, self.reconnection_interval_seconds * (2 ** min(attempt, 16)))
+        next_retry_at = time.monotonic() + delay + random.uniform(0, self.RECONNECT_JITTER_SECONDS)
+        self._reconnect_backoff[url] = (attempt + 1, next_retry_at)
+    
     async def _attempt_reconnections(self) -> None:
-        """Attempt reconnections"""
+        """Attempt reconnections for pending URLs whose backoff has elapsed"""
         if not self.pending_reconnection:
             return  # No pending reconnections
         
-        # Create copy to avoid modification during iteration
-        urls_to_retry = list(self.pending_reconnection)
-        logger.info(f"Attempting to reconnect {len(urls_to_retry)} service(s): {urls_to_retry}")
-        
-        for url in urls_to_retry:
-            try:
-                await self.ping()
-                logger.info(f"Reconnection successful for: {url}")
-                self.pending_reconnection.discard(url)
-            except Exception as e:
-                logger.warning(f"Reconnection attempt failed for {url}: {e}")
-                # Keep URL in pending_reconnection for next cycle
+        # Take the pending set as-is; failures during the attempt land in a fresh set and
+        # URLs that did not recover are merged back at the end
+        pending, self.pending_reconnection = self.pending_reconnection, set()
+        try:
+            now = time.monotonic()
+            urls_to_retry = [url for url in pending
+                             if self._reconnect_backoff.get(url, (0, 0.0))[1] <= now]
+            if not urls_to_retry:
+                return
+            logger.info(f"Attempting to reconnect {len(urls_to_retry)} service(s): {urls_to_retry}")
+            
+            # Probe all due URLs concurrently
+            results = await asyncio.gather(*(self.ping() for _ in urls_to_retry), return_exceptions=True)
+            for url, result in zip(urls_to_retry, results):
+                if result is True:
+                    logger.info(f"Reconnection successful for: {url}")
+                    pending.discard(url)
+                    self._reconnect_backoff.pop(url, None)
+                    # The server may have restarted with a different tool set
+                    self.invalidate_tools_cache()
+                else:
+                    logger.warning(f"Reconnection attempt failed for {url}: {result}")
+                    # Keep URL pending and back off before the next retry
+                    self._record_reconnect_failure(url)
+        finally:
+            self.pending_reconnection |= pending
     
     async def cleanup(self) -> None:
         """Clean up resources"""
@@ -10,17 +10,31 @@ MCP服务编排器
 
 import asyncio
 import logging
+import random
+import time
 from typing import Dict, List, Any, Optional, Tuple, Set, Union, AsyncGenerator
 from datetime import datetime, timedelta
 from urllib.parse import urljoin
 
+import httpx
+
 from core.registry import ServiceRegistry
+from core.transport import close_shared_http_client, create_pooled_http_client
 from fastmcp import Client
-from fastmcp.client.transports import MCPConfigTransport
+from fastmcp.client.transports import MCPConfigTransport, StreamableHttpTransport
 from plugins.json_mcp import MCPConfig
 
 logger = logging.getLogger(__name__)
 
+class ServiceConnectionError(Exception):
+    """连接MCP服务失败的基类"""
+
+class UpstreamBadGatewayError(ServiceConnectionError):
+    """上游服务返回502 Bad Gateway"""
+
+class TransientNetworkError(ServiceConnectionError):
+    """网络层错误（连接失败、超时等），可通过自动重连恢复"""
+
 class MCPOrchestrator:
     """
     MCP服务编排器
@@ -28,6 +42,10 @@ class MCPOrchestrator:
     负责管理服务连接、工具调用和查询处理。
     """
     
+    # 重连指数退避的上限（秒），以及为错开重连风暴加入的随机抖动范围（秒）
+    RECONNECT_BACKOFF_MAX_SECONDS = 600.0
+    RECONNECT_JITTER_SECONDS = 5.0
+    
     def __init__(self, config: Dict[str, Any], registry: ServiceRegistry):
         """
         初始化MCP编排器
@@ -39,128 +57,299 @@ class MCPOrchestrator:
         self.config = config
         self.registry = registry
         self.clients: Dict[str, Client] = {}  # key为mcpServers的服务名
+        self._loaded_servers: Dict[str, Dict[str, Any]] = {}  # 上次加载的mcpServers配置，用于增量比较
+        self._url_to_name: Dict[str, str] = {}  # 服务URL或服务名 -> 服务名，供disconnect_service直接查找
         self.pending_reconnection: Set[str] = set()
+        self._reconnect_backoff: Dict[str, Tuple[int, float]] = {}  # 服务名 -> (连续失败次数, 下次重试的monotonic时间)
         self.react_agent = None
         
         # 从配置中获取心跳和重连设置
         timing_config = config.get("timing", {})
-        self.heartbeat_interval = timedelta(seconds=int(timing_config.get("heartbeat_interval_seconds", 60)))
-        self.heartbeat_timeout = timedelta(seconds=int(timing_config.get("heartbeat_timeout_seconds", 180)))
-        self.reconnection_interval = timedelta(seconds=int(timing_config.get("reconnection_interval_seconds", 60)))
+        # 以浮点秒数保存，timedelta形式通过下方的属性提供以保持兼容
+        self.heartbeat_interval_seconds = float(timing_config.get("heartbeat_interval_seconds", 60))
+        self.heartbeat_timeout_seconds = float(timing_config.get("heartbeat_timeout_seconds", 180))
+        self.reconnection_interval_seconds = float(timing_config.get("reconnection_interval_seconds", 60))
         self.http_timeout = int(timing_config.get("http_timeout_seconds", 10))
         
-        # 监控任务
-        self.heartbeat_task = None
-        self.reconnection_task = None
+        # 监控任务：并发运行各监视循环的监督任务
+        self._monitor_task: Optional[asyncio.Task] = None
         self.mcp_config = MCPConfig()
     
+    @property
+    def heartbeat_interval(self) -> timedelta:
+        """心跳间隔（timedelta形式）"""
+        return timedelta(seconds=self.heartbeat_interval_seconds)
+    
+    @property
+    def heartbeat_timeout(self) -> timedelta:
+        """心跳超时（timedelta形式）"""
+        return timedelta(seconds=self.heartbeat_timeout_seconds)
+    
+    @property
+    def reconnection_interval(self) -> timedelta:
+        """重连间隔（timedelta形式）"""
+        return timedelta(seconds=self.reconnection_interval_seconds)
+    
     async def setup(self):
         """初始化编排器资源"""
         logger.info("Setting up MCP Orchestrator...")
+        self._initialize_react_agent()
         await self.load_from_config()
     
+    def _initialize_react_agent(self):
+        """配置了llm_config时创建编排器级别的ReActAgent
+        
+        所有服务共享同一个代理，工具通过注册表查找对应会话，registry只在创建时设置一次。
+        """
+        llm_config = self.config.get("llm_config")
+        if not llm_config or self.react_agent is not None:
+            return
+        # 延迟导入，未配置LLM时不加载LLM SDK
+        from plugins.llm_factory import create_llm_client
+        from plugins.react_agent import ReActAgent
+        try:
+            llm_client = create_llm_client(llm_config)
+            if llm_client:
+                self.react_agent = ReActAgent(llm_client, None, self.config, registry=self.registry)
+                logger.info("Orchestrator-level ReAct agent initialized.")
+            else:
+                logger.warning("LLM client initialization failed, ReAct agent unavailable.")
+        except Exception as e:
+            logger.error(f"ReAct agent initialization failed: {e}", exc_info=True)
+    
     async def load_from_config(self):
-        """从mcp.json加载所有服务，使用MCPConfigTransport批量连接"""
-        logger.info("Loading all MCP services from mcp.json via MCPConfigTransport...")
+        """从mcp.json加载所有服务，每个服务使用独立的MCPConfigTransport客户端
+        
+        与上次加载的配置做增量比较：只移除已删除的服务、为新增或配置变化的服务创建客户端，
+        配置未变化的服务保留原有客户端和注册信息，不会因其他服务的增删而重建。
+        """
+        logger.info("Loading MCP services from mcp.json via MCPConfigTransport...")
         config_dict = self.mcp_config.load_config()
-        transport = MCPConfigTransport(config_dict)
-        client = Client(transport)
-        self.clients.clear()
-        self.registry.clear()
-        for name, server in config_dict.get("mcpServers", {}).items():
+        servers = config_dict.get("mcpServers", {})
+        
+        # 移除已删除的服务
+        for name in [name for name in self.clients if name not in servers]:
+            self.clients.pop(name, None)
+            self._loaded_servers.pop(name, None)
+            self.registry.remove_service(name)
+            logger.info(f"Unregistered service: {name}")
+        
+        # 重建URL/服务名到服务名的反向索引；同一URL对应多个服务时保留第一个，与原先顺序扫描一致
+        url_to_name: Dict[str, str] = {}
+        for name, server in servers.items():
+            url = server.get("url")
+            if url:
+                url_to_name.setdefault(url, name)
+        url_to_name.update((name, name) for name in servers)
+        self._url_to_name = url_to_name
+        
+        # 注册新增或配置变化的服务
+        for name, server in servers.items():
+            if name in self.clients and self._loaded_servers.get(name) == server:
+                continue
             try:
+                client = Client(self._create_transport(name, server))
                 self.clients[name] = client
+                self._loaded_servers[name] = dict(server)
                 self.registry.add_service(name, client, [], name)
                 logger.info(f"Registered service: {name} -> {server.get('url', name)}")
             except Exception as e:
                 logger.error(f"Failed to register service {name}: {e}")
     
+    async def _run_monitors(self):
+        """监督任务：并发运行心跳和重连循环，取消它即取消所有循环
+        
+        一个循环异常退出不会取消其他循环，退出时立即记录日志。
+        """
+        logger.info(f"Starting heartbeat monitor. Interval: {self.heartbeat_interval_seconds}s")
+        heartbeat = asyncio.create_task(self._heartbeat_loop(), name="heartbeat monitor")
+        logger.info(f"Starting reconnection monitor. Interval: {self.reconnection_interval_seconds}s")
+        reconnection = asyncio.create_task(self._reconnection_loop(), name="reconnection monitor")
+        for task in (heartbeat, reconnection):
+            task.add_done_callback(self._log_monitor_exit)
+        await asyncio.gather(heartbeat, reconnection, return_exceptions=True)
+    
+    @staticmethod
+    def _log_monitor_exit(task: asyncio.Task) -> None:
+        """记录监视循环的退出"""
+        if task.cancelled():
+            logger.info(f"{task.get_name()} stopped.")
+        elif task.exception() is not None:
+            logger.error(f"{task.get_name()} exited with error: {task.exception()!r}", exc_info=task.exception())
+        else:
+            logger.warning(f"{task.get_name()} exited unexpectedly.")
+    
+    @staticmethod
+    def _create_transport(name: str, server: Dict[str, Any]) -> Union[StreamableHttpTransport, MCPConfigTransport]:
+        """为单个服务创建传输
+        
+        streamable-http服务直接使用带连接池、TCP_NODELAY的HTTP客户端；
+        其他传输类型（sse、stdio等）交给MCPConfigTransport处理。
+        """
+        url = server.get("url")
+        if url and server.get("transport", "streamable-http") == "streamable-http":
+            try:
+                return StreamableHttpTransport(
+                    url,
+                    headers=server.get("headers") or None,
+                    httpx_client_factory=create_pooled_http_client,
+                )
+            except TypeError:
+                # 旧版fastmcp不支持httpx_client_factory
+                pass
+        return MCPConfigTransport({"mcpServers": {name: server}})
+    
     async def start_monitoring(self):
         """启动后台健康检查和重连监视器"""
         logger.info("Starting monitoring tasks...")
-        
-        # 启动心跳监视器
-        if self.heartbeat_task is None or self.heartbeat_task.done():
-            logger.info(f"Starting heartbeat monitor. Interval: {self.heartbeat_interval.total_seconds()}s")
-            self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
-        
-        # 启动重连监视器
-        if self.reconnection_task is None or self.reconnection_task.done():
-            logger.info(f"Starting reconnection monitor. Interval: {self.reconnection_interval.total_seconds()}s")
-            self.reconnection_task = asyncio.create_task(self._reconnection_loop())
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._run_monitors())
+    
+    async def stop_monitoring(self):
+        """停止后台健康检查和重连监视器"""
+        task, self._monitor_task = self._monitor_task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            logger.info("Monitor tasks cancelled.")
+        except Exception as e:
+            logger.error(f"Error during monitor task cancellation: {e}", exc_info=True)
     
     async def _heartbeat_loop(self):
         """后台循环，用于定期健康检查"""
         while True:
-            await asyncio.sleep(self.heartbeat_interval.total_seconds())
+            await asyncio.sleep(self.heartbeat_interval_seconds)
             await self._check_services_health()
     
     async def _check_services_health(self):
-        """检查所有服务的健康状态"""
+        """检查所有服务的健康状态
+        
+        所有服务的检查并发进行，耗时取决于最慢的一次检查而不是所有检查之和。
+        """
         logger.debug("Running periodic health check for all services...")
-        for name in self.clients:
-            try:
-                is_healthy = await self.is_service_healthy(name)
-                if is_healthy:
-                    logger.debug(f"Health check SUCCESS for: {name}")
-                    self.registry.update_service_health(name)
-                else:
-                    logger.warning(f"Health check FAILED for {name}")
-                    self.pending_reconnection.add(name)
-            except Exception as e:
-                logger.warning(f"Health check error for {name}: {e}")
+        names = list(self.clients)
+        results = await asyncio.gather(*(self.is_service_healthy(name) for name in names), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Health check error for {name}: {result}")
+                self.pending_reconnection.add(name)
+            elif result:
+                logger.debug(f"Health check SUCCESS for: {name}")
+                self.registry.update_service_health(name)
+            else:
+                logger.warning(f"Health check FAILED for {name}")
                 self.pending_reconnection.add(name)
     
     async def _reconnection_loop(self):
         """定期尝试重新连接服务的后台循环"""
         while True:
-            await asyncio.sleep(self.reconnection_interval.total_seconds())
+            await asyncio.sleep(self.reconnection_interval_seconds)
             await self._attempt_reconnections()
     
+    def _record_reconnect_failure(self, name: str) -> None:
+        """记录一次重连失败，按指数退避加随机抖动计算下次重试时间"""
+        attempt = self._reconnect_backoff.get(name, (0, 0.0))[0]
+        delay = min(self.RECONNECT_BACKOFF_MAX_SECONDS, self.reconnection_interval_seconds * (2 ** min(attempt, 16)))
+        next_retry_at = time.monotonic() + delay + random.uniform(0, self.RECONNECT_JITTER_SECONDS)
+        self._reconnect_backoff[name] = (attempt + 1, next_retry_at)
+    
     async def _attempt_reconnections(self):
-        """尝试重新连接所有待重连的服务"""
+        """尝试重新连接待重连的服务
+        
+        连续失败的服务按指数退避延后重试，未到重试时间的服务本轮跳过。
+        """
         if not self.pending_reconnection:
             return  # 如果没有待重连的服务，跳过
         
-        # 创建副本以避免迭代过程中修改集合的问题
-        names_to_retry = list(self.pending_reconnection)
-        logger.info(f"Attempting to reconnect {len(names_to_retry)} service(s): {names_to_retry}")
-        
-        for name in names_to_retry:
-            try:
-                # 尝试重新连接
-                success, message = await self.connect_service(name, name)
-                if success:
-                    logger.info(f"Reconnection successful for: {name}")
-                    self.pending_reconnection.discard(name)
-                else:
-                    logger.warning(f"Reconnection attempt failed for {name}: {message}")
-                    # 保持name在pending_reconnection中，等待下一个周期
-            except Exception as e:
-                logger.warning(f"Reconnection attempt failed for {name}: {e}")
+        # 取出当前集合直接迭代，期间新失败的服务进入新集合；未恢复的服务在结束时并回
+        pending, self.pending_reconnection = self.pending_reconnection, set()
+        recovered: Set[str] = set()
+        now = time.monotonic()
+        try:
+            for name in pending:
+                if self._reconnect_backoff.get(name, (0, 0.0))[1] > now:
+                    continue  # 仍在退避中，本轮跳过
+                logger.info(f"Attempting to reconnect service: {name}")
+                try:
+                    # 尝试重新连接
+                    success, message = await self.connect_service(name, name)
+                    if success:
+                        logger.info(f"Reconnection successful for: {name}")
+                        recovered.add(name)
+                        self._reconnect_backoff.pop(name, None)
+                    else:
+                        logger.warning(f"Reconnection attempt failed for {name}: {message}")
+                        # 保留在待重连集合中，退避后重试
+                        self._record_reconnect_failure(name)
+                except Exception as e:
+                    logger.warning(f"Reconnection attempt failed for {name}: {e}")
+                    self._record_reconnect_failure(name)
+        finally:
+            pending -= recovered
+            self.pending_reconnection |= pending
     
     async def connect_service(self, url: str, name: str = "") -> Tuple[bool, str]:
-        """添加服务到mcp.json并刷新所有连接"""
+        """
+        添加服务到mcp.json并刷新所有连接，然后探测新服务是否可达
+        
+        Raises:
+            UpstreamBadGatewayError: 上游返回502
+            TransientNetworkError: 网络连接失败或超时
+        """
         logger.info(f"Registering new service: {url}, name: {name}")
         if not name:
             name = url
         ok = self.mcp_config.add_service({"name": name, "url": url})
         if ok:
             await self.load_from_config()
+            await self._probe_service(name)
             return True, f"Service {name} registered and all services refreshed."
         else:
             return False, f"Failed to add service {name} to mcp.json."
     
+    async def _probe_service(self, name: str) -> None:
+        """连接服务并ping一次，确认服务可达
+        
+        load_from_config只创建客户端对象，不做网络I/O，连接错误只会在这里出现。
+        
+        Raises:
+            UpstreamBadGatewayError: 上游返回502
+            TransientNetworkError: 网络连接失败或超时
+        """
+        client = self.clients.get(name)
+        if client is None:
+            return
+        try:
+            async with client:
+                await asyncio.wait_for(client.ping(), timeout=self.http_timeout)
+        except Exception as e:
+            error = self._classify_connection_error(name, e)
+            if error is None:
+                raise
+            raise error from e
+    
+    @staticmethod
+    def _classify_connection_error(name: str, error: BaseException) -> Optional[ServiceConnectionError]:
+        """按异常类型归类连接错误；fastmcp可能包装底层异常，因此沿__cause__/__context__链查找"""
+        seen: Set[int] = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, httpx.HTTPStatusError):
+                if error.response.status_code == 502:
+                    return UpstreamBadGatewayError(f"Service {name} returned 502 Bad Gateway")
+                return None
+            if isinstance(error, (httpx.TransportError, OSError, asyncio.TimeoutError)):
+                return TransientNetworkError(f"Connection failed for service {name}: {error}")
+            error = error.__cause__ or error.__context__
+        return None
+    
     async def disconnect_service(self, url: str) -> bool:
         """从mcp.json移除服务并刷新所有连接"""
         logger.info(f"Removing service: {url}")
-        config = self.mcp_config.load_config()
-        servers = config.get("mcpServers", {})
-        name_to_remove = None
-        for name, server in servers.items():
-            if server.get("url") == url or name == url:
-                name_to_remove = name
-                break
+        name_to_remove = self._url_to_name.get(url)
         if name_to_remove:
             ok = self.mcp_config.remove_service(name_to_remove)
             if ok:
@@ -212,22 +401,34 @@ class MCPOrchestrator:
         Returns:
             根据参数返回不同类型的结果
         """
+        # 空查询无需调用LLM，直接返回空结果（流式请求返回只含最终帧的生成器）
+        if not query.strip():
+            if stream_type == "step":
+                return self.stream_process_query(query)
+            if stream_type == "token":
+                return self.stream_process_query_token(query)
+            if stream_type:
+                raise ValueError(f"不支持的流式类型: {stream_type}")
+            return ("", None) if mode == "react" and include_trace else ""
+        
         logger.info(f"Processing unified query: '{query[:50]}...', mode: {mode}, stream: {stream_type}")
         
-        # 检查是否有ReAct代理
+        # 检查是否有ReAct代理（在setup中创建，所有服务共享）
         if mode == "react" and not self.react_agent:
-            # 找到具有ReAct功能的客户端
-            for client in self.clients.values():
-                if client.react_agent:
-                    self.react_agent = client.react_agent
-                    # 确保react_agent有访问registry的权限
-                    self.react_agent.registry = self.registry
-                    logger.info("Found and using ReAct agent from a connected service.")
-                    break
-            
-            if not self.react_agent:
-                logger.warning("No ReAct agent available. Falling back to standard mode.")
-                mode = "standard"
+            logger.warning("No ReAct agent available. Falling back to standard mode.")
+            mode = "standard"
+        
+        # ReAct模式直接由共享代理处理，工具通过注册表调用
+        if mode == "react":
+            if stream_type == "step":
+                return self.stream_process_query(query)
+            if stream_type == "token":
+                return self.stream_process_query_token(query)
+            if stream_type:
+                raise ValueError(f"不支持的流式类型: {stream_type}")
+            # 轨迹按本次调用请求记录，共享代理不保存请求级状态
+            result, trace = await self.react_agent.process_query(query, trace=include_trace)
+            return (result, trace) if include_trace else result
         
         # 选择客户端进行处理
         if self.clients:
@@ -256,8 +457,17 @@ class MCPOrchestrator:
         Yields:
             步骤级响应流
         """
+        if not query.strip():
+            yield {"thinking_step": None, "is_final": True, "result": ""}
+            return
+        
         logger.info(f"Stream processing query (step-level): '{query[:50]}...'")
         
+        if self.react_agent:
+            async for response in self.react_agent.stream_process_query(query):
+                yield response
+            return
+        
         if not self.clients:
             yield {
                 "thinking_step": None,
@@ -283,8 +493,17 @@ class MCPOrchestrator:
         Yields:
             令牌级响应流
         """
+        if not query.strip():
+            yield {"token_chunk": None, "is_final": True, "result": ""}
+            return
+        
         logger.info(f"Stream processing query (token-level): '{query[:50]}...'")
         
+        if self.react_agent:
+            async for response in self.react_agent.stream_process_query_token(query):
+                yield response
+            return
+        
         if not self.clients:
             yield {
                 "token_chunk": None,
@@ -305,21 +524,13 @@ class MCPOrchestrator:
         logger.info("Cleaning up orchestrator resources...")
         
         # 停止监控任务
-        tasks_to_stop = [self.heartbeat_task, self.reconnection_task]
-        task_names = ["Heartbeat", "Reconnection"]
-        for i, task in enumerate(tasks_to_stop):
-            name = task_names[i]
-            if task and not task.done():
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    logger.info(f"{name} monitor task cancelled.")
-                except Exception as e:
-                    logger.error(f"Error during {name} task cancellation: {e}", exc_info=True)
+        await self.stop_monitoring()
         
         # 断开所有服务连接
         for name in list(self.clients.keys()):
             await self.disconnect_service(name)
         
+        # 关闭StreamableHTTPTransport共享的连接池
+        await close_shared_http_client()
+        
         logger.info("Orchestrator cleanup finished.") 
@@ -1,11 +1,18 @@
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import logging
+import threading
 from datetime import datetime
 from typing import Dict, Any, Optional, Tuple, List, Set, TypeVar, Generic, Protocol
 
 logger = logging.getLogger(__name__)
 
+# Distinguishes "key absent" from a stored None in single-lookup dict reads
+_MISSING = object()
+
+# JSON Schema keywords reported as parameter constraints in detailed tool info
+_CONSTRAINT_KEYS = frozenset({"minimum", "maximum", "minLength", "maxLength", "pattern", "enum", "format", "ge", "le"})
+
 # 定义一个协议，表示任何具有call_tool方法的会话类型
 class SessionProtocol(Protocol):
     async def call_tool(self, tool_name: str, tool_args: Dict[str, Any]) -> Any:
@@ -15,67 +22,187 @@ class SessionProtocol(Protocol):
 SessionType = TypeVar('SessionType')
 
 class ServiceRegistry:
-    """Manages the state of connected services and their tools."""
+    """Manages the state of connected services and their tools.
+
+    Writes are copy-on-write: mutators build new dicts and publish them with a single
+    attribute rebind, so readers never take a lock and never see a half-applied update.
+    Writers are serialized by ``_write_lock``.
+
+    All registry maps are plain ``dict`` objects read on every tool call. If one ever needs a
+    typed wrapper, subclass ``dict`` rather than ``collections.UserDict``, whose per-access
+    method indirection would land on these hot paths.
+    """
     def __init__(self):
         self.sessions: Dict[str, Any] = {}  # server_url -> session
         self.service_health: Dict[str, datetime] = {} # server_url -> last_heartbeat_time
+        self._service_health_str: Dict[str, str] = {} # server_url -> last_heartbeat_time formatted once at update
         self.tool_cache: Dict[str, Dict[str, Any]] = {} # tool_name -> tool_definition
+        self.annotated_tool_cache: Dict[str, Dict[str, Any]] = {} # tool_name -> tool_definition annotated with its service
+        self.detailed_tool_cache: Dict[str, Dict[str, Any]] = {} # tool_name -> parameter details extracted from the schema
         self.tool_to_session_map: Dict[str, Any] = {} # tool_name -> session
+        self.tool_to_url_map: Dict[str, str] = {} # tool_name -> server_url
+        self.service_tools: Dict[str, Tuple[str, ...]] = {}  # server_url -> tool names accepted for it, in registration order
         self.service_names: Dict[str, str] = {}  # server_url -> service_name
+        self._display_labels: Dict[str, str] = {}  # server_url -> "service_name (server_url)" for log messages
+        self.service_tool_summaries: Dict[str, List[Tuple[str, str]]] = {}  # server_url -> [(tool_name, description)]
+        # Memoized get_all_tool_info result, tagged with the tool_cache it was built from
+        self._all_tool_info_cache: Optional[Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]] = None
+        self._write_lock = threading.RLock()
         logger.info("ServiceRegistry initialized.")
 
     def add_service(self, url: str, session: Any, tools: List[Tuple[str, Dict[str, Any]]], name: str = "") -> List[str]:
         """Adds a new service, its session, and tools to the registry. Returns added tool names."""
-        print(f"[DEBUG][add_service] url={url}, id(session)={id(session)}")
-        if url in self.sessions:
-            logger.warning(f"Attempting to add already registered service: {url}. Removing old service before overwriting.")
-            self.remove_service(url)
+        logger.debug("add_service: url=%s, id(session)=%s", url, id(session))
+        with self._write_lock:
+            if url in self.sessions:
+                logger.warning(f"Attempting to add already registered service: {url}. Removing old service before overwriting.")
+                self.remove_service(url)
 
-        self.sessions[url] = session
-        self.service_health[url] = datetime.now() # Mark healthy on add
-        
-        # Store service name
-        display_name = name or url
-        self.service_names[url] = display_name
-
-        added_tool_names = []
-        for tool_name, tool_definition in tools:
-             if tool_name in self.tool_cache:
-                 logger.warning(f"Tool name conflict: '{tool_name}' from {display_name} ({url}) conflicts with existing tool. Skipping this tool.")
-                 continue
-             self.tool_cache[tool_name] = tool_definition
-             self.tool_to_session_map[tool_name] = session
-             added_tool_names.append(tool_name)
-        logger.info(f"Service '{display_name}' ({url}) added with tools: {added_tool_names}")
+            sessions = dict(self.sessions)
+            service_health = dict(self.service_health)
+            service_health_str = dict(self._service_health_str)
+            service_names = dict(self.service_names)
+            display_labels = dict(self._display_labels)
+            tool_cache = dict(self.tool_cache)
+            annotated_tool_cache = dict(self.annotated_tool_cache)
+            detailed_tool_cache = dict(self.detailed_tool_cache)
+            tool_to_session_map = dict(self.tool_to_session_map)
+            tool_to_url_map = dict(self.tool_to_url_map)
+            service_tool_summaries = dict(self.service_tool_summaries)
+            service_tools = dict(self.service_tools)
+
+            sessions[url] = session
+            now = datetime.now() # Mark healthy on add
+            service_health[url] = now
+            service_health_str[url] = str(now)
+
+            # Store service name
+            display_name = name or url
+            service_names[url] = display_name
+            display_label = f"{display_name} ({url})"
+            display_labels[url] = display_label
+
+            added_tool_names = []
+            tool_summaries = []
+            for tool_name, tool_definition in tools:
+                 if tool_name in tool_cache:
+                     logger.warning(f"Tool name conflict: '{tool_name}' from {display_name} ({url}) conflicts with existing tool. Skipping this tool.")
+                     continue
+                 tool_cache[tool_name] = tool_definition
+                 annotated_tool_cache[tool_name] = self._annotate_tool(tool_definition, url, display_name)
+                 detailed_tool_cache[tool_name] = self._build_detailed_tool_info(tool_name, tool_definition)
+                 tool_to_session_map[tool_name] = session
+                 tool_to_url_map[tool_name] = url
+                 added_tool_names.append(tool_name)
+                 tool_summaries.append((tool_name, tool_definition.get("function", {}).get("description", "")))
+            service_tool_summaries[url] = tool_summaries
+            service_tools[url] = tuple(added_tool_names)
+
+            # Publish tools before the session so a reader that sees the service also sees its tools
+            self.tool_cache = tool_cache
+            self.annotated_tool_cache = annotated_tool_cache
+            self.detailed_tool_cache = detailed_tool_cache
+            self.tool_to_session_map = tool_to_session_map
+            self.tool_to_url_map = tool_to_url_map
+            self.service_tools = service_tools
+            self.service_tool_summaries = service_tool_summaries
+            self.service_names = service_names
+            self._display_labels = display_labels
+            self.service_health = service_health
+            self._service_health_str = service_health_str
+            self.sessions = sessions
+            self._invalidate_tool_lists()
+        logger.info("Service %s added with tools: %s", display_label, added_tool_names)
         return added_tool_names
 
     def remove_service(self, url: str) -> Optional[Any]:
         """Removes a service and its associated tools from the registry."""
-        session = self.sessions.pop(url, None) # Use pop with default None
-        display_name = self.service_names.get(url, url)
-        
-        if not session:
-            logger.warning(f"Attempted to remove non-existent service: {display_name} ({url})")
-            return None
+        with self._write_lock:
+            session = self.sessions.get(url)
+            display_label = self.get_display_label(url)
+
+            if not session:
+                logger.warning(f"Attempted to remove non-existent service: {display_label}")
+                return None
+
+            sessions = dict(self.sessions)
+            del sessions[url]
+            service_health = dict(self.service_health)
+            service_health.pop(url, None)
+            service_health_str = dict(self._service_health_str)
+            service_health_str.pop(url, None)
+            service_names = dict(self.service_names)
+            service_names.pop(url, None)
+            display_labels = dict(self._display_labels)
+            display_labels.pop(url, None)
+            service_tool_summaries = dict(self.service_tool_summaries)
+            service_tool_summaries.pop(url, None)
+            service_tools = dict(self.service_tools)
+
+            # The service's own tool list makes removal O(k) instead of a scan over every tool
+            tools_to_remove = service_tools.pop(url, ())
+            tool_cache = self.tool_cache
+            annotated_tool_cache = self.annotated_tool_cache
+            detailed_tool_cache = self.detailed_tool_cache
+            tool_to_session_map = self.tool_to_session_map
+            tool_to_url_map = self.tool_to_url_map
+            if tools_to_remove:
+                logger.info("Removing tools from registry associated with %s: %s", display_label, tools_to_remove)
+                tool_cache = dict(tool_cache)
+                annotated_tool_cache = dict(annotated_tool_cache)
+                detailed_tool_cache = dict(detailed_tool_cache)
+                tool_to_session_map = dict(tool_to_session_map)
+                tool_to_url_map = dict(tool_to_url_map)
+                for tool_name in tools_to_remove:
+                    tool_cache.pop(tool_name, None)
+                    annotated_tool_cache.pop(tool_name, None)
+                    detailed_tool_cache.pop(tool_name, None)
+                    tool_to_session_map.pop(tool_name, None)
+                    tool_to_url_map.pop(tool_name, None)
 
-        # Remove health record and service name
-        if url in self.service_health:
-            del self.service_health[url]
-        if url in self.service_names:
-            del self.service_names[url]
-
-        # Remove associated tools efficiently
-        tools_to_remove = [name for name, owner_session in self.tool_to_session_map.items() if owner_session == session]
-        if tools_to_remove:
-            logger.info(f"Removing tools from registry associated with {display_name} ({url}): {tools_to_remove}")
-            for tool_name in tools_to_remove:
-                # Check existence before deleting, although keys should be consistent
-                if tool_name in self.tool_cache: del self.tool_cache[tool_name]
-                if tool_name in self.tool_to_session_map: del self.tool_to_session_map[tool_name]
-
-        logger.info(f"Service '{display_name}' ({url}) removed from registry.")
+            # Unpublish the session first so readers stop routing to it before its tools disappear
+            self.sessions = sessions
+            self.service_health = service_health
+            self._service_health_str = service_health_str
+            self.service_names = service_names
+            self._display_labels = display_labels
+            self.service_tool_summaries = service_tool_summaries
+            self.service_tools = service_tools
+            self.tool_cache = tool_cache
+            self.annotated_tool_cache = annotated_tool_cache
+            self.detailed_tool_cache = detailed_tool_cache
+            self.tool_to_session_map = tool_to_session_map
+            self.tool_to_url_map = tool_to_url_map
+            self._invalidate_tool_lists()
+
+        logger.info("Service %s removed from registry.", display_label)
         return session
 
+    def clear(self) -> None:
+        """Removes all services and tools from the registry."""
+        with self._write_lock:
+            self.sessions = {}
+            self.service_health = {}
+            self._service_health_str = {}
+            self.service_names = {}
+            self._display_labels = {}
+            self.service_tool_summaries = {}
+            self.tool_cache = {}
+            self.annotated_tool_cache = {}
+            self.detailed_tool_cache = {}
+            self.tool_to_session_map = {}
+            self.tool_to_url_map = {}
+            self.service_tools = {}
+            self._invalidate_tool_lists()
+        logger.info("ServiceRegistry cleared.")
+
+    def _invalidate_tool_lists(self) -> None:
+        """Drop the memoized tool lists; called by every mutator after publishing its changes."""
+        self._all_tool_info_cache = None
+
+    def has_service(self, url: str) -> bool:
+        return url in self.sessions
+
     def get_session(self, url: str) -> Optional[Any]:
         return self.sessions.get(url)
         
@@ -83,90 +210,69 @@ class ServiceRegistry:
         """Get the display name of a service"""
         return self.service_names.get(url, url)
 
+    def get_display_label(self, url: str) -> str:
+        """Get the "name (url)" label used in log messages, precomputed when the service was added"""
+        label = self._display_labels.get(url)
+        return label if label is not None else f"{url} ({url})"
+
     def get_session_for_tool(self, tool_name: str) -> Optional[Any]:
         return self.tool_to_session_map.get(tool_name)
 
+    @staticmethod
+    def _annotate_tool(tool_def: Dict[str, Any], url: str, display_name: str) -> Dict[str, Any]:
+        """构建带服务信息的工具定义副本，在注册时生成一次，不修改原始定义"""
+        # 如果是第一层级不包含function的情况，需要调整结构
+        function_data = dict(tool_def.get("function", tool_def))
+        
+        # 添加服务信息到描述中
+        suffix = f" (来自服务: {display_name})"
+        original_description = function_data.get("description", "")
+        if not original_description.endswith(suffix):
+            function_data["description"] = f"{original_description}{suffix}"
+        
+        # 在内部保存服务信息，便于后续使用
+        function_data["service_info"] = {
+            "service_url": url,
+            "service_name": display_name
+        }
+        
+        if "function" in tool_def:
+            return {**tool_def, "function": function_data}
+        return {"type": "function", "function": function_data}
+
     def get_all_tools(self) -> List[Dict[str, Any]]:
         """
         获取所有工具的定义
         
         Returns:
-            所有已注册工具的列表
+            所有已注册工具的列表（注册时预先生成的带服务信息的定义，调用方不应修改）
         """
-        all_tools = []
-        
-        # 遍历所有工具并添加服务信息
-        for tool_name, tool_def in self.tool_cache.items():
-            # 获取工具所属的服务信息
-            session = self.tool_to_session_map.get(tool_name)
-            service_url = None
-            service_name = None
-            
-            # 查找工具所属的服务
-            for url, sess in self.sessions.items():
-                if sess is session:
-                    service_url = url
-                    service_name = self.get_service_name(url)
-                    break
-            
-            # 创建包含服务信息的工具定义
-            tool_with_service = tool_def.copy()
-            
-            # 如果是第一层级不包含function的情况，需要调整结构
-            if "function" not in tool_with_service and isinstance(tool_with_service, dict):
-                # 确保工具有一个function字段
-                tool_with_service = {
-                    "type": "function",
-                    "function": tool_with_service
-                }
-            
-            # 添加服务信息到函数名称或描述
-            if "function" in tool_with_service:
-                function_data = tool_with_service["function"]
-                
-                # 添加服务信息到描述中
-                if service_name and service_url:
-                    original_description = function_data.get("description", "")
-                    if not original_description.endswith(f" (来自服务: {service_name})"):
-                        function_data["description"] = f"{original_description} (来自服务: {service_name})"
-                
-                # 在内部保存服务信息，便于后续使用
-                function_data["service_info"] = {
-                    "service_url": service_url,
-                    "service_name": service_name
-                }
-            
-            all_tools.append(tool_with_service)
-        
-        logger.info(f"Returning {len(all_tools)} tools from {len(self.get_all_service_urls())} services")
+        all_tools = list(self.annotated_tool_cache.values())
+        logger.info("Returning %d tools from %d services", len(all_tools), len(self.sessions))
         return all_tools
         
     def get_all_tool_info(self) -> List[Dict[str, Any]]:
-        """获取所有工具的详细信息"""
+        """获取所有工具的详细信息（缓存结果，服务增删时失效）"""
+        tool_cache = self.tool_cache
+        cached = self._all_tool_info_cache
+        if cached is not None and cached[0] is tool_cache:
+            return cached[1]
+
         tools_info = []
-        for tool_name in self.tool_cache.keys():
-            # 获取工具所属的服务
-            session = self.tool_to_session_map.get(tool_name)
-            print(f"[DEBUG][get_all_tool_info] tool_name={tool_name}, id(session)={id(session) if session else None}")
-            service_url = None
-            service_name = None
-            
-            # 查找工具所属的服务URL和名称
-            for url, sess in self.sessions.items():
-                print(f"[DEBUG][get_all_tool_info]   url={url}, id(sess)={id(sess)}")
-                if sess is session:
-                    service_url = url
-                    service_name = self.get_service_name(url)
-                    break
+        tool_to_url_map = self.tool_to_url_map
+        service_names = self.service_names
+        for tool_name in tool_cache.keys():
+            # 通过反向索引获取工具所属的服务URL和名称
+            service_url = tool_to_url_map.get(tool_name)
+            service_name = service_names.get(service_url, service_url) if service_url else None
             
             # 获取详细工具信息
             detailed_tool = self._get_detailed_tool_info(tool_name)
             if detailed_tool:
-                # 添加服务信息
-                detailed_tool["service_url"] = service_url
-                detailed_tool["service_name"] = service_name
-                tools_info.append(detailed_tool)
+                # 添加服务信息（复制一份，不修改缓存的详细信息）
+                tools_info.append({**detailed_tool, "service_url": service_url, "service_name": service_name})
             
+        self._all_tool_info_cache = (tool_cache, tools_info)
         return tools_info
         
     def get_connected_services(self) -> List[Dict[str, Any]]:
@@ -183,61 +289,73 @@ class ServiceRegistry:
 
     def get_tools_for_service(self, url: str) -> List[str]:
         """Get list of tools provided by the specified service"""
-        session = self.sessions.get(url)
-        display_name = self.service_names.get(url, url)
-        logger.info(f"Getting tools for service: {display_name} ({url})")
-        print(f"[DEBUG][get_tools_for_service] url={url}, id(session)={id(session) if session else None}")
-        
-        if not session:
-            return []
-        # Find all tool names belonging to this session
-        tools = [name for name, s in self.tool_to_session_map.items() if s is session]
-        return tools
+        logger.info("Getting tools for service: %s", self.get_display_label(url))
+        return list(self.service_tools.get(url, ()))
+
+    def try_get_service_info(self, url: str) -> Optional[Dict[str, Any]]:
+        """Get basic info and tool summaries for a service in one read, or None if it is not registered"""
+        if url not in self.sessions:
+            return None
+        return {
+            "url": url,
+            "name": self.service_names.get(url, url),
+            "last_heartbeat": self._service_health_str.get(url, "N/A"),
+            "tools": [
+                {"name": tool_name, "description": description}
+                for tool_name, description in self.service_tool_summaries.get(url, ())
+            ]
+        }
+
+    def get_tool_summaries_for_service(self, url: str) -> List[Tuple[str, str]]:
+        """Get (tool_name, description) pairs for the specified service, precomputed at registration"""
+        return self.service_tool_summaries.get(url, [])
 
     def _extract_description_from_schema(self, prop_info):
         """从 schema 中提取描述信息"""
         if isinstance(prop_info, dict):
-            # 优先查找 description 字段
-            if 'description' in prop_info:
-                return prop_info['description']
-            # 其次查找 title 字段
-            elif 'title' in prop_info:
-                return prop_info['title']
+            # 优先查找 description 字段，其次查找 title 字段
+            for key in ('description', 'title'):
+                value = prop_info.get(key, _MISSING)
+                if value is not _MISSING:
+                    return value
             # 检查是否有 anyOf 或 allOf 结构
-            elif 'anyOf' in prop_info:
-                for item in prop_info['anyOf']:
-                    if isinstance(item, dict) and 'description' in item:
-                        return item['description']
-            elif 'allOf' in prop_info:
-                for item in prop_info['allOf']:
-                    if isinstance(item, dict) and 'description' in item:
-                        return item['description']
+            items = prop_info.get('anyOf', _MISSING)
+            if items is _MISSING:
+                items = prop_info.get('allOf', ())
+            for item in items:
+                if isinstance(item, dict):
+                    value = item.get('description', _MISSING)
+                    if value is not _MISSING:
+                        return value
 
         return "无描述"
 
     def _extract_type_from_schema(self, prop_info):
         """从 schema 中提取类型信息"""
         if isinstance(prop_info, dict):
-            if 'type' in prop_info:
-                return prop_info['type']
-            elif 'anyOf' in prop_info:
+            value = prop_info.get('type', _MISSING)
+            if value is not _MISSING:
+                return value
+            any_of = prop_info.get('anyOf', _MISSING)
+            if any_of is not _MISSING:
                 # 处理 Union 类型
-                types = []
-                for item in prop_info['anyOf']:
-                    if isinstance(item, dict) and 'type' in item:
-                        types.append(item['type'])
+                types = [item['type'] for item in any_of if isinstance(item, dict) and 'type' in item]
                 return '|'.join(types) if types else '未知'
-            elif 'allOf' in prop_info:
-                # 处理 intersection 类型
-                for item in prop_info['allOf']:
-                    if isinstance(item, dict) and 'type' in item:
-                        return item['type']
+            # 处理 intersection 类型
+            for item in prop_info.get('allOf', ()):
+                if isinstance(item, dict):
+                    value = item.get('type', _MISSING)
+                    if value is not _MISSING:
+                        return value
 
         return "未知"
 
     def _get_detailed_tool_info(self, tool_name: str) -> Dict[str, Any]:
-        """获取工具的详细信息，包括参数描述、类型等"""
-        tool_def = self.tool_cache.get(tool_name)
+        """获取工具的详细信息（注册时预先生成），工具不存在时返回空字典"""
+        return self.detailed_tool_cache.get(tool_name, {})
+
+    def _build_detailed_tool_info(self, tool_name: str, tool_def: Dict[str, Any]) -> Dict[str, Any]:
+        """从工具定义中提取详细信息，包括参数描述、类型等"""
         if not tool_def:
             return {}
             
@@ -259,17 +377,12 @@ class ServiceRegistry:
                 param_desc = self._extract_description_from_schema(prop_info)
                 required = prop_name in required_fields
                 
-                # 提取默认值
+                # 提取默认值和约束条件
                 default_value = None
-                if isinstance(prop_info, dict) and "default" in prop_info:
-                    default_value = prop_info["default"]
-                
-                # 提取约束条件
                 constraints = {}
                 if isinstance(prop_info, dict):
-                    for constraint in ["minimum", "maximum", "minLength", "maxLength", "pattern", "enum", "format", "ge", "le"]:
-                        if constraint in prop_info:
-                            constraints[constraint] = prop_info[constraint]
+                    default_value = prop_info.get("default")
+                    constraints = {k: v for k, v in prop_info.items() if k in _CONSTRAINT_KEYS}
                 
                 param_info = {
                     "name": prop_name,
@@ -290,30 +403,24 @@ class ServiceRegistry:
 
     def get_service_details(self, url: str) -> Dict[str, Any]:
         """Get detailed information for the specified service"""
-        if url not in self.sessions:
+        session = self.sessions.get(url)
+        if session is None:
             return {}
             
         display_name = self.service_names.get(url, url)
-        logger.info(f"Getting service details for: {display_name} ({url})")
-        session = self.sessions.get(url)
-        print(f"[DEBUG][get_service_details] url={url}, id(session)={id(session) if session else None}")
-        tools = self.get_tools_for_service(url)
-        last_heartbeat = self.service_health.get(url)
+        logger.info("Getting service details for: %s", self.get_display_label(url))
+        tools = self.service_tools.get(url, ())
         
-        # 获取详细工具信息
-        detailed_tools = []
-        for tool_name in tools:
-            detailed_tool = self._get_detailed_tool_info(tool_name)
-            if detailed_tool:
-                detailed_tools.append(detailed_tool)
+        # 获取详细工具信息（注册时已预先生成，无工具时直接为空列表）
+        detailed_tools = [info for info in map(self.detailed_tool_cache.get, tools) if info] if tools else []
         
         return {
             "url": url,
             "name": display_name,
             "tools": detailed_tools,
             "tool_count": len(tools),
-            "last_heartbeat": str(last_heartbeat) if last_heartbeat else "N/A",
-            "connected": url in self.sessions
+            "last_heartbeat": self._service_health_str.get(url, "N/A"),
+            "connected": True
         }
 
     def get_all_service_urls(self) -> List[str]:
@@ -322,27 +429,43 @@ class ServiceRegistry:
 
     def update_service_health(self, url: str):
         """Updates the last heartbeat time for a service."""
-        if url in self.sessions: # Only update health for active sessions
-            self.service_health[url] = datetime.now()
-            logger.debug(f"Health updated for service: {self.get_service_name(url)} ({url})")
+        with self._write_lock:
+            if url not in self.sessions: # Only update health for active sessions
+                return
+            now = datetime.now()
+            service_health = dict(self.service_health)
+            service_health[url] = now
+            service_health_str = dict(self._service_health_str)
+            service_health_str[url] = str(now)
+            self.service_health = service_health
+            self._service_health_str = service_health_str
+            logger.debug("Health updated for service: %s", self.get_display_label(url))
 
     def get_last_heartbeat(self, url: str) -> Optional[datetime]:
         return self.service_health.get(url)
 
     def get_registered_services_details(self) -> List[Dict[str, Any]]:
          """Returns details for the /health endpoint."""
+         return self.snapshot()[0]
+
+    def snapshot(self) -> Tuple[List[Dict[str, Any]], int, int]:
+         """Returns (service details, session count, tool count) from one consistent read of the registry."""
+         # Bind the published dicts once; copy-on-write guarantees they are not mutated underneath us
+         sessions = self.sessions
+         service_health_str = self._service_health_str
+         service_names = self.service_names
+         service_tools = self.service_tools
+         tool_count = len(self.tool_cache)
+
          details = []
-         # Iterate through active sessions
-         for url in self.get_all_service_urls():
-             last_heartbeat = self.service_health.get(url)
-             tools = self.get_tools_for_service(url)  # Get tool list for this service
+         for url in sessions:
              details.append({
                  "url": url,
-                 "name": self.get_service_name(url),
-                 "last_heartbeat": str(last_heartbeat) if last_heartbeat else "N/A",
-                 "tools": tools  # Add tool list to return data
+                 "name": service_names.get(url, url),
+                 "last_heartbeat": service_health_str.get(url, "N/A"),
+                 "tools": list(service_tools.get(url, ()))
              })
-         return details
+         return details, len(sessions), tool_count
 
     def get_tool_count(self) -> int:
          return len(self.tool_cache)
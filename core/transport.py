@@ -1,16 +1,80 @@
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, AsyncGenerator, List
-import uuid
+from typing import Dict, Any, Optional, AsyncGenerator, List, Tuple
+import itertools
 import httpx
 import json
 import logging
 import asyncio
+import socket
 from urllib.parse import urljoin
 
 logger = logging.getLogger(__name__)
 
+# HTTP/2需要可选依赖h2，未安装时使用HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# orjson为可选依赖，编解码JSON-RPC报文时优先使用，未安装时回退到标准库
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        """序列化为UTF-8字节，与orjson.dumps的返回类型一致"""
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+# 连接池配置：保持长连接，避免每次RPC重新握手
+HTTP_POOL_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=30.0)
+# 禁用Nagle算法，小的JSON-RPC请求立即发送，不等待合并
+HTTP_SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+
+def create_pooled_http_client(
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    auth: Optional[httpx.Auth] = None,
+) -> httpx.AsyncClient:
+    """创建带连接池（HTTP/2可用时启用）、启用TCP_NODELAY的AsyncClient
+    
+    签名与mcp的httpx_client_factory一致，可直接传给fastmcp的StreamableHttpTransport。
+    """
+    transport = httpx.AsyncHTTPTransport(
+        limits=HTTP_POOL_LIMITS,
+        http2=HTTP2_AVAILABLE,
+        socket_options=HTTP_SOCKET_OPTIONS,
+    )
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30.0, read=300.0),
+        auth=auth,
+        follow_redirects=True,
+        transport=transport,
+    )
+
+# 未注入客户端的StreamableHTTPTransport共享同一个连接池，首次使用时创建
+_shared_client: Optional[httpx.AsyncClient] = None
+
+def get_shared_http_client() -> httpx.AsyncClient:
+    """获取进程内共享的池化AsyncClient，已关闭时重新创建"""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = create_pooled_http_client()
+    return _shared_client
+
+async def close_shared_http_client() -> None:
+    """关闭共享的AsyncClient，由MCPOrchestrator.cleanup在应用退出时调用"""
+    global _shared_client
+    client, _shared_client = _shared_client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
 @dataclass
 class StreamableHTTPConfig:
     """Streamable HTTP传输配置"""
@@ -38,10 +102,63 @@ class StreamableHTTPTransport:
         # 可以根据需要添加更多映射
     }
     
-    def __init__(self, config: StreamableHTTPConfig):
+    # 固定的请求头，无需附加会话信息时直接复用
+    _POST_HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+    _NOTIFY_HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
+    _GET_HEADERS = {"Accept": "text/event-stream"}
+    
+    # 初始化请求的参数不随会话变化
+    _INITIALIZE_PARAMS = {
+        "clientInfo": {
+            "name": "mcp-client",
+            "version": "1.0.0"
+        },
+        "protocolVersion": "2025-03-26",  # 添加协议版本
+        "capabilities": {                 # 添加客户端能力
+            "streaming": True,
+            "json": True,
+            "binary": False
+        }
+    }
+    
+    def __init__(self, config: StreamableHTTPConfig, client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            config: 传输配置
+            client: 可选的外部AsyncClient，由调用方负责关闭；未提供时使用共享连接池
+        """
         self.config = config
-        self.client = httpx.AsyncClient(timeout=config.timeout, follow_redirects=True)
+        # 注入的客户端和共享客户端都不归本实例所有，close()时不关闭
+        self.client = client or get_shared_http_client()
+        # 连接池共享，超时按本传输的配置逐请求指定
+        self._timeout = httpx.Timeout(config.timeout)
+        # MCP端点固定，只在初始化时解析一次URL
+        self._endpoint = urljoin(config.base_url, "/mcp")
         self.last_event_id: Optional[str] = None
+        # 服务器对POST请求最近一次返回的是否为SSE流；为False时单响应请求直接走普通POST
+        self._post_returns_sse: Optional[bool] = None
+        # JSON-RPC请求ID只需在会话内唯一，使用递增整数
+        self._next_id = itertools.count(1)
+        
+    def _headers(self, base: Dict[str, str], resume: bool = False) -> Dict[str, str]:
+        """在固定请求头上附加会话ID（及可选的Last-Event-ID），无需附加时直接返回base"""
+        session_id = self.config.session_id
+        event_id = self.last_event_id if resume else None
+        if not session_id and not event_id:
+            return base
+        headers = dict(base)
+        if session_id:
+            headers[self.config.session_id_header] = session_id
+        if event_id:
+            headers[self.config.event_id_header] = event_id
+        return headers
+    
+    @staticmethod
+    def _rpc_payload(method: str, params: Dict[str, Any], request_id: Optional[int] = None) -> Dict[str, Any]:
+        """构建JSON-RPC报文，request_id为None时构建通知"""
+        if request_id is None:
+            return {"jsonrpc": "2.0", "method": method, "params": params}
+        return {"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}
         
     async def initialize(self) -> Dict[str, Any]:
         """初始化连接并获取会话ID
@@ -51,40 +168,22 @@ class StreamableHTTPTransport:
         Returns:
             Dict[str, Any]: 服务器的初始化响应
         """
-        headers = {
-            "Accept": "application/json, text/event-stream",
-            "Content-Type": "application/json"
-        }
+        headers = self._POST_HEADERS
         
-        request_id = str(uuid.uuid4())
+        request_id = next(self._next_id)
         # 确保使用正确的方法名（initialize 不需要映射，但为了一致性，我们仍然从映射中获取）
         method = "initialize"
         server_method = self.METHOD_MAPPING.get(method, method)
         
-        payload = {
-            "jsonrpc": "2.0", 
-            "method": server_method, 
-            "params": {
-                "clientInfo": {
-                    "name": "mcp-client",
-                    "version": "1.0.0"
-                },
-                "protocolVersion": "2025-03-26",  # 添加协议版本
-                "capabilities": {                 # 添加客户端能力
-                    "streaming": True,
-                    "json": True,
-                    "binary": False
-                }
-            },
-            "id": request_id
-        }
+        payload = self._rpc_payload(server_method, self._INITIALIZE_PARAMS, request_id)
         
         try:
-            logger.debug(f"Initializing connection with method={server_method}")
+            logger.debug("Initializing connection with method=%s", server_method)
             response = await self.client.post(
-                urljoin(self.config.base_url, "/mcp"),
+                self._endpoint,
                 headers=headers,
-                json=payload
+                content=_dumps(payload),
+                timeout=self._timeout
             )
             response.raise_for_status()
             
@@ -92,12 +191,12 @@ class StreamableHTTPTransport:
             session_id = response.headers.get(self.config.session_id_header)
             if session_id:
                 self.config.session_id = session_id
-                logger.info(f"Session established with ID: {session_id}")
+                logger.info("Session established with ID: %s", session_id)
             
             # 处理响应内容
             if response.content:
                 try:
-                    return response.json()
+                    return _loads(response.content)
                 except json.JSONDecodeError:
                     logger.warning(f"Failed to parse response as JSON: {response.content}")
                     # 返回一个默认的成功响应，避免中断流程
@@ -127,25 +226,18 @@ class StreamableHTTPTransport:
         Returns:
             Any: 工具执行结果
         """
-        logger.info(f"Calling tool '{tool_name}' with args: {tool_args}")
+        logger.info("Calling tool '%s' with args: %s", tool_name, tool_args)
         
         try:
-            # 发送工具调用请求
-            responses = []
+            # 发送工具调用请求，只获取第一个响应
             # 使用 call_tool 作为方法名，会被映射到 tools/call
             method = "call_tool"
             params = {"name": tool_name, "arguments": tool_args}
             
-            async for response in self.send_request(method, params):
-                responses.append(response)
-                # 只获取第一个响应
-                break
-                
-            if not responses:
+            result = await self.send_request_single(method, params)
+            if result is None:
                 logger.warning(f"No response received from tool '{tool_name}'")
                 return {"content": [{"text": f"No response received from tool '{tool_name}'"}]}
-                
-            result = responses[0]
             
             # 格式化响应为兼容格式
             if isinstance(result, dict) and "result" in result:
@@ -173,37 +265,15 @@ class StreamableHTTPTransport:
         Yields:
             Dict[str, Any]: 服务器响应数据流
         """
-        headers = {
-            "Accept": "application/json, text/event-stream",
-            "Content-Type": "application/json"
-        }
-        
-        if self.config.session_id:
-            headers[self.config.session_id_header] = self.config.session_id
-            
-        if self.last_event_id:
-            headers[self.config.event_id_header] = self.last_event_id
-        
-        # 将简化的方法名转换为服务器期望的格式
-        server_method = self.METHOD_MAPPING.get(method, method)
-        if server_method != method:
-            logger.debug(f"Mapping method name from '{method}' to '{server_method}'")
-            
-        request_id = str(uuid.uuid4())
-        payload = {
-            "jsonrpc": "2.0",
-            "method": server_method,
-            "params": params,
-            "id": request_id
-        }
+        headers, body = self._prepare_request(method, params)
         
         try:
-            logger.debug(f"Sending request: method={server_method}, params={params}")
             async with self.client.stream(
                 "POST",
-                urljoin(self.config.base_url, "/mcp"),
+                self._endpoint,
                 headers=headers,
-                json=payload
+                content=body,
+                timeout=self._timeout
             ) as response:
                 response.raise_for_status()
                 
@@ -211,38 +281,14 @@ class StreamableHTTPTransport:
                 
                 if "text/event-stream" in content_type:
                     # 处理SSE流
-                    buffer = ""
-                    async for chunk in response.aiter_text():
-                        buffer += chunk
-                        
-                        while "\n\n" in buffer:
-                            message, buffer = buffer.split("\n\n", 1)
-                            event_data = {}
-                            
-                            for line in message.split("\n"):
-                                if not line or line.startswith(":"):
-                                    continue  # 忽略注释和空行
-                                    
-                                if ":" in line:
-                                    field, value = line.split(":", 1)
-                                    value = value.lstrip()  # 移除前导空格
-                                    
-                                    if field == "id":
-                                        self.last_event_id = value
-                                    elif field == "data":
-                                        try:
-                                            event_data = json.loads(value)
-                                        except json.JSONDecodeError:
-                                            logger.warning(f"Failed to parse SSE data: {value}")
-                                
-                            if event_data:
-                                yield event_data
+                    async for event_data in self._iter_sse_events(response):
+                        yield event_data
                 else:
                     # 处理普通JSON响应 - 修复方法，读取完整响应内容
                     try:
                         # 读取完整响应内容而不是直接调用response.json()
                         content = await response.aread()
-                        data = json.loads(content)
+                        data = _loads(content)
                         yield data
                     except json.JSONDecodeError:
                         logger.error(f"Failed to parse response as JSON: {content}")
@@ -255,6 +301,164 @@ class StreamableHTTPTransport:
             logger.error(f"Error during request processing: {e}")
             raise
     
+    async def send_request_single(self, method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """发送请求并只返回第一个响应
+        
+        不经过send_request的异步生成器，SSE响应在收到第一个事件后立即关闭流。
+        
+        Args:
+            method: 请求方法名
+            params: 请求参数
+            
+        Returns:
+            Optional[Dict[str, Any]]: 第一个响应，服务器未返回任何事件时为None
+        """
+        if self._post_returns_sse is False:
+            # 服务器返回普通JSON，无需建立流式上下文
+            return await self._post_json(method, params)
+        
+        headers, body = self._prepare_request(method, params)
+        
+        try:
+            async with self.client.stream(
+                "POST",
+                self._endpoint,
+                headers=headers,
+                content=body,
+                timeout=self._timeout
+            ) as response:
+                response.raise_for_status()
+                
+                is_sse = "text/event-stream" in response.headers.get("Content-Type", "")
+                self._post_returns_sse = is_sse
+                if is_sse:
+                    events = self._iter_sse_events(response)
+                    try:
+                        return await events.__anext__()
+                    except StopAsyncIteration:
+                        return None
+                    finally:
+                        await events.aclose()
+                
+                content = await response.aread()
+                try:
+                    return _loads(content)
+                except json.JSONDecodeError:
+                    logger.error(f"Failed to parse response as JSON: {content}")
+                    raise
+                    
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error during request: {e.response.status_code} {e.response.reason_phrase}")
+            raise
+        except Exception as e:
+            logger.error(f"Error during request processing: {e}")
+            raise
+    
+    async def _post_json(self, method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """以普通POST发送请求并解码JSON响应
+        
+        服务器仍返回SSE时从已读取的响应体中取第一个事件，并改回流式请求。
+        
+        Args:
+            method: 请求方法名
+            params: 请求参数
+            
+        Returns:
+            Optional[Dict[str, Any]]: 响应内容，SSE响应中没有事件时为None
+        """
+        headers, body = self._prepare_request(method, params)
+        
+        try:
+            response = await self.client.post(
+                self._endpoint,
+                headers=headers,
+                content=body,
+                timeout=self._timeout
+            )
+            response.raise_for_status()
+            
+            if "text/event-stream" in response.headers.get("Content-Type", ""):
+                self._post_returns_sse = True
+                async for event_data in self._iter_sse_events(response):
+                    return event_data
+                return None
+            
+            try:
+                return _loads(response.content)
+            except json.JSONDecodeError:
+                logger.error(f"Failed to parse response as JSON: {response.content}")
+                raise
+                
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error during request: {e.response.status_code} {e.response.reason_phrase}")
+            raise
+        except Exception as e:
+            logger.error(f"Error during request processing: {e}")
+            raise
+    
+    def _prepare_request(self, method: str, params: Dict[str, Any]) -> Tuple[Dict[str, str], bytes]:
+        """映射方法名并构建请求头和序列化后的JSON-RPC请求体"""
+        headers = self._headers(self._POST_HEADERS, resume=True)
+        
+        # 将简化的方法名转换为服务器期望的格式
+        server_method = self.METHOD_MAPPING.get(method, method)
+        if server_method != method:
+            logger.debug("Mapping method name from '%s' to '%s'", method, server_method)
+            
+        payload = self._rpc_payload(server_method, params, next(self._next_id))
+        logger.debug("Sending request: method=%s, params=%s", server_method, params)
+        return headers, _dumps(payload)
+    
+    async def _iter_sse_events(self, response: httpx.Response) -> AsyncGenerator[Dict[str, Any], None]:
+        """增量解析SSE字节流，逐个产出事件的data负载
+        
+        在bytearray上用游标查找事件分隔符，已扫描过的字节不会重复扫描，
+        也不会为每个分块重建整个缓冲区字符串。
+        
+        Args:
+            response: 以text/event-stream返回的流式响应
+            
+        Yields:
+            Dict[str, Any]: 每个事件解析后的data字段
+        """
+        buffer = bytearray()
+        scan_from = 0
+        async for chunk in response.aiter_bytes():
+            buffer.extend(chunk)
+            
+            while True:
+                idx = buffer.find(b"\n\n", scan_from)
+                if idx < 0:
+                    # 分隔符可能跨越分块边界，保留最后一个字节重新扫描
+                    scan_from = max(0, len(buffer) - 1)
+                    break
+                message = bytes(buffer[:idx])
+                del buffer[:idx + 2]
+                scan_from = 0
+                if message.startswith(b":") and b"\n" not in message:
+                    continue  # 仅含注释的保活帧，整体跳过
+                event_data = None
+                
+                for line in message.splitlines():
+                    if not line or line.startswith(b":"):
+                        continue  # 忽略注释和空行
+                        
+                    field, sep, value = line.partition(b":")
+                    if not sep:
+                        continue
+                    value = value.lstrip()  # 移除前导空格
+                    
+                    if field == b"id":
+                        self.last_event_id = value.decode("utf-8", "replace")
+                    elif field == b"data":
+                        try:
+                            event_data = _loads(value)
+                        except (json.JSONDecodeError, UnicodeDecodeError):
+                            logger.warning(f"Failed to parse SSE data: {value.decode('utf-8', errors='replace')}")
+                    
+                if event_data:
+                    yield event_data
+    
     async def send_notification(self, method: str, params: Dict[str, Any]) -> None:
         """发送通知（不需要响应的请求）
         
@@ -262,25 +466,15 @@ class StreamableHTTPTransport:
             method: 通知方法名
             params: 通知参数
         """
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-        
-        if self.config.session_id:
-            headers[self.config.session_id_header] = self.config.session_id
-            
-        payload = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "params": params
-        }
+        headers = self._headers(self._NOTIFY_HEADERS)
+        payload = self._rpc_payload(method, params)
         
         try:
             response = await self.client.post(
-                urljoin(self.config.base_url, "/mcp"),
+                self._endpoint,
                 headers=headers,
-                json=payload
+                content=_dumps(payload),
+                timeout=self._timeout
             )
             
             if response.status_code != 202:
@@ -298,21 +492,14 @@ class StreamableHTTPTransport:
         Yields:
             Dict[str, Any]: 服务器发送的消息
         """
-        headers = {
-            "Accept": "text/event-stream"
-        }
-        
-        if self.config.session_id:
-            headers[self.config.session_id_header] = self.config.session_id
-            
-        if self.last_event_id:
-            headers[self.config.event_id_header] = self.last_event_id
+        headers = self._headers(self._GET_HEADERS, resume=True)
         
         try:
             async with self.client.stream(
                 "GET",
-                urljoin(self.config.base_url, "/mcp"),
-                headers=headers
+                self._endpoint,
+                headers=headers,
+                timeout=self._timeout
             ) as response:
                 response.raise_for_status()
                 
@@ -320,32 +507,8 @@ class StreamableHTTPTransport:
                     logger.warning("Server does not support GET requests for listening")
                     return
                 
-                buffer = ""
-                async for chunk in response.aiter_text():
-                    buffer += chunk
-                    
-                    while "\n\n" in buffer:
-                        message, buffer = buffer.split("\n\n", 1)
-                        event_data = {}
-                        
-                        for line in message.split("\n"):
-                            if not line or line.startswith(":"):
-                                continue  # 忽略注释和空行
-                                
-                            if ":" in line:
-                                field, value = line.split(":", 1)
-                                value = value.lstrip()  # 移除前导空格
-                                
-                                if field == "id":
-                                    self.last_event_id = value
-                                elif field == "data":
-                                    try:
-                                        event_data = json.loads(value)
-                                    except json.JSONDecodeError:
-                                        logger.warning(f"Failed to parse SSE data: {value}")
-                            
-                        if event_data:
-                            yield event_data
+                async for event_data in self._iter_sse_events(response):
+                    yield event_data
                             
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 405:
@@ -358,21 +521,21 @@ class StreamableHTTPTransport:
             raise
                 
     async def close(self) -> None:
-        """关闭连接并清理资源
+        """关闭会话并清理资源
         
-        如果有会话ID，尝试显式终止会话。
+        如果有会话ID，尝试显式终止会话。HTTP客户端是共享或外部注入的，不在此关闭。
         """
         if self.config.session_id:
             try:
                 headers = {self.config.session_id_header: self.config.session_id}
                 await self.client.delete(
-                    urljoin(self.config.base_url, "/mcp"),
-                    headers=headers
+                    self._endpoint,
+                    headers=headers,
+                    timeout=self._timeout
                 )
-                logger.info(f"Session {self.config.session_id} terminated")
+                logger.info("Session %s terminated", self.config.session_id)
             except Exception as e:
                 logger.warning(f"Failed to terminate session: {e}")
                 
-        await self.client.aclose()
         logger.info("Transport resources cleaned up") 
  
\ No newline at end of file
@@ -1,11 +1,67 @@
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
+import copy
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any, Optional
+import mmap
+import shutil
+import tempfile
+import threading
+from typing import List, Dict, Any, Iterator, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+    # orjson parses straight from a memoryview, so the file can be mapped instead of copied
+    _LOADS_BUFFER = True
+
+    def _dumps_pretty(obj: Any) -> bytes:
+        """Serialize to indented UTF-8 JSON"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    def _dumps_canonical(obj: Any) -> bytes:
+        """Serialize compactly with sorted keys, so equal configs give equal bytes"""
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    _loads = json.loads
+    _LOADS_BUFFER = False
+
+    def _dumps_pretty(obj: Any) -> bytes:
+        """Serialize to indented UTF-8 JSON"""
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+    def _dumps_canonical(obj: Any) -> bytes:
+        """Serialize compactly with sorted keys, so equal configs give equal bytes"""
+        return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
 
 logger = logging.getLogger(__name__)
 
+# Process umask, read once; a newly created mcp.json gets the mode open() would have given it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _config_digest(config: Dict[str, Any]) -> bytes:
+    """Short stable digest of a configuration, used to detect no-op updates"""
+    return hashlib.blake2b(_dumps_canonical(config), digest_size=8).digest()
+
+def _url_to_name(servers: Dict[str, Any]) -> Dict[str, str]:
+    """Map each server URL to its service name, skipping servers without a URL"""
+    return {url: name for name, config in servers.items() if (url := config.get("url"))}
+
+def _read_json_file(path: str) -> Any:
+    """Parse a JSON file, mapping it into memory when the decoder accepts a buffer"""
+    with open(path, 'rb') as f:
+        if not _LOADS_BUFFER:
+            return _loads(f.read())
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap cannot map an empty file, let the decoder report it
+            return _loads(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return _loads(view)
+
 class MCPConfig:
     """Handle loading, parsing and saving of mcp.json file, compatible with FastMCP's MCPConfigTransport format
     
@@ -20,46 +76,77 @@ class MCPConfig:
             json_path: Path to mcp.json file, if None, default path will be used
         """
         self.json_path = json_path or os.path.join(os.path.dirname(__file__), "mcp.json")
+        self._url_index: Dict[str, str] = {}  # service url -> service name, mirrors the last loaded/saved file
+        # Last parsed configuration and the (mtime_ns, size) of mcp.json it was read from
+        self._cache: Optional[Dict[str, Any]] = None
+        self._cache_stat: Optional[tuple] = None
+        # Bytes last written by save_config, used to skip rewriting an unchanged file
+        self._cache_bytes: Optional[bytes] = None
         logger.info(f"MCP configuration initialized, using file path: {self.json_path}")
     
+    def _file_stat(self) -> Optional[tuple]:
+        """Return (mtime_ns, size) of mcp.json, or None if it does not exist"""
+        try:
+            st = os.stat(self.json_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    @staticmethod
+    def _normalize(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in the fields FastMCP expects, in place"""
+        # Ensure mcpServers section exists
+        if "mcpServers" not in data:
+            data["mcpServers"] = {}
+        
+        # Ensure each server has the required fields for FastMCP compatibility
+        for name, server in data["mcpServers"].items():
+            # If URL is present, ensure transport is set
+            if "url" in server and "transport" not in server:
+                # Default to streamable-http for HTTP URLs
+                server["transport"] = "streamable-http"
+        return data
+    
     def load_config(self) -> Dict[str, Any]:
         """Load complete configuration from mcp.json file
         
+        The parsed file is cached and only re-read when its mtime or size changes. Each call
+        returns a private copy, so callers may modify the result freely.
+        
         Returns:
             MCP configuration dictionary in FastMCP MCPConfigTransport format
         """
-        if not os.path.exists(self.json_path):
+        stat = self._file_stat()
+        if stat is None:
             logger.warning(f"mcp.json file does not exist: {self.json_path}, will create empty file")
             self.save_config({"mcpServers": {}})
             return {"mcpServers": {}}
         
+        if self._cache is not None and stat == self._cache_stat:
+            return copy.deepcopy(self._cache)
+        
         try:
-            with open(self.json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                logger.info(f"Configuration loaded from mcp.json")
-                
-                # Ensure mcpServers section exists
-                if "mcpServers" not in data:
-                    data["mcpServers"] = {}
-                
-                # Ensure each server has the required fields for FastMCP compatibility
-                for name, server in data["mcpServers"].items():
-                    # If URL is present, ensure transport is set
-                    if "url" in server and "transport" not in server:
-                        # Default to streamable-http for HTTP URLs
-                        server["transport"] = "streamable-http"
-                
-                return data
+            data = self._normalize(_read_json_file(self.json_path))
+            logger.info(f"Configuration loaded from mcp.json")
+            
+            self._rebuild_url_index(data["mcpServers"])
+            self._cache, self._cache_stat = copy.deepcopy(data), stat
+            return data
         except json.JSONDecodeError:
             logger.error(f"Failed to parse mcp.json file: {self.json_path}")
+            self._url_index = {}
             return {"mcpServers": {}}
         except Exception as e:
             logger.error(f"Error reading mcp.json file: {e}")
+            self._url_index = {}
             return {"mcpServers": {}}
     
     def save_config(self, config: Dict[str, Any]) -> bool:
         """Save configuration to mcp.json file
         
+        The file is replaced atomically, so a crash mid-write never leaves a truncated mcp.json.
+        Nothing is written when the content matches what is already on disk.
+        
         Args:
             config: Configuration dictionary
             
@@ -71,26 +158,74 @@ class MCPConfig:
             if "mcpServers" not in config:
                 config["mcpServers"] = {}
                 
-            with open(self.json_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            data = _dumps_pretty(config)
+            if data == self._cache_bytes and self._cache is not None and self._file_stat() == self._cache_stat:
+                self._rebuild_url_index(config["mcpServers"])
+                logger.info(f"Configuration unchanged, skipped writing {self.json_path}")
+                return True
+            
+            self._cache = None
+            self._cache_bytes = None
+            # A unique temp file in the same directory, so concurrent writers never share it
+            tmp_path = None
+            try:
+                with tempfile.NamedTemporaryFile(
+                    'wb', dir=os.path.dirname(os.path.abspath(self.json_path)),
+                    prefix=os.path.basename(self.json_path) + '.', suffix='.tmp', delete=False
+                ) as f:
+                    tmp_path = f.name
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # Keep the permissions of the file being replaced (temp files are created 0600)
+                try:
+                    shutil.copymode(self.json_path, tmp_path)
+                except FileNotFoundError:
+                    os.chmod(tmp_path, 0o666 & ~_UMASK)
+                os.replace(tmp_path, self.json_path)
+            except BaseException:
+                if tmp_path is not None:
+                    os.unlink(tmp_path)
+                raise
+            self._rebuild_url_index(config["mcpServers"])
+            # Repopulate the cache with what load_config would parse back from the file just written
+            self._cache, self._cache_stat = self._normalize(copy.deepcopy(config)), self._file_stat()
+            self._cache_bytes = data
             logger.info(f"Configuration saved to {self.json_path}")
             return True
         except Exception as e:
             logger.error(f"Error saving to mcp.json file: {e}")
             return False
     
-    def load_services(self) -> List[Dict[str, Any]]:
-        """Load service list
+    def _rebuild_url_index(self, servers: Dict[str, Any]) -> None:
+        """Rebuild the url -> name reverse index, the first service declaring a URL wins"""
+        index = {}
+        for name, server in servers.items():
+            url = server.get("url") if isinstance(server, dict) else None
+            if url and url not in index:
+                index[url] = name
+        self._url_index = index
+    
+    def get_service_name_by_url(self, url: str) -> Optional[str]:
+        """Look up a service name by URL in O(1) using the reverse index
         
+        Args:
+            url: Service URL
+            
         Returns:
-            Service configuration list [{"name": "service name", "url": "service URL", "env": {...}}]
+            Service name, or None if no service with that URL is configured
         """
-        config = self.load_config()
-        servers = config.get("mcpServers", {})
-        services = []
+        return self._url_index.get(url)
+    
+    def iter_services(self) -> Iterator[Dict[str, Any]]:
+        """Iterate configured services
         
+        Yields:
+            Service configuration {"name": "service name", "url": "service URL", "env": {...}}
+        """
         # Convert mcpServers format to service list format
-        for name, server_config in servers.items():
+        # load_config serves the cached parse while mcp.json is unchanged
+        for name, server_config in self.load_config().get("mcpServers", {}).items():
             service = {
                 "name": name,
                 "url": server_config.get("url", "")
@@ -102,9 +237,15 @@ class MCPConfig:
                 
             # Verify service has URL
             if service["url"]:
-                services.append(service)
+                yield service
+    
+    def load_services(self) -> List[Dict[str, Any]]:
+        """Load service list
         
-        return services
+        Returns:
+            Service configuration list [{"name": "service name", "url": "service URL", "env": {...}}]
+        """
+        return list(self.iter_services())
     
     def add_service(self, service: Dict[str, Any]) -> bool:
         """Add a service to mcp.json file
@@ -166,21 +307,68 @@ class MCPConfig:
 class MCPConfigAPI:
     """API helper for MCPConfig, providing methods for API endpoints"""
     
-    def __init__(self, config_path=None):
+    def __init__(self, config_path=None, mcp_config: Optional[MCPConfig] = None,
+                 loaded_config: Optional[Dict[str, Any]] = None):
         """Initialize API helper with MCPConfig instance
         
         Args:
-            config_path: Optional path to mcp.json file
+            config_path: Optional path to mcp.json file, ignored when mcp_config is given
+            mcp_config: Optional existing MCPConfig instance to reuse
+            loaded_config: Optional configuration already loaded by mcp_config, used to prime the cache
         """
-        self.mcp_config = MCPConfig(config_path)
+        self.mcp_config = mcp_config or MCPConfig(config_path)
+        # Parsed config cache, keyed by (mtime_ns, size) of mcp.json
+        self._cached_config: Optional[Dict[str, Any]] = None
+        self._cached_stamp: Optional[tuple] = None
+        self._cache_lock = threading.Lock()
+        # (file stamp, config digest) recorded after the last successful update_config write
+        self._last_update: Optional[tuple] = None
+        if loaded_config is not None:
+            self._cached_stamp = self._file_stamp()
+            self._cached_config = loaded_config
+    
+    def _file_stamp(self) -> Optional[tuple]:
+        """Return (mtime_ns, size) of mcp.json, or None if it cannot be stat'ed"""
+        try:
+            st = os.stat(self.mcp_config.json_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
     
     def get_config(self) -> Dict[str, Any]:
         """Get complete configuration for API response
         
+        The parsed configuration is cached and only re-read when mcp.json changes on disk.
+        The returned dictionary is shared, callers must not mutate it.
+        
         Returns:
             MCP configuration dictionary
         """
-        return self.mcp_config.load_config()
+        # Stat before reading so a concurrent write can only make the cache stale-by-one, never wrong
+        stamp = self._file_stamp()
+        with self._cache_lock:
+            if stamp is not None and stamp == self._cached_stamp:
+                return self._cached_config
+        
+        config = self.mcp_config.load_config()
+        if stamp is not None:
+            with self._cache_lock:
+                self._cached_config = config
+                self._cached_stamp = stamp
+        return config
+    
+    def find_service_name(self, url: str) -> Optional[str]:
+        """Find the configured service name for a URL
+        
+        Args:
+            url: Service URL
+            
+        Returns:
+            Service name, or None if not found
+        """
+        # Refreshes the reverse index if mcp.json changed on disk
+        self.get_config()
+        return self.mcp_config.get_service_name_by_url(url)
     
     async def update_config(self, config_data: Dict[str, Any], orchestrator=None) -> Dict[str, str]:
         """Update configuration from API request and optionally synchronize services
@@ -193,45 +381,67 @@ class MCPConfigAPI:
             Response dictionary with status and message
         """
         try:
-            # Since pydantic models have dict() method for conversion to dictionary, we also accept dictionary types here
+            # Accept pydantic models as well as plain dictionaries; model_dump (pydantic v2)
+            # avoids the deprecated v1 dict() shim, which remains the fallback for pydantic v1
             config_dict = config_data
-            if hasattr(config_data, 'dict') and callable(getattr(config_data, 'dict')):
-                config_dict = config_data.dict()
+            if not isinstance(config_data, dict):
+                if callable(getattr(config_data, 'model_dump', None)):
+                    config_dict = config_data.model_dump(mode='json')
+                elif callable(getattr(config_data, 'dict', None)):
+                    config_dict = config_data.dict()
             
-            # Get old configuration for comparison before saving
-            old_config = self.mcp_config.load_config()
-            old_servers = old_config.get("mcpServers", {})
+            # Skip the diff, the write and the service sync when this exact configuration was
+            # the last one written and mcp.json has not been changed by anyone else since
+            digest = _config_digest(config_dict)
+            stamp = self._file_stamp()
+            if stamp is not None and (stamp, digest) == self._last_update:
+                return {"status": "success", "message": "No changes"}
+            
+            # Diff against the old configuration before saving; the shared cached copy is
+            # only read here, so mcp.json is not parsed again when it is unchanged on disk
+            old_servers = self.get_config().get("mcpServers", {})
+            new_servers = config_dict.get("mcpServers", {})
+            
+            # Build service maps for comparison
+            old_services = _url_to_name(old_servers)
+            new_services = _url_to_name(new_servers)
+            
+            # Find services to add
+            services_to_add = new_services.keys() - old_services.keys()
+            # Find services to remove
+            services_to_remove = old_services.keys() - new_services.keys()
             
             # Save new configuration
             success = self.mcp_config.save_config(config_dict)
             if not success:
                 return {"status": "error", "message": "Configuration update failed"}
+            self._last_update = (self._file_stamp(), digest)
             
             # If no orchestrator provided, just update the config file
             if orchestrator is None:
                 return {"status": "success", "message": "Configuration updated successfully"}
             
             # If orchestrator provided, synchronize services
-            new_servers = config_dict.get("mcpServers", {})
             
-            # Build service sets for comparison
-            old_services = {url: name for name, config in old_servers.items() 
-                          for url in [config.get("url")] if url}
-            new_services = {url: name for name, config in new_servers.items() 
-                          for url in [config.get("url")] if url}
-            
-            # Find services to add
-            services_to_add = set(new_services.keys()) - set(old_services.keys())
-            # Find services to remove
-            services_to_remove = set(old_services.keys()) - set(new_services.keys())
+            # Connect added services and disconnect removed ones concurrently
+            add_urls = list(services_to_add)
+            remove_urls = list(services_to_remove)
+            outcomes = await asyncio.gather(
+                *(orchestrator.connect_service(url, new_services[url]) for url in add_urls),
+                *(orchestrator.disconnect_service(url) for url in remove_urls),
+                return_exceptions=True
+            )
             
             # Build synchronization results
             sync_results = []
             
             # Register newly added services
-            for service_url in services_to_add:
+            for service_url, outcome in zip(add_urls, outcomes):
                 service_name = new_services[service_url]
-                success, message = await orchestrator.connect_service(service_url, service_name)
+                if isinstance(outcome, BaseException):
+                    success, message = False, str(outcome)
+                else:
+                    success, message = outcome
                 sync_results.append({
                     "action": "add",
                     "name": service_name,
@@ -246,26 +456,24 @@ class MCPConfigAPI:
                     orchestrator.pending_reconnection.add(service_url)
             
             # Remove deleted services
-            for service_url in services_to_remove:
+            for service_url, outcome in zip(remove_urls, outcomes[len(add_urls):]):
                 service_name = old_services[service_url]
-                try:
-                    # Disconnect service by calling disconnect_service method
-                    await orchestrator.disconnect_service(service_url)
+                if isinstance(outcome, BaseException):
+                    logger.error(f"Failed to disconnect service {service_name} ({service_url}): {outcome}")
                     sync_results.append({
                         "action": "remove",
                         "name": service_name,
                         "url": service_url,
-                        "success": True,
-                        "message": "Service disconnected"
+                        "success": False,
+                        "message": f"Failed to disconnect service: {str(outcome)}"
                     })
-                except Exception as e:
-                    logger.error(f"Failed to disconnect service {service_name} ({service_url}): {e}")
+                else:
                     sync_results.append({
                         "action": "remove",
                         "name": service_name,
                         "url": service_url,
-                        "success": False,
-                        "message": f"Failed to disconnect service: {str(e)}"
+                        "success": True,
+                        "message": "Service disconnected"
                     })
             
             # Build final result
@@ -291,26 +499,35 @@ class MCPConfigAPI:
             Response dictionary with status, message and results
         """
         try:
-            services = self.mcp_config.load_services()
+            services = []
+            connects = []
+            # Start connecting each service as soon as its entry is decoded
+            for service in self.mcp_config.iter_services():
+                services.append(service)
+                connects.append(asyncio.ensure_future(
+                    orchestrator.connect_service(service["url"], service.get("name", ""))
+                ))
+            outcomes = await asyncio.gather(*connects, return_exceptions=True)
             
             results = []
-            for service in services:
+            for service, outcome in zip(services, outcomes):
                 service_name = service.get("name", "")
-                service_url = service.get("url", "")
+                service_url = service["url"]
+                if isinstance(outcome, BaseException):
+                    success, message = False, str(outcome)
+                else:
+                    success, message = outcome
+                results.append({
+                    "name": service_name or service_url,
+                    "url": service_url,
+                    "success": success,
+                    "message": message
+                })
                 
-                if service_url:
-                    success, message = await orchestrator.connect_service(service_url, service_name)
-                    results.append({
-                        "name": service_name or service_url,
-                        "url": service_url,
-                        "success": success,
-                        "message": message
-                    })
-                    
-                    # If connection fails, add to auto-reconnect list
-                    if not success:
-                        logger.info(f"Adding service {service_name} ({service_url}) to auto-reconnect list.")
-                        orchestrator.pending_reconnection.add(service_url)
+                # If connection fails, add to auto-reconnect list
+                if not success:
+                    logger.info(f"Adding service {service_name} ({service_url}) to auto-reconnect list.")
+                    orchestrator.pending_reconnection.add(service_url)
             
             return {
                 "status": "success",
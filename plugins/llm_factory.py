@@ -1,100 +1,102 @@
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from typing import Optional, Any
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Any
 import logging
 from config.config import LLMConfig
 
+# 各提供商的SDK均为可选依赖，缺失时在创建对应客户端时报错
+try:
+    from zhipuai import ZhipuAI
+except ImportError:
+    ZhipuAI = None
+
+try:
+    from openai import OpenAI
+    import httpx
+except ImportError:
+    OpenAI = None
+
 logger = logging.getLogger(__name__)
 
+DEEPSEEK_DEFAULT_BASE_URL = "https://api.deepseek.com/v1"
+
+def _make_http_client() -> "httpx.Client":
+    """创建OpenAI客户端使用的长连接httpx.Client（安装h2时启用HTTP/2）
+
+    ReAct每轮迭代都会发起新的补全请求，空闲连接保留较长时间，避免重复TCP/TLS握手。
+    """
+    from core.transport import HTTP2_AVAILABLE, HTTP_SOCKET_OPTIONS
+    transport = httpx.HTTPTransport(
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=300.0),
+        http2=HTTP2_AVAILABLE,
+        socket_options=HTTP_SOCKET_OPTIONS,
+    )
+    return httpx.Client(transport=transport, follow_redirects=True)
+
+def _make_zhipu(api_key: str, base_url: Optional[str]) -> Any:
+    if ZhipuAI is None:
+        raise ImportError("No module named 'zhipuai'")
+    logger.info("使用智谱AI API")
+    return ZhipuAI(api_key=api_key)
+
+def _make_deepseek(api_key: str, base_url: Optional[str]) -> Any:
+    if OpenAI is None:
+        raise ImportError("No module named 'openai'")
+    base_url = base_url or DEEPSEEK_DEFAULT_BASE_URL
+    logger.info("使用DeepSeek API，base_url=%s", base_url)
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=_make_http_client())
+
+def _make_openai(api_key: str, base_url: Optional[str]) -> Optional[Any]:
+    if not base_url:
+        logger.error("base_url is required for openai_compatible provider")
+        return None
+    if OpenAI is None:
+        raise ImportError("No module named 'openai'")
+    logger.info("使用OpenAI兼容API，base_url=%s", base_url)
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=_make_http_client())
+
+# provider -> 客户端工厂(api_key, base_url)
+_PROVIDERS: Dict[str, Callable[[str, Optional[str]], Optional[Any]]] = {
+    "zhipuai": _make_zhipu,
+    "deepseek": _make_deepseek,
+    "openai_compatible": _make_openai,
+}
+
+@lru_cache(maxsize=16)
+def _get_client(provider: str, api_key: str, base_url: Optional[str]) -> Optional[Any]:
+    """按(provider, api_key, base_url)创建并缓存客户端，相同配置复用同一客户端及其连接池
+
+    创建失败时抛出异常，异常不会被缓存。
+    """
+    return _PROVIDERS[provider](api_key, base_url)
+
 def create_llm_client(config: LLMConfig) -> Optional[Any]:
-    """Create LLM client instance based on provider configuration"""
+    """Create LLM client instance based on provider configuration
+
+    Clients are cached per (provider, api_key, base_url), so agents built from the same
+    configuration share one client and its HTTP connection pool.
+    """
     if not config.api_key:
-        logger.warning(f"Missing {config.provider} API key, cannot initialize LLM client")
+        logger.warning("Missing %s API key, cannot initialize LLM client", config.provider)
+        return None
+
+    if config.provider not in _PROVIDERS:
+        logger.error("不支持的LLM提供商: %s", config.provider)
         return None
-        
+
     try:
-        logger.info(f"正在创建LLM客户端，provider={config.provider}, model={config.model}")
-        
-        if config.provider == "zhipuai":
-            logger.info(f"使用智谱AI API，模型={config.model}")
-            try:
-                from zhipuai import ZhipuAI
-                client = ZhipuAI(api_key=config.api_key)
-                # 验证客户端是否可用
-                logger.info("正在验证智谱AI客户端...")
-                try:
-                    # 尝试检查客户端的基本功能
-                    if hasattr(client, 'chat') and hasattr(client.chat, 'completions'):
-                        logger.info("智谱AI客户端验证成功")
-                    else:
-                        logger.warning("智谱AI客户端缺少必要的方法，可能无法正常工作")
-                except Exception as ve:
-                    logger.warning(f"智谱AI客户端验证时出错: {ve}")
-                return client
-            except Exception as e:
-                logger.error(f"创建智谱AI客户端失败: {e}", exc_info=True)
-                raise
-            
-        elif config.provider == "deepseek":
-            logger.info(f"使用DeepSeek API，模型={config.model}, base_url={config.base_url or 'https://api.deepseek.com/v1'}")
-            try:
-                from openai import OpenAI
-                client = OpenAI(
-                    api_key=config.api_key,
-                    base_url=config.base_url or "https://api.deepseek.com/v1"
-                )
-                # 验证客户端是否可用
-                logger.info("正在验证DeepSeek客户端...")
-                try:
-                    if hasattr(client, 'chat') and hasattr(client.chat, 'completions'):
-                        logger.info("DeepSeek客户端验证成功")
-                    else:
-                        logger.warning("DeepSeek客户端缺少必要的方法，可能无法正常工作")
-                except Exception as ve:
-                    logger.warning(f"DeepSeek客户端验证时出错: {ve}")
-                return client
-            except Exception as e:
-                logger.error(f"创建DeepSeek客户端失败: {e}", exc_info=True)
-                raise
-            
-        elif config.provider == "openai_compatible":
-            if not config.base_url:
-                logger.error("base_url is required for openai_compatible provider")
-                return None
-                
-            logger.info(f"使用OpenAI兼容API，模型={config.model}, base_url={config.base_url}")
-            try:
-                from openai import OpenAI
-                client = OpenAI(
-                    api_key=config.api_key,
-                    base_url=config.base_url
-                )
-                # 验证客户端是否可用
-                logger.info("正在验证OpenAI兼容客户端...")
-                try:
-                    if hasattr(client, 'chat') and hasattr(client.chat, 'completions'):
-                        logger.info("OpenAI兼容客户端验证成功")
-                    else:
-                        logger.warning("OpenAI兼容客户端缺少必要的方法，可能无法正常工作")
-                except Exception as ve:
-                    logger.warning(f"OpenAI兼容客户端验证时出错: {ve}")
-                return client
-            except Exception as e:
-                logger.error(f"创建OpenAI兼容客户端失败: {e}", exc_info=True)
-                raise
-            
-        else:
-            logger.error(f"不支持的LLM提供商: {config.provider}")
-            return None
-            
+        logger.info("正在创建LLM客户端，provider=%s, model=%s", config.provider, config.model)
+        return _get_client(config.provider, config.api_key, config.base_url)
+
     except ImportError as e:
-        logger.error(f"无法导入{config.provider}所需模块: {e}")
+        logger.error("无法导入%s所需模块: %s", config.provider, e)
         if config.provider == "zhipuai":
             logger.error("请安装智谱AI客户端: pip install zhipuai")
         elif config.provider in ["deepseek", "openai_compatible"]:
             logger.error("请安装OpenAI客户端: pip install openai")
         return None
-        
+
     except Exception as e:
-        logger.error(f"初始化{config.provider}客户端时出错: {e}", exc_info=True)
-        return None 
+        logger.error("初始化%s客户端时出错: %s", config.provider, e, exc_info=True)
+        return None
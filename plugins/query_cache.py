@@ -0,0 +1,119 @@
+"""
+Query result cache with optional semantic matching.
+
+Answers are keyed by a normalized form of the query. When an embedding function is
+supplied, a query that misses the exact lookup is embedded and compared with the cached
+queries by cosine similarity, so paraphrases of an earlier question can reuse its answer.
+"""
+
+import logging
+import math
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """Lowercase the query and drop punctuation and repeated whitespace"""
+    return _WHITESPACE_RE.sub(" ", _PUNCT_RE.sub("", query.lower())).strip()
+
+def _unit(vector: Sequence[float]) -> List[float]:
+    """Scale a vector to unit length so a dot product gives cosine similarity"""
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+class SemanticQueryCache:
+    """
+    TTL cache of query results, optionally matched by embedding similarity
+
+    Entries are partitioned by a caller-supplied scope (e.g. processing mode) so answers
+    produced in one mode are never returned for another.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 128,
+        embed: Optional[Callable[[str], Awaitable[Sequence[float]]]] = None,
+        threshold: float = 0.95,
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            ttl: Seconds a cached result stays valid
+            max_entries: Maximum number of cached results; the oldest is evicted first
+            embed: Optional async function returning an embedding for a query
+            threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._embed = embed
+        # (scope, normalized query) -> (expires_at, unit embedding or None, result)
+        self._entries: Dict[Tuple[Hashable, str], Tuple[float, Optional[List[float]], Any]] = {}
+
+    async def lookup(self, query: str, scope: Hashable) -> Tuple[bool, Any, Optional[List[float]]]:
+        """
+        Look up a cached result for the query
+
+        Args:
+            query: User query
+            scope: Partition key the result must have been stored under
+
+        Returns:
+            (hit, result, embedding) - the embedding computed on a miss is returned so
+            store() can reuse it instead of embedding the query again
+        """
+        now = time.monotonic()
+        key = (scope, normalize_query(query))
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                return True, entry[2], entry[1]
+            del self._entries[key]
+
+        if self._embed is None:
+            return False, None, None
+        try:
+            vector = _unit(await self._embed(query))
+        except Exception as e:
+            logger.warning("Query embedding failed, semantic cache lookup skipped: %s", e)
+            return False, None, None
+
+        best_score = self.threshold
+        best_result = None
+        found = False
+        for (entry_scope, _), (expires_at, entry_vector, result) in self._entries.items():
+            if entry_scope != scope or entry_vector is None or expires_at <= now:
+                continue
+            score = sum(a * b for a, b in zip(vector, entry_vector))
+            if score >= best_score:
+                best_score, best_result, found = score, result, True
+        if found:
+            logger.debug("Semantic cache hit (similarity %.3f) for query: '%.50s...'", best_score, query)
+        return found, best_result, vector
+
+    def store(self, query: str, scope: Hashable, result: Any, vector: Optional[List[float]] = None) -> None:
+        """
+        Cache a result for the query
+
+        Args:
+            query: User query
+            scope: Partition key for the result
+            result: Result to cache
+            vector: Unit embedding returned by lookup(), if any
+        """
+        key = (scope, normalize_query(query))
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (time.monotonic() + self.ttl, vector, result)
+
+    def clear(self) -> None:
+        """Drop all cached results"""
+        self._entries.clear()
@@ -5,23 +5,357 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 ReAct (Reasoning + Acting) mode implementation for enhancing MCP client reasoning and tool calling capabilities.
 """
 
+import inspect
+import itertools
 import json
 import logging
-import uuid
-from typing import Dict, List, Any, Tuple, Optional, AsyncGenerator
+import re
+import threading
+import time
+from secrets import token_hex
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple, Optional, AsyncGenerator, Awaitable, Callable, NamedTuple
 from datetime import datetime
 import asyncio
+import concurrent.futures
 
 from fastmcp import Client
 
+from plugins.query_cache import SemanticQueryCache
+
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _dumps_text(obj: Any) -> str:
+        """Compact JSON text for a tool result"""
+        try:
+            return orjson.dumps(obj, default=str).decode()
+        except TypeError:  # e.g. non-str dict keys, which the stdlib encoder accepts
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    _loads = json.loads
+
+    def _dumps_text(obj: Any) -> str:
+        """Compact JSON text for a tool result"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
 logger = logging.getLogger(__name__)
 
+# Chunks buffered between the reader thread and the event loop; the reader blocks when full
+_STREAM_QUEUE_SIZE = 64
+_STREAM_END = object()
+
+def _drain_stream(stream, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, stop: threading.Event) -> None:
+    """Read a sync SDK stream in a worker thread and hand its chunks to the event loop"""
+    def put(item) -> bool:
+        """Queue an item, blocking while the queue is full; False once the consumer is gone"""
+        if stop.is_set():
+            return False
+        try:
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        except (RuntimeError, concurrent.futures.CancelledError):
+            return False  # event loop closed or shutting down
+        return not stop.is_set()
+
+    try:
+        for chunk in stream:
+            if not put(chunk):
+                break
+        else:
+            put(_STREAM_END)
+            return
+    except Exception as e:
+        put(e)
+        return
+    
+    # The consumer stopped early: release the response connection
+    close = getattr(stream, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+async def _iter_stream(stream) -> AsyncGenerator[Any, None]:
+    """
+    Iterate an LLM response stream from async code
+    
+    Sync SDK streams are read by one dedicated thread feeding a bounded queue, instead of
+    one executor job per chunk.
+    """
+    if hasattr(stream, "__aiter__"):
+        async for chunk in stream:
+            yield chunk
+        return
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_STREAM_QUEUE_SIZE)
+    stop = threading.Event()
+    threading.Thread(
+        target=_drain_stream, args=(stream, loop, queue, stop), name="llm-stream-reader", daemon=True
+    ).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Consumer finished or stopped early: tell the reader to quit and unblock a pending put
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+# Step and tool-call ids: a random per-process token plus a counter, no RNG read per id
+_ID_TOKEN = token_hex(4)
+_id_sequence = itertools.count(1)
+
+def _new_id(prefix: str) -> str:
+    """Process-unique id for a step or tool call"""
+    return f"{prefix}{_ID_TOKEN}-{next(_id_sequence)}"
+
+def _result_text(result: Any) -> str:
+    """Render a tool result as text, returning str results and MCP text content without copying"""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, (bytes, bytearray)):
+        return result.decode("utf-8", "replace")
+    text = getattr(result, "text", None)
+    if isinstance(text, str):
+        return text
+    # FastMCP returns a list of content objects
+    if isinstance(result, list) and result and all(isinstance(getattr(item, "text", None), str) for item in result):
+        return result[0].text if len(result) == 1 else "\n".join(item.text for item in result)
+    if result is None or isinstance(result, (dict, list, tuple, int, float)):
+        try:
+            return _dumps_text(result)
+        except (TypeError, ValueError):
+            pass
+    return str(result)
+
+# Execution trace line per step role; steps with other roles are left out
+_TRACE_FORMATTERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "assistant": lambda step: f"Thinking: {step['content']}",
+    "tool": lambda step: f"Tool {step['name']}: {step['result']}",
+}
+
+class _ThinkTagSplitter:
+    """
+    Split streamed assistant text on <think></think> tags
+    
+    Each token is scanned once for the next expected tag. A token tail that could be the
+    start of a tag split across tokens is held back until the following token arrives.
+    """
+    OPEN = "<think>"
+    CLOSE = "</think>"
+    __slots__ = ("in_thinking", "_pending")
+    
+    def __init__(self):
+        self.in_thinking = False
+        self._pending = ""
+    
+    def feed(self, token: str) -> List[Tuple[str, str]]:
+        """
+        Consume a token
+        
+        Returns:
+            (kind, text) segments in order; kind is "content" or "thinking" for text, and
+            "open" or "close" (with empty text) where a thinking block starts or ends
+        """
+        text = self._pending + token if self._pending else token
+        self._pending = ""
+        segments = []
+        while True:
+            tag = self.CLOSE if self.in_thinking else self.OPEN
+            index = text.find(tag)
+            if index < 0:
+                break
+            if index:
+                segments.append(("thinking" if self.in_thinking else "content", text[:index]))
+            self.in_thinking = not self.in_thinking
+            segments.append(("open" if self.in_thinking else "close", ""))
+            text = text[index + len(tag):]
+        
+        # Hold back a tail that may be the beginning of the tag
+        start = text.rfind("<", max(0, len(text) - len(tag) + 1))
+        if start >= 0 and tag.startswith(text[start:]):
+            self._pending = text[start:]
+            text = text[:start]
+        if text:
+            segments.append(("thinking" if self.in_thinking else "content", text))
+        return segments
+    
+    def flush(self) -> List[Tuple[str, str]]:
+        """Release text held back at the end of a turn"""
+        text, self._pending = self._pending, ""
+        return [("thinking" if self.in_thinking else "content", text)] if text else []
+
+_JSON_STRUCTURAL_RE = re.compile(r'[{}"\\]')
+
+class _JsonObjectTracker:
+    """
+    Track brace depth of streamed tool-call arguments to spot the end of the JSON object
+    
+    Only braces, quotes and backslashes are visited; braces inside strings are ignored.
+    """
+    __slots__ = ("depth", "in_string", "_escaped_at")
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        # Offset in the next fragment of a character escaped by a backslash, -1 if none
+        self._escaped_at = -1
+    
+    def feed(self, fragment: str) -> bool:
+        """Consume an arguments fragment; returns True if it closed the top-level object"""
+        closed = False
+        for match in _JSON_STRUCTURAL_RE.finditer(fragment):
+            pos = match.start()
+            if pos == self._escaped_at:
+                continue
+            char = match.group()
+            if self.in_string:
+                if char == "\\":
+                    self._escaped_at = pos + 1
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}" and self.depth:
+                self.depth -= 1
+                closed = not self.depth
+        self._escaped_at = 0 if self._escaped_at == len(fragment) else -1
+        return closed
+
+def _token_event(chunk_type: str, content: str, thinking_id: Optional[str] = None) -> Dict[str, Any]:
+    """Token streaming response carrying answer or thinking text"""
+    if chunk_type == "thinking":
+        return {"token_chunk": {"type": "thinking", "content": content, "thinking_id": thinking_id}, "is_final": False}
+    return {"token_chunk": {"type": chunk_type, "content": content}, "is_final": False}
+
+def _thinking_step_event(thinking_id: str, content: str, status: str) -> Dict[str, Any]:
+    """Token streaming response marking the start or end of a <think> block"""
+    return {"thinking_step": {"type": "thinking", "id": thinking_id, "content": content, "status": status}, "is_final": False}
+
+def _tool_step_event(tool: str, step_id: str, params: Dict[str, Any], result: Optional[str] = None) -> Dict[str, Any]:
+    """Token streaming response for a tool call; a result marks it complete"""
+    if result is None:
+        step = {"type": "tool_call", "tool": tool, "id": step_id, "params": params, "status": "start"}
+    else:
+        step = {"type": "tool_call", "tool": tool, "id": step_id, "params": params, "result": result, "status": "complete"}
+    return {"thinking_step": step, "is_final": False}
+
+def _tool_progress_event(tool: str, step_id: str, partial: str) -> Dict[str, Any]:
+    """Token streaming response carrying partial output of a streaming tool"""
+    return {"thinking_step": {"type": "tool_call", "tool": tool, "id": step_id, "partial": partial, "status": "progress"}, "is_final": False}
+
+def _token_final_event(result: str) -> Dict[str, Any]:
+    """Last token streaming response, carrying the complete result"""
+    return {"token_chunk": None, "is_final": True, "result": result}
+
+class _TokenBatcher:
+    """
+    Coalesce consecutive token chunks of the same type into fewer, larger chunks
+    
+    Pending text is released when the chunk type changes, when it reaches max_chars, or on
+    the first token arriving after interval seconds since the last release. Callers flush
+    explicitly before any other event so ordering is preserved.
+    """
+    __slots__ = ("max_chars", "interval", "_key", "_parts", "_size", "_last_flush")
+    
+    def __init__(self, max_chars: int, interval: float):
+        self.max_chars = max_chars
+        self.interval = interval
+        self._key: Optional[Tuple[str, Optional[str]]] = None
+        self._parts: List[str] = []
+        self._size = 0
+        self._last_flush = 0.0
+    
+    def add(self, chunk_type: str, text: str, thinking_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Buffer text, returning the token_chunk responses that became due"""
+        key = (chunk_type, thinking_id)
+        released = []
+        if self._key != key and self._parts:
+            released.append(self.flush())
+        self._key = key
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.max_chars or time.monotonic() - self._last_flush >= self.interval:
+            released.append(self.flush())
+        return released
+    
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Release pending text as one token_chunk response, or None when nothing is pending"""
+        if not self._parts:
+            return None
+        chunk_type, thinking_id = self._key
+        content = "".join(self._parts)
+        self._parts = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+        return _token_event(chunk_type, content, thinking_id)
+
+class _Event(NamedTuple):
+    """Event yielded by ReActAgent._react_engine to the public query methods"""
+    kind: str
+    data: Any = None
+
+# Marks the synthesized message that replaces tool results pruned from a long trajectory
+_SUMMARY_HEADER = "Previous tool results summarized:"
+# Characters kept from the tail of each pruned tool result
+_SUMMARY_TAIL_CHARS = 512
+
+_USE_TOOL_RE = re.compile(r"use this tool", re.IGNORECASE)
+
+_REACT_BASE_PROMPT = """You are an intelligent assistant, using available tools to solve problems. Follow these steps:
+
+1. THINKING: Analyze the problem, determine which tools and methods to use
+2. ACTION: Choose an appropriate tool and use it
+3. OBSERVATION: Analyze the results returned by the tool
+4. Repeat steps 1-3 until you can provide a complete answer
+5. ANSWER: Synthesize all information to provide the final answer
+
+If the question is simple and doesn't require tools, answer directly. If tools are needed, follow the steps above."""
+
+@lru_cache(maxsize=32)
+def _render_react_prompt(pairs: Tuple[Tuple[str, str], ...], has_tools: bool) -> str:
+    """Render the ReAct system prompt for a tuple of (tool name, description) pairs"""
+    if not has_tools:
+        return _REACT_BASE_PROMPT
+    tools_str = "\n".join(f"- {name}: {description}" for name, description in pairs)
+    return "\n\nAvailable tools:\n".join((_REACT_BASE_PROMPT, tools_str))
+
+@lru_cache(maxsize=4096)
+def _enhanced_description(description: str, tool_name: str) -> str:
+    """Memoized body of ReActAgent._enhance_tool_description"""
+    if not description.endswith('.'):
+        description += '.'
+        
+    # If description doesn't include "use this tool" guidance, add it
+    if not _USE_TOOL_RE.search(description):
+        description += f" Use this tool when you need {tool_name} related functionality."
+        
+    return description
+
 class ReActAgent:
     """
     Implementation of ReAct (Reasoning + Acting) mode agent.
     Enhances LLM reasoning and tool calling capabilities, supporting multi-round tool calling cycles.
     """
     
+    # Character-budget compaction keeps this many trailing messages verbatim and only
+    # truncates tool results longer than this many characters
+    RECENT_MESSAGES_KEPT = 6
+    TRUNCATE_TOOL_RESULT_OVER = 1024
+    
+    # Token streaming coalesces chunks up to this many characters or this many seconds
+    TOKEN_BATCH_MAX_CHARS = 8192
+    TOKEN_BATCH_INTERVAL = 0.025
+    
     def __init__(self, llm_client, client, config, registry=None):
         """
         Initialize ReAct agent
@@ -37,9 +371,58 @@ class ReActAgent:
         self.config = config
         self.registry = registry
         
+        # Client types whose call_tool returns FastMCP content lists. Resolved here rather than
+        # at module level because core.enhanced_client imports this module.
+        from core.enhanced_client import EnhancedFastMCPClient
+        self._client_types = (Client, EnhancedFastMCPClient)
+        
         # Read ReAct related parameters from configuration
         self.max_iterations = config.get("react_max_iterations", 25)
         self.enable_trace = config.get("react_enable_trace", False)
+        # Soft cap on history length; older tool turns are collapsed into a summary, 0 disables
+        self.max_context_messages = config.get("react_max_context_messages", 40)
+        # Soft cap on history size in characters; older large tool results become placeholders, 0 disables
+        self.max_context_chars = config.get("react_max_context_chars", 32768)
+        # Longest tool result passed back to the LLM, in characters; 0 disables truncation
+        self.max_tool_result_chars = config.get("react_max_tool_result_chars", 4096)
+        # Seconds a single tool call may take before it is abandoned; 0 disables the timeout
+        self.tool_timeout = config.get("react_tool_timeout", 30)
+        # Whether token streaming forwards <think> content; when off it is only kept out of the answer
+        self.emit_thinking = config.get("react_emit_thinking", True)
+        # Whether a tool call starts while the LLM turn is still streaming, once its arguments are complete;
+        # off by default, since a turn that ends without tool_calls cannot undo the call's side effects
+        self.speculative_tool_calls = config.get("react_speculative_tool_calls", False)
+        
+        # Processed tool definitions and system prompt for the last seen tool set
+        self._tools_cache_key: Optional[Tuple] = None
+        self._tools_cache: Optional[Tuple[List[Dict[str, Any]], str]] = None
+        
+        # Final answers cached per (prompt, model) so repeated or paraphrased queries skip the
+        # ReAct loop; react_cache_ttl of 0 disables the cache
+        self._response_cache: Optional[SemanticQueryCache] = None
+        cache_ttl = float(config.get("react_cache_ttl", 0) or 0)
+        if cache_ttl > 0:
+            self._embedding_model = config.get("embedding_model")
+            embed = self._embed_query if self._embedding_model and llm_client else None
+            self._response_cache = SemanticQueryCache(
+                cache_ttl,
+                embed=embed,
+                threshold=float(config.get("react_cache_threshold", 0.92)),
+            )
+    
+    async def _embed_query(self, text: str) -> List[float]:
+        """Embed a query with the LLM provider's embedding endpoint"""
+        response = await asyncio.to_thread(
+            self.llm_client.embeddings.create, model=self._embedding_model, input=text
+        )
+        return response.data[0].embedding
+    
+    def _response_cache_scope(self, system_prompt: str) -> Tuple[str, str, str]:
+        """Cache partition for answers produced with this prompt (and thus tool set) and model"""
+        llm_config = self.config.get("llm_config")
+        provider = getattr(llm_config, "provider", "")
+        model = getattr(llm_config, "model", "")
+        return (provider, model, system_prompt)
         
     def _create_react_system_prompt(self, tools: List[Dict[str, Any]]) -> str:
         """
@@ -51,23 +434,11 @@ class ReActAgent:
         Returns:
             Optimized system prompt string
         """
-        base_prompt = """You are an intelligent assistant, using available tools to solve problems. Follow these steps:
-
-1. THINKING: Analyze the problem, determine which tools and methods to use
-2. ACTION: Choose an appropriate tool and use it
-3. OBSERVATION: Analyze the results returned by the tool
-4. Repeat steps 1-3 until you can provide a complete answer
-5. ANSWER: Synthesize all information to provide the final answer
-
-If the question is simple and doesn't require tools, answer directly. If tools are needed, follow the steps above."""
-        
-        # Add tools list information
-        if tools:
-            tools_str = "\n".join([f"- {tool['function']['name']}: {tool['function']['description']}" 
-                                for tool in tools if 'function' in tool])
-            base_prompt += f"\n\nAvailable tools:\n{tools_str}"
-        
-        return base_prompt
+        pairs = tuple(
+            (tool['function']['name'], tool['function']['description'])
+            for tool in tools if 'function' in tool
+        )
+        return _render_react_prompt(pairs, bool(tools))
     
     def _format_execution_trace(self, trace: List[Dict[str, Any]]) -> str:
         """
@@ -79,13 +450,10 @@ If the question is simple and doesn't require tools, answer directly. If tools a
         Returns:
             Formatted execution trace string
         """
-        formatted = []
-        for step in trace:
-            if step["role"] == "assistant":
-                formatted.append(f"Thinking: {step['content']}")
-            elif step["role"] == "tool":
-                formatted.append(f"Tool {step['name']}: {step['result']}")
-        return "\n".join(formatted)
+        formatters = _TRACE_FORMATTERS
+        return "\n".join(
+            formatters[step["role"]](step) for step in trace if step["role"] in formatters
+        )
     
     def _enhance_tool_description(self, description: str, tool_name: str) -> str:
         """
@@ -98,16 +466,68 @@ If the question is simple and doesn't require tools, answer directly. If tools a
         Returns:
             Enhanced tool description
         """
-        if not description.endswith('.'):
-            description += '.'
-            
-        # If description doesn't include "use this tool" guidance, add it
-        if "use this tool" not in description.lower():
-            description += f" Use this tool when you need {tool_name} related functionality."
+        return _enhanced_description(description, tool_name)
+    
+    @staticmethod
+    def _tools_fingerprint(tools) -> Tuple:
+        """Cheap identity of a tool list: the (name, description) of every tool, in order"""
+        fingerprint = []
+        for tool in tools:
+            if isinstance(tool, dict):
+                function_def = tool.get("function") or {}
+                fingerprint.append((
+                    tool.get("name") or function_def.get("name"),
+                    tool.get("description") or function_def.get("description"),
+                ))
+            else:
+                fingerprint.append((getattr(tool, "name", None), getattr(tool, "description", None)))
+        return tuple(fingerprint)
+    
+    def _prepare_tools(self, raw_tools) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Get processed tool definitions and the ReAct system prompt for a tool list
+        
+        Both are reused until the tool list changes, so steady-state queries skip
+        re-processing every tool.
+        
+        Args:
+            raw_tools: Tool list from client.list_tools() or registry.get_all_tools()
             
-        return description
+        Returns:
+            (Processed tool definition list, system prompt)
+        """
+        key = self._tools_fingerprint(raw_tools)
+        cached = self._tools_cache
+        if cached is not None and key == self._tools_cache_key:
+            return cached
+        available_tools = self.process_tool_definitions(raw_tools)
+        cached = (available_tools, self._create_react_system_prompt(available_tools))
+        self._tools_cache, self._tools_cache_key = cached, key
+        return cached
     
-    async def process_tool_definitions(self, tools) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _is_llm_tool(tool) -> bool:
+        """Whether a tool is already a {"type": "function", "function": {...}} definition"""
+        return isinstance(tool, dict) and tool.get("type") == "function" and "function" in tool
+    
+    def _enhance_llm_tool(self, tool: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Copy an LLM-format tool with its description enhanced
+        
+        The registry's definitions are shared and must not be modified.
+        """
+        function_def = tool["function"]
+        if "description" not in function_def:
+            return tool
+        return {**tool, "function": {
+            **function_def,
+            "description": self._enhance_tool_description(
+                function_def["description"], 
+                function_def["name"]
+            )
+        }}
+    
+    def process_tool_definitions(self, tools) -> List[Dict[str, Any]]:
         """
         Process tool definitions, optimize descriptions for ReAct mode
         
@@ -117,21 +537,18 @@ If the question is simple and doesn't require tools, answer directly. If tools a
         Returns:
             Processed tool definition list for LLM
         """
+        # Fast path: registry tools are already in LLM format and only need descriptions enhanced
+        if all(map(self._is_llm_tool, tools)):
+            return [self._enhance_llm_tool(tool) for tool in tools]
+        
         processed_tools = []
         
         for tool in tools:
             # Handle dictionary format tools (from registry.get_all_tools())
             if isinstance(tool, dict):
-                # If already in LLM tool format, add directly with enhanced description
-                if "type" in tool and tool.get("type") == "function" and "function" in tool:
-                    # Get function description and enhance
-                    function_def = tool["function"]
-                    if "description" in function_def:
-                        function_def["description"] = self._enhance_tool_description(
-                            function_def["description"], 
-                            function_def["name"]
-                        )
-                    processed_tools.append(tool)
+                # If already in LLM tool format, add a copy with enhanced description
+                if self._is_llm_tool(tool):
+                    processed_tools.append(self._enhance_llm_tool(tool))
                     continue
                 
                 # Otherwise, try to extract name, description and parameters from tool dict
@@ -140,7 +557,7 @@ If the question is simple and doesn't require tools, answer directly. If tools a
                 parameters = tool.get("parameters") or tool.get("function", {}).get("parameters") or tool.get("inputSchema", {}) or {}
                 
                 if not tool_name:
-                    logger.warning(f"Skipping tool with missing name: {tool}")
+                    logger.warning("Skipping tool with missing name: %s", tool)
                     continue
                 
                 # Enhance description
@@ -169,7 +586,7 @@ If the question is simple and doesn't require tools, answer directly. If tools a
                 # For FastMCP tools
                 tool_name = getattr(tool, 'name', None)
                 if not tool_name:
-                    logger.warning(f"Skipping tool with missing name: {tool}")
+                    logger.warning("Skipping tool with missing name: %s", tool)
                     continue
                 
                 # Get parameters schema
@@ -223,64 +640,360 @@ If the question is simple and doesn't require tools, answer directly. If tools a
         if self.registry:
             session = self.registry.get_session_for_tool(function_name)
             if session:
-                logger.info(f"Found tool '{function_name}' in registry, calling through appropriate session")
+                logger.info("Found tool '%s' in registry, calling through appropriate session", function_name)
                 try:
                     return await session.call_tool(function_name, function_args)
                 except Exception as e:
-                    logger.error(f"Error calling tool '{function_name}' through registry session: {e}")
+                    logger.error("Error calling tool '%s' through registry session: %s", function_name, e)
                     raise e
             else:
-                logger.warning(f"Tool '{function_name}' not found in registry")
+                logger.warning("Tool '%s' not found in registry", function_name)
                 raise ValueError(f"Tool not found: {function_name}")
         
         # If no registry or tool not found, fall back to direct client call
-        logger.info(f"Calling tool '{function_name}' directly through client")
+        logger.info("Calling tool '%s' directly through client", function_name)
         
         # Handle both FastMCP Client and EnhancedFastMCPClient
-        from core.enhanced_client import EnhancedFastMCPClient
-        if isinstance(self.client, (Client, EnhancedFastMCPClient)):
+        if isinstance(self.client, self._client_types):
             result = await self.client.call_tool(function_name, function_args)
             
-            # FastMCP Client returns a list of content objects
-            if isinstance(result, list) and len(result) > 0:
-                # Extract text content if available
-                if hasattr(result[0], 'text'):
-                    return result[0].text
-                # Fall back to string representation
-                return str(result)
+            # FastMCP Client returns a list of content objects; return the first text as is
+            if isinstance(result, list) and len(result) > 0 and hasattr(result[0], 'text'):
+                return result[0].text
             
             return result
         else:
             # Legacy client support
             return await self.client.call_tool(function_name, function_args)
 
-    async def process_query(self, query: str) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+    def _compact_messages(self, messages: List[Dict[str, Any]]) -> None:
         """
-        Process query using ReAct mode, supporting multi-round tool calls
+        Keep a long trajectory within the message count and character budgets
         
         Args:
-            query: User query string
+            messages: Message history, starting with the system prompt and user query
+        """
+        self._collapse_old_turns(messages)
+        self._truncate_old_tool_results(messages)
+
+    def _collapse_old_turns(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Collapse the oldest tool turns of a long trajectory into one summary message
+        
+        The system prompt and user query stay pinned. A turn (an assistant message and the
+        tool results that answer it) is always pruned whole so every remaining tool message
+        still follows the assistant call it belongs to. The list is modified in place.
+        
+        Args:
+            messages: Message history, starting with the system prompt and user query
+        """
+        cap = self.max_context_messages
+        if not cap or len(messages) <= cap:
+            return
+        
+        head = 2
+        lines: List[str] = []
+        if len(messages) > head and messages[head]["role"] == "system" \
+                and messages[head]["content"].startswith(_SUMMARY_HEADER):
+            lines.append(messages[head]["content"][len(_SUMMARY_HEADER):].strip("\n"))
+            head += 1
+        
+        # Pinned messages plus the summary must fit alongside what is kept
+        start = head
+        while start < len(messages) and len(messages) - start + 3 > cap:
+            message = messages[start]
+            start += 1
+            names = {tc["id"]: tc["function"]["name"] for tc in message.get("tool_calls") or ()}
+            while start < len(messages) and messages[start]["role"] == "tool":
+                result = str(messages[start]["content"] or "")
+                name = names.get(messages[start].get("tool_call_id"), "tool")
+                lines.append(f"- {name}: {result[-_SUMMARY_TAIL_CHARS:]}")
+                start += 1
+        if start == head:
+            return
+        
+        summary = {"role": "system", "content": "\n".join([_SUMMARY_HEADER, *filter(None, lines)])}
+        messages[2:start] = [summary]
+        logger.debug("Compacted ReAct history to %d messages", len(messages))
+
+    def _truncate_old_tool_results(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Replace large, older tool results with short placeholders once the history exceeds
+        the character budget
+        
+        The most recent messages are kept verbatim, and assistant tool calls are left intact
+        so every tool message still answers a call. The list is modified in place.
+        
+        Args:
+            messages: Message history, starting with the system prompt and user query
+        """
+        budget = self.max_context_chars
+        if not budget:
+            return
+        total = sum(len(m["content"]) for m in messages if isinstance(m.get("content"), str))
+        if total <= budget:
+            return
+        
+        names: Dict[str, str] = {}
+        for message in messages[2:len(messages) - self.RECENT_MESSAGES_KEPT]:
+            for tool_call in message.get("tool_calls") or ():
+                names[tool_call["id"]] = tool_call["function"]["name"]
+            content = message.get("content")
+            if message["role"] != "tool" or not isinstance(content, str) \
+                    or len(content) <= self.TRUNCATE_TOOL_RESULT_OVER:
+                continue
+            name = names.get(message.get("tool_call_id"), "tool")
+            placeholder = f"[truncated: {name} returned {len(content)} chars]"
+            message["content"] = placeholder
+            total -= len(content) - len(placeholder)
+            if total <= budget:
+                break
+        logger.debug("Truncated older tool results, history is now %d characters", total)
+
+    async def _run_tool(
+        self, function_name: str, function_args: Dict[str, Any], on_progress: Optional[Callable[[str], None]]
+    ) -> Any:
+        """
+        Call a tool and, if it streams, collect its output
+        
+        A tool may return an async iterator instead of a value; each item is rendered as
+        text, reported through on_progress and the joined text becomes the result.
+        """
+        result = await self._call_tool_with_registry(function_name, function_args)
+        if not hasattr(result, "__aiter__"):
+            return result
+        parts: List[str] = []
+        async for item in result:
+            text = _result_text(item)
+            parts.append(text)
+            if on_progress is not None:
+                on_progress(text)
+        return "".join(parts)
+
+    async def _execute_tool_call(
+        self, function_name: str, function_args: Dict[str, Any], on_progress: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Execute one tool call and render its result for the message history
+        
+        Errors are returned as text rather than raised, so one failing call does not
+        abort the other calls dispatched in the same assistant turn.
+        
+        Args:
+            function_name: Tool name
+            function_args: Parsed tool arguments
+            on_progress: Optional callback receiving each partial output of a streaming tool
             
         Returns:
-            (Result string, execution trace list if enabled)
+            Tool result string
+        """
+        try:
+            logger.info("Executing tool '%s', parameters: %s", function_name, function_args)
+            call = self._run_tool(function_name, function_args, on_progress)
+            result = await asyncio.wait_for(call, self.tool_timeout) if self.tool_timeout else await call
+            # Tool results can be large, skip rendering them when INFO is filtered out
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Tool '%s' returned result: %s", function_name, result)
+            text = _result_text(result)
+            limit = self.max_tool_result_chars
+            if limit and len(text) > limit:
+                text = f"{text[:limit]}... [truncated {len(text) - limit} characters]"
+            return text
+        except asyncio.TimeoutError:
+            logger.warning("Tool '%s' timed out after %ss", function_name, self.tool_timeout)
+            return f"Error: tool '{function_name}' timed out after {self.tool_timeout}s"
+        except Exception as e:
+            logger.error("Tool call error: %s", e, exc_info=True)
+            return f"Error: An internal error occurred while calling tool '{function_name}': {str(e)}"
+
+    @staticmethod
+    async def _gather_tool_calls(names: List[str], jobs: List[Awaitable[str]]) -> List[str]:
+        """
+        Wait for the tool calls of one assistant turn, which run concurrently
+        
+        Args:
+            names: Tool names, for error messages
+            jobs: _execute_tool_call coroutines, or tasks already started speculatively
+            
+        Returns:
+            Tool result strings, in the same order as jobs
+        """
+        outcomes = await asyncio.gather(*jobs, return_exceptions=True)
+        return [
+            f"Error: An internal error occurred while calling tool '{name}': {outcome!r}"
+            if isinstance(outcome, BaseException) else outcome
+            for name, outcome in zip(names, outcomes)
+        ]
+
+    @staticmethod
+    async def _stream_completion(
+        chat_create, model_name: str, messages: List[Dict[str, Any]], available_tools: List[Dict[str, Any]],
+        on_arguments_complete: Optional[Callable[[Dict[str, Any], str], None]] = None
+    ) -> AsyncGenerator[_Event, None]:
+        """
+        Run one LLM turn with streaming
+        
+        Consumption stops as soon as a finish_reason arrives, so tool dispatch can start
+        without waiting for the rest of the stream.
+        
+        Args:
+            chat_create: The LLM client's chat.completions.create
+            model_name: Model to call
+            messages: Message history
+            available_tools: Processed tool definitions
+            on_arguments_complete: Optional callback receiving (tool call, arguments so far)
+                as soon as a call's arguments form a balanced JSON object, which usually
+                happens a few chunks before the finish_reason
+            
+        Yields:
+            A "token" event per content delta, then one "turn" event carrying
+            (assistant content, tool calls in request format, finish reason)
+        """
+        request = dict(
+            model=model_name,
+            messages=messages,
+            tools=available_tools if available_tools else None,
+            stream=True
+        )
+        # Sync SDKs block until the response headers arrive, so open the stream off the event loop
+        if asyncio.iscoroutinefunction(chat_create):
+            stream = await chat_create(**request)
+        else:
+            stream = await asyncio.to_thread(chat_create, **request)
+            if inspect.isawaitable(stream):
+                # Async SDK method hidden behind a sync decorator
+                stream = await stream
+        
+        # Deltas are collected as fragments and joined once the turn ends
+        content_parts: List[str] = []
+        tool_calls: List[Dict[str, Any]] = []
+        argument_parts: List[List[str]] = []
+        trackers: List[_JsonObjectTracker] = []
+        finish_reason = None
+        chunks = _iter_stream(stream)
+        try:
+            async for chunk in chunks:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                delta = choice.delta
+                
+                content = getattr(delta, "content", None)
+                if content:
+                    content_parts.append(content)
+                    yield _Event("token", content)
+                
+                for tool_call_delta in getattr(delta, "tool_calls", None) or ():
+                    index = tool_call_delta.index
+                    if index >= len(tool_calls):
+                        missing = index + 1 - len(tool_calls)
+                        tool_calls.extend(
+                            {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
+                            for _ in range(missing)
+                        )
+                        argument_parts.extend([] for _ in range(missing))
+                        trackers.extend(_JsonObjectTracker() for _ in range(missing))
+                    entry = tool_calls[index]
+                    if getattr(tool_call_delta, "id", None):
+                        entry["id"] = tool_call_delta.id
+                    function_delta = getattr(tool_call_delta, "function", None)
+                    if function_delta is not None:
+                        if getattr(function_delta, "name", None):
+                            entry["function"]["name"] = function_delta.name
+                        arguments = getattr(function_delta, "arguments", None)
+                        if arguments:
+                            argument_parts[index].append(arguments)
+                            if (
+                                trackers[index].feed(arguments)
+                                and on_arguments_complete is not None
+                                and entry["function"]["name"]
+                            ):
+                                on_arguments_complete(entry, "".join(argument_parts[index]))
+                
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                    break
+        finally:
+            # Closing the iterator stops the reader thread when the turn ends early
+            await chunks.aclose()
+        
+        unnamed = 0
+        for entry, parts in zip(tool_calls, argument_parts):
+            entry["function"]["arguments"] = "".join(parts)
+            if not entry["id"]:
+                # The provider sent no id for this call, mint one
+                entry["id"] = _new_id("call_")
+            if not entry["function"]["name"]:
+                unnamed += 1
+        
+        # Drop tool calls whose name never arrived, the API rejects them; usually there are none
+        if unnamed:
+            tool_calls = [tc for tc in tool_calls if tc["function"]["name"]]
+        yield _Event("turn", ("".join(content_parts), tool_calls, finish_reason))
+
+    async def _react_engine(self, query: str, mode: str, trace: bool = False) -> AsyncGenerator[_Event, None]:
+        """
+        ReAct loop shared by the sync, step streaming and token streaming entry points
+        
+        Args:
+            query: User query string
+            mode: "sync", "step" or "token"; token mode adds the <think> instruction,
+                emits "token" events and bypasses the response cache
+            trace: Record the execution trace for this call even when enable_trace is off
+            
+        Yields:
+            Events, in order of occurrence:
+            - "token": assistant content delta (token mode only)
+            Step events, not emitted in sync mode:
+            - "assistant": complete assistant content of a turn
+            - "tool_start": (tool call, parsed arguments), for every call of a turn
+            - "tool_progress": (tool call, partial output) from a tool that streams its result
+            - "tool_result": (tool call, parsed arguments, result string), after the turn's
+              calls have run concurrently
+            Exactly one terminal event ends the stream:
+            - "final": (result, execution trace if recorded)
+            - "cached": (result, execution trace) served from the response cache
+            - "fail": ready-made error message
+            - "error": exception raised during the loop
+            - "limit": (content of the last message, execution trace) when max_iterations
+              is reached
         """
-        if not self.llm_client: 
-            return "Error: Language model client not configured.", None
+        if not self.llm_client:
+            yield _Event("fail", "Error: Language model client not configured.")
+            return
         
         # Get available tools
         if self.registry:
             # Get all tools from global registry
             raw_tools = self.registry.get_all_tools()
-            logger.info(f"Using {len(raw_tools)} tools from global registry")
+            logger.info("Using %d tools from global registry", len(raw_tools))
         else:
             # Backward compatibility: get tools from single client
             raw_tools = await self.client.list_tools()
-            logger.info(f"Using {len(raw_tools)} tools from single client")
+            logger.info("Using %d tools from single client", len(raw_tools))
         
-        available_tools = await self.process_tool_definitions(raw_tools)
+        # Processed tools and system prompt are reused while the tool set is unchanged
+        available_tools, system_prompt = self._prepare_tools(raw_tools)
+        emit_tokens = mode == "token"
+        # process_query only consumes the terminal event, so it gets no step events
+        emit_steps = mode != "sync"
+        if emit_tokens:
+            system_prompt += "\n\nWhen thinking, surround your thoughts with <think></think> tags."
         
-        # Build system prompt
-        system_prompt = self._create_react_system_prompt(available_tools)
+        # Trace recording is per call, so the shared agent holds no per-request state
+        record_trace = trace or self.enable_trace
+        
+        # Serve repeated (or, with embeddings, paraphrased) queries from the response cache
+        cache = self._response_cache if not emit_tokens else None
+        cache_scope = cache_vector = None
+        if cache is not None:
+            # Answers stored without a trace must not be served to a call that asked for one
+            cache_scope = (*self._response_cache_scope(system_prompt), record_trace)
+            hit, cached, cache_vector = await cache.lookup(query, cache_scope)
+            if hit:
+                logger.info("Response cache hit (%s) for query: '%.50s...'", mode, query)
+                yield _Event("cached", cached)
+                return
         
         # Initial message history
         messages = [
@@ -289,84 +1002,147 @@ If the question is simple and doesn't require tools, answer directly. If tools a
         ]
         
         # Record execution trace
-        execution_trace = []
+        execution_trace = [] if record_trace else None
+        
+        # Resolve the model and the create call once for the whole loop
+        llm_config = self.config.get("llm_config")
+        if not llm_config or not llm_config.model:
+            yield _Event("fail", "Error: Language model name not configured.")
+            return
+        model_name = llm_config.model
+        provider = llm_config.provider
+        chat_create = self.llm_client.chat.completions.create
         
         # ReAct loop
         iterations = 0
         while iterations < self.max_iterations:
             iterations += 1
-            logger.info(f"Starting ReAct iteration #{iterations}, processing query: '{query[:50]}...'")
+            logger.info("Starting %s ReAct iteration #%d, processing query: '%.50s...'", mode, iterations, query)
+            
+            # Keep the prompt bounded on long trajectories
+            self._compact_messages(messages)
+            
+            # Partial output of streaming tools, forwarded while the calls run
+            progress: Optional[asyncio.Queue] = asyncio.Queue() if emit_steps else None
+            
+            def progress_for(tool_call: Dict[str, Any]) -> Optional[Callable[[str], None]]:
+                return None if progress is None else (lambda text: progress.put_nowait((tool_call, text)))
+            
+            # Tool calls started before the turn finished: id(tool call) -> (decoded arguments, task)
+            speculative: Dict[int, Tuple[Any, asyncio.Future]] = {}
+            
+            def speculate(tool_call: Dict[str, Any], arguments: str) -> None:
+                try:
+                    function_args = _loads(arguments)
+                except json.JSONDecodeError:
+                    return
+                stale = speculative.get(id(tool_call))
+                if stale is not None:
+                    if stale[0] == function_args:
+                        return
+                    stale[1].cancel()
+                speculative[id(tool_call)] = (function_args, asyncio.ensure_future(self._execute_tool_call(
+                    tool_call["function"]["name"], function_args, progress_for(tool_call)
+                )))
             
-            # Call LLM
             try:
-                # Get model name
-                llm_config = self.config.get("llm_config")
-                if not llm_config or not llm_config.model:
-                    return "Error: Language model name not configured.", None
-                    
-                model_name = llm_config.model
-                provider = llm_config.provider
-                
-                logger.debug(f"Sending query to LLM ({provider}/{model_name}). Query: '{query[:50]}...'. Tools: {len(available_tools)}")
+                logger.debug("Sending query to LLM (%s/%s). Query: '%.50s...'. Tools: %d", provider, model_name, query, len(available_tools))
                 
-                # Create LLM request
-                response = self.llm_client.chat.completions.create(
-                    model=model_name,
-                    messages=messages,
-                    tools=available_tools if available_tools else None
-                )
-                
-                choice = response.choices[0]
-                message = choice.message
+                # Stream the LLM turn; a tool call is dispatched as soon as its arguments are complete
+                async for event in self._stream_completion(
+                    chat_create, model_name, messages, available_tools,
+                    speculate if self.speculative_tool_calls else None
+                ):
+                    if event.kind == "turn":
+                        assistant_response, tool_calls, finish_reason = event.data
+                    elif emit_tokens:
+                        yield event
                 
                 # Record assistant response
-                assistant_response = message.content or ""
-                if self.enable_trace:
+                if execution_trace is not None:
                     execution_trace.append({"role": "assistant", "content": assistant_response})
+                if emit_steps:
+                    yield _Event("assistant", assistant_response)
                 
-                # Tool call needed
-                if choice.finish_reason == "tool_calls" and message.tool_calls:
-                    # Get tool call information
-                    tool_call = message.tool_calls[0]
-                    function_name = tool_call.function.name
-                    logger.info(f"LLM requested tool call: '{function_name}'")
-                    
-                    # Add assistant message to history
-                    messages.append({
-                        "role": "assistant",
-                        "content": None,
-                        "tool_calls": [{
-                            "id": tool_call.id,
-                            "type": "function",
-                            "function": {
-                                "name": function_name,
-                                "arguments": tool_call.function.arguments
-                            }
-                        }]
-                    })
-                    
-                    # Execute tool call
+                # LLM provides final answer
+                if finish_reason != "tool_calls" or not tool_calls:
+                    logger.info("LLM provided final answer, ending %s ReAct loop", mode)
+                    answer = (assistant_response.strip(), execution_trace)
+                    if cache is not None:
+                        cache.store(query, cache_scope, answer, cache_vector)
+                    yield _Event("final", answer)
+                    return
+                
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("LLM requested tool calls: %s", [tc["function"]["name"] for tc in tool_calls])
+                
+                # Add assistant message to history
+                messages.append({
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": tool_calls
+                })
+                
+                # Parse arguments per call, so one malformed call does not fail the batch
+                calls: List[Tuple[str, Dict[str, Any]]] = []
+                tool_results: List[Optional[str]] = []
+                pending: List[int] = []
+                for i, tool_call in enumerate(tool_calls):
+                    function_name = tool_call["function"]["name"]
+                    arguments = tool_call["function"]["arguments"]
                     try:
-                        # Parse arguments
-                        function_args = json.loads(tool_call.function.arguments)
-                        
-                        # Call tool using registry or client
-                        try:
-                            logger.info(f"Executing tool '{function_name}', parameters: {function_args}")
-                            result = await self._call_tool_with_registry(function_name, function_args)
-                            logger.info(f"Tool '{function_name}' returned result: {result}")
-                            
-                            # Process tool result
-                            tool_result = str(result)
-                        except Exception as e:
-                            tool_result = f"Error: An internal error occurred while calling tool '{function_name}': {str(e)}"
-                            logger.error(f"Tool call error: {e}", exc_info=True)
+                        # Calls without arguments stream an empty string, skip decoding it
+                        function_args = _loads(arguments) if arguments else {}
+                        pending.append(i)
+                        tool_results.append(None)
                     except json.JSONDecodeError as e:
-                        tool_result = f"Error: Unable to parse parameters for tool '{function_name}': {e}"
-                        logger.error(f"Parameter parsing error: {e}")
-                    
+                        logger.error("Parameter parsing error: %s", e)
+                        function_args = {"error": f"Unable to parse parameters: {e}"}
+                        tool_results.append(f"Error: Unable to parse parameters for tool '{function_name}': {e}")
+                    calls.append((function_name, function_args))
+                    if emit_steps:
+                        yield _Event("tool_start", (tool_call, function_args))
+                
+                # Execute the turn's tool calls concurrently, reusing speculative calls whose
+                # decoded arguments did not change after they were started (trailing whitespace
+                # fragments must not trigger a second call)
+                jobs: List[Awaitable[str]] = []
+                for i in pending:
+                    tool_call = tool_calls[i]
+                    started = speculative.pop(id(tool_call), None)
+                    if started is not None and started[0] == calls[i][1]:
+                        jobs.append(started[1])
+                        continue
+                    if started is not None:
+                        logger.debug("Arguments of tool '%s' changed after dispatch, calling it again", calls[i][0])
+                        started[1].cancel()
+                    jobs.append(self._execute_tool_call(*calls[i], progress_for(tool_call)))
+                names = [calls[i][0] for i in pending]
+                if progress is not None:
+                    gathering = asyncio.ensure_future(self._gather_tool_calls(names, jobs))
+                    try:
+                        while not gathering.done() or not progress.empty():
+                            if progress.empty():
+                                getter = asyncio.ensure_future(progress.get())
+                                await asyncio.wait({gathering, getter}, return_when=asyncio.FIRST_COMPLETED)
+                                if not getter.done():
+                                    getter.cancel()
+                                    continue
+                                tool_call, text = getter.result()
+                            else:
+                                tool_call, text = progress.get_nowait()
+                            yield _Event("tool_progress", (tool_call, text))
+                        gathered = gathering.result()
+                    finally:
+                        gathering.cancel()
+                else:
+                    gathered = await self._gather_tool_calls(names, jobs)
+                for i, tool_result in zip(pending, gathered):
+                    tool_results[i] = tool_result
+                
+                for tool_call, (function_name, function_args), tool_result in zip(tool_calls, calls, tool_results):
                     # Record tool result in trace
-                    if self.enable_trace:
+                    if execution_trace is not None:
                         execution_trace.append({
                             "role": "tool",
                             "name": function_name,
@@ -376,33 +1152,59 @@ If the question is simple and doesn't require tools, answer directly. If tools a
                     # Add tool result to message history
                     messages.append({
                         "role": "tool",
-                        "tool_call_id": tool_call.id,
+                        "tool_call_id": tool_call["id"],
                         "content": tool_result
                     })
-                    
-                    # Continue to next iteration
-                    continue
+                    if emit_steps:
+                        yield _Event("tool_result", (tool_call, function_args, tool_result))
                 
-                # LLM provides final answer
-                logger.info(f"LLM provided final answer, ending ReAct loop")
-                result = message.content.strip() if message.content else ""
-                return result, execution_trace if self.enable_trace else None
-                
-            except TypeError as e:
-                # Catch the specific TypeError seen before
-                error_msg = f"Type error during LLM call: {e}. Check SDK parameters for model '{model_name}'."
-                logger.error(error_msg, exc_info=True)
-                return f"Error: Type error during language model call, please check SDK parameters. ({e})", None
             except Exception as e:
-                error_msg = f"Error during ReAct process: {type(e).__name__}: {e}"
-                logger.error(error_msg, exc_info=True)
-                return f"Error processing your request. ({error_msg})", None
+                logger.error("Error during %s ReAct process: %s: %s", mode, type(e).__name__, e, exc_info=True)
+                yield _Event("error", e)
+                return
+            finally:
+                # Speculative calls the turn did not end up using
+                for _, task in speculative.values():
+                    task.cancel()
         
         # Maximum iterations reached
-        logger.warning(f"Maximum ReAct iterations reached ({self.max_iterations})")
-        last_message = messages[-1].get("content", "") if messages else ""
-        result = f"Processing your request exceeded the maximum iteration limit ({self.max_iterations}). " + last_message
-        return result, execution_trace if self.enable_trace else None 
+        logger.warning("Maximum ReAct iterations reached (%d)", self.max_iterations)
+        yield _Event("limit", (messages[-1].get("content", "") if messages else "", execution_trace))
+
+    def _limit_message(self, last_message: Optional[str]) -> str:
+        """Result text when the ReAct loop hits max_iterations"""
+        return f"Processing your request exceeded the maximum iteration limit ({self.max_iterations}). " + (last_message or "")
+
+    @staticmethod
+    def _error_message(error: Exception, process: str) -> str:
+        """Result text for an exception raised inside the ReAct loop"""
+        if isinstance(error, TypeError):
+            # The specific TypeError seen before comes from unsupported SDK parameters
+            return f"Error: Type error during language model call, please check SDK parameters. ({error})"
+        return f"Error processing your request. (Error during {process}: {type(error).__name__}: {error})"
+
+    async def process_query(self, query: str, trace: bool = False) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+        """
+        Process query using ReAct mode, supporting multi-round tool calls
+        
+        Args:
+            query: User query string
+            trace: Record the execution trace for this query even when enable_trace is off
+            
+        Returns:
+            (Result string, execution trace list if recorded)
+        """
+        async for event in self._react_engine(query, "sync", trace):
+            if event.kind in ("final", "cached"):
+                return event.data
+            if event.kind == "fail":
+                return event.data, None
+            if event.kind == "error":
+                return self._error_message(event.data, "ReAct process"), None
+            if event.kind == "limit":
+                last_message, execution_trace = event.data
+                return self._limit_message(last_message), execution_trace
+        return self._limit_message(None), None
 
     async def stream_process_query(self, query: str) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -414,176 +1216,60 @@ If the question is simple and doesn't require tools, answer directly. If tools a
         Yields:
             Stream responses with thinking steps and final result
         """
-        if not self.llm_client: 
-            yield {"thinking_step": None, "is_final": True, "result": "Error: Language model client not configured."}
-            return
-        
-        # 获取可用工具
-        if self.registry:
-            # 从全局注册表获取所有工具
-            raw_tools = self.registry.get_all_tools()
-            logger.info(f"Using {len(raw_tools)} tools from global registry")
-        else:
-            # 向后兼容：从单个客户端获取工具
-            raw_tools = await self.client.list_tools()
-            logger.info(f"Using {len(raw_tools)} tools from single client")
-        
-        available_tools = await self.process_tool_definitions(raw_tools)
-        
-        # Build system prompt
-        system_prompt = self._create_react_system_prompt(available_tools)
-        
-        # Initial message history
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query}
-        ]
-        
-        # ReAct loop
-        iterations = 0
-        while iterations < self.max_iterations:
-            iterations += 1
-            logger.info(f"Starting streaming ReAct iteration #{iterations}, processing query: '{query[:50]}...'")
-            
-            # Call LLM
-            try:
-                # Get model name
-                llm_config = self.config.get("llm_config")
-                if not llm_config or not llm_config.model:
-                    yield {"thinking_step": None, "is_final": True, "result": "Error: Language model name not configured."}
-                    return
-                    
-                model_name = llm_config.model
-                provider = llm_config.provider
-                
-                logger.debug(f"Sending streaming query to LLM ({provider}/{model_name}). Query: '{query[:50]}...'. Tools: {len(available_tools)}")
-                
-                # Create LLM request
-                response = self.llm_client.chat.completions.create(
-                    model=model_name,
-                    messages=messages,
-                    tools=available_tools if available_tools else None
-                )
-                
-                choice = response.choices[0]
-                message = choice.message
-                
-                # Record assistant response
-                assistant_response = message.content or ""
-                
-                # Generate thinking step ID
-                step_id = f"step-{uuid.uuid4()}"
-                
-                # Send as thinking step - start
+        tool_steps: Dict[str, Dict[str, Any]] = {}
+        async for event in self._react_engine(query, "step"):
+            if event.kind == "assistant":
+                # Send as thinking step - start, then complete
                 thinking_step = {
                     "type": "thinking",
-                    "content": assistant_response,
-                    "id": step_id,
+                    "content": event.data,
+                    "id": _new_id("step-"),
                     "status": "start"
                 }
                 yield {"thinking_step": thinking_step, "is_final": False}
-                
-                # Tool call needed
-                if choice.finish_reason == "tool_calls" and message.tool_calls:
-                    # Send as thinking step - complete
-                    thinking_step["status"] = "complete"
-                    yield {"thinking_step": thinking_step, "is_final": False}
-                    
-                    # Get tool call information
-                    tool_call = message.tool_calls[0]
-                    function_name = tool_call.function.name
-                    logger.info(f"LLM requested tool call: '{function_name}'")
-                    
-                    # Add assistant message to history
-                    messages.append({
-                        "role": "assistant",
-                        "content": None,
-                        "tool_calls": [{
-                            "id": tool_call.id,
-                            "type": "function",
-                            "function": {
-                                "name": function_name,
-                                "arguments": tool_call.function.arguments
-                            }
-                        }]
-                    })
-                    
-                    # Create tool call step ID
-                    tool_step_id = f"tool-{uuid.uuid4()}"
-                    
-                    # Parse tool parameters
-                    try:
-                        function_args = json.loads(tool_call.function.arguments)
-                    except json.JSONDecodeError as e:
-                        function_args = {"error": f"Unable to parse parameters: {e}"}
-                    
-                    # Send tool call step - start
-                    tool_step = {
-                        "type": "tool_call",
-                        "tool": function_name,
-                        "id": tool_step_id,
-                        "status": "start",
-                        "params": function_args  # Add parameters field
-                    }
-                    yield {"thinking_step": tool_step, "is_final": False}
-                    
-                    # Execute tool call
-                    try:
-                        # 使用注册表或客户端调用工具
-                        logger.info(f"Executing tool '{function_name}', parameters: {function_args}")
-                        result = await self._call_tool_with_registry(function_name, function_args)
-                        logger.info(f"Tool '{function_name}' returned result: {result}")
-                        
-                        # 处理工具返回结果
-                        tool_result = str(result)
-                    except Exception as e:
-                        tool_result = f"Error: An internal error occurred while calling tool '{function_name}': {str(e)}"
-                        logger.error(f"Tool call error: {e}", exc_info=True)
-                    
-                    # Send tool call step - complete
-                    tool_step["result"] = tool_result
-                    tool_step["status"] = "complete"
-                    yield {"thinking_step": tool_step, "is_final": False}
-                    
-                    # Add tool result to message history
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": tool_result
-                    })
-                    
-                    # Continue to next iteration
-                    continue
-                
-                # LLM provides final answer, update step status, then return result
-                logger.info(f"LLM provided final answer, ending streaming ReAct loop")
-                
-                # Send as thinking step - complete
                 thinking_step["status"] = "complete"
                 yield {"thinking_step": thinking_step, "is_final": False}
-                
-                # Send final result
-                result = message.content.strip() if message.content else ""
+            elif event.kind == "tool_start":
+                tool_call, function_args = event.data
+                # Send tool call step - start
+                tool_step = {
+                    "type": "tool_call",
+                    "tool": tool_call["function"]["name"],
+                    "id": _new_id("tool-"),
+                    "status": "start",
+                    "params": function_args  # Add parameters field
+                }
+                tool_steps[tool_call["id"]] = tool_step
+                yield {"thinking_step": tool_step, "is_final": False}
+            elif event.kind == "tool_progress":
+                tool_call, partial = event.data
+                # Send tool call step - partial output of a streaming tool
+                yield {"thinking_step": {**tool_steps[tool_call["id"]], "status": "progress", "partial": partial}, "is_final": False}
+            elif event.kind == "tool_result":
+                tool_call, _, tool_result = event.data
+                # Send tool call step - complete
+                tool_step = tool_steps.pop(tool_call["id"])
+                tool_step["result"] = tool_result
+                tool_step["status"] = "complete"
+                yield {"thinking_step": tool_step, "is_final": False}
+            elif event.kind == "final":
+                yield {"thinking_step": None, "is_final": True, "result": event.data[0]}
+                return
+            elif event.kind == "cached":
+                # Replay a cached answer as one completed thinking step plus the final result
+                result = event.data[0]
+                yield {"thinking_step": {"type": "thinking", "content": result, "id": _new_id("step-"), "status": "complete"}, "is_final": False}
                 yield {"thinking_step": None, "is_final": True, "result": result}
                 return
-                
-            except TypeError as e:
-                # Catch the specific TypeError seen before
-                error_msg = f"Type error during LLM call: {e}. Check SDK parameters for model '{model_name}'."
-                logger.error(error_msg, exc_info=True)
-                yield {"thinking_step": None, "is_final": True, "result": f"Error: Type error during language model call, please check SDK parameters. ({e})"}
+            elif event.kind == "fail":
+                yield {"thinking_step": None, "is_final": True, "result": event.data}
                 return
-            except Exception as e:
-                error_msg = f"Error during streaming ReAct process: {type(e).__name__}: {e}"
-                logger.error(error_msg, exc_info=True)
-                yield {"thinking_step": None, "is_final": True, "result": f"Error processing your request. ({error_msg})"}
+            elif event.kind == "error":
+                yield {"thinking_step": None, "is_final": True, "result": self._error_message(event.data, "streaming ReAct process")}
+                return
+            elif event.kind == "limit":
+                yield {"thinking_step": None, "is_final": True, "result": self._limit_message(event.data[0])}
                 return
-        
-        # Maximum iterations reached
-        logger.warning(f"Maximum ReAct iterations reached ({self.max_iterations})")
-        last_message = messages[-1].get("content", "") if messages else ""
-        result = f"Processing your request exceeded the maximum iteration limit ({self.max_iterations}). " + last_message
-        yield {"thinking_step": None, "is_final": True, "result": result} 
 
     async def stream_process_query_token(self, query: str) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -595,284 +1281,93 @@ If the question is simple and doesn't require tools, answer directly. If tools a
         Yields:
             Stream responses with token chunks
         """
-        if not self.llm_client: 
-            yield {"token_chunk": None, "is_final": True, "result": "Error: Language model client not configured."}
-            return
-        
-        # 获取可用工具
-        if self.registry:
-            # 从全局注册表获取所有工具
-            raw_tools = self.registry.get_all_tools()
-            logger.info(f"Using {len(raw_tools)} tools from global registry")
-        else:
-            # 向后兼容：从单个客户端获取工具
-            raw_tools = await self.client.list_tools()
-            logger.info(f"Using {len(raw_tools)} tools from single client")
-        
-        available_tools = await self.process_tool_definitions(raw_tools)
-        
-        # 构建系统提示
-        system_prompt = self._create_react_system_prompt(available_tools)
-        system_prompt += "\n\nWhen thinking, surround your thoughts with <think></think> tags."
-        
-        # 初始消息历史
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query}
-        ]
-        
-        # ReAct循环
-        iterations = 0
-        final_answer = ""
-        thinking_buffer = ""
+        # Answer and thinking text are kept as fragments and joined only when emitted
+        answer_parts: List[str] = []
+        thinking_parts: List[str] = []
         current_thinking_id = None
-        in_thinking_mode = False
+        splitter = _ThinkTagSplitter()
+        batcher = _TokenBatcher(self.TOKEN_BATCH_MAX_CHARS, self.TOKEN_BATCH_INTERVAL)
+        emit_thinking = self.emit_thinking
+        tool_step_ids: Dict[str, str] = {}
         
-        async def sync_to_async_iter(sync_iter):
-            loop = asyncio.get_event_loop()
-            it = iter(sync_iter)
-            while True:
-                try:
-                    chunk = await loop.run_in_executor(None, next, it)
-                except StopIteration:
-                    break
-                yield chunk
-        
-        while iterations < self.max_iterations:
-            iterations += 1
-            logger.info(f"Starting token streaming ReAct iteration #{iterations}, query: '{query[:50]}...'")
-            
-            try:
-                # 获取模型名
-                llm_config = self.config.get("llm_config")
-                if not llm_config or not llm_config.model:
-                    yield {"token_chunk": None, "is_final": True, "result": "Error: Language model name not configured."}
-                    return
-                    
-                model_name = llm_config.model
-                
-                # 创建流式LLM请求
-                stream = self.llm_client.chat.completions.create(
-                    model=model_name,
-                    messages=messages,
-                    tools=available_tools if available_tools else None,
-                    stream=True  # 启用流式输出
-                )
-                
-                content_buffer = ""
-                current_message = {"role": "assistant", "content": ""}
-                tool_calls = []
-                is_function_calling = False
-                
-                # 判断stream是否为异步可迭代对象
-                if hasattr(stream, "__aiter__"):
-                    chunk_iter = stream
-                    is_async = True
-                else:
-                    chunk_iter = sync_to_async_iter(stream)
-                    is_async = False
-                
-                # 用统一的异步for循环处理token
-                async for chunk in chunk_iter:
-                    # 处理tokens
-                    delta = chunk.choices[0].delta
-                    
-                    # 检查是否有新的内容
-                    if hasattr(delta, "content") and delta.content is not None:
-                        token = delta.content
-                        if token is None:
-                            logger.warning("Received None token from LLM stream, skipping.")
-                            continue
-                        content_buffer += token or ""
-                        current_message["content"] += token or ""
-                        
-                        # 检查思考模式标记
-                        if "<think>" in (token or "") and not in_thinking_mode:
-                            in_thinking_mode = True
-                            current_thinking_id = f"think-{uuid.uuid4()}"
-                            # 发送思考开始标记
-                            yield {
-                                "thinking_step": {
-                                    "type": "thinking",
-                                    "id": current_thinking_id,
-                                    "content": "",
-                                    "status": "start"
-                                },
-                                "is_final": False
-                            }
-                            thinking_buffer = ""
-                            continue
-                        
-                        if "</think>" in (token or "") and in_thinking_mode:
-                            in_thinking_mode = False
-                            # 发送思考结束标记
-                            yield {
-                                "thinking_step": {
-                                    "type": "thinking",
-                                    "id": current_thinking_id,
-                                    "content": thinking_buffer,
-                                    "status": "complete"
-                                },
-                                "is_final": False
-                            }
-                            current_thinking_id = None
-                            continue
-                        
-                        # 记录思考内容
-                        if in_thinking_mode:
-                            clean_token = (token or "").replace("<think>", "").replace("</think>", "")
-                            thinking_buffer += clean_token or ""
-                            # 发送思考内容token
-                            yield {
-                                "token_chunk": {
-                                    "type": "thinking",
-                                    "content": clean_token or "",
-                                    "thinking_id": current_thinking_id
-                                },
-                                "is_final": False
-                            }
-                        else:
-                            # 发送普通回答token
-                            clean_token = (token or "").replace("<think>", "").replace("</think>", "")
-                            if clean_token:
-                                final_answer += clean_token or ""
-                                yield {
-                                    "token_chunk": {
-                                        "type": "content",
-                                        "content": clean_token or ""
-                                    },
-                                    "is_final": False
-                                }
-                    
-                    # 检查工具调用
-                    if hasattr(delta, "tool_calls") and delta.tool_calls:
-                        is_function_calling = True
-                        
-                        for tool_call_delta in delta.tool_calls:
-                            tool_call_id = tool_call_delta.index
-                            
-                            # 确保工具调用列表有足够空间
-                            while len(tool_calls) <= tool_call_id:
-                                tool_calls.append({
-                                    "id": str(uuid.uuid4()),
-                                    "type": "function",
-                                    "function": {"name": "", "arguments": ""}
-                                })
-                            
-                            # 更新函数名
-                            if hasattr(tool_call_delta, "function") and hasattr(tool_call_delta.function, "name"):
-                                if tool_call_delta.function.name is not None:
-                                    tool_calls[tool_call_id]["function"]["name"] = tool_call_delta.function.name
-                                else:
-                                    logger.warning(f"Received None as tool_call function.name for tool_call_id={tool_call_id}, skipping assignment.")
-                            
-                            # 更新参数
-                            if hasattr(tool_call_delta, "function") and hasattr(tool_call_delta.function, "arguments"):
-                                tool_calls[tool_call_id]["function"]["arguments"] += tool_call_delta.function.arguments or ""
-                    
-                    # 检查是否完成
-                    if chunk.choices[0].finish_reason:
-                        break
-                
-                # 流完成，检查是否需要工具调用
-                # 过滤掉function.name为None的tool_call，避免400错误
-                valid_tool_calls = [tc for tc in tool_calls if tc["function"].get("name") is not None]
-                if is_function_calling and valid_tool_calls:
-                    # 更新消息历史添加工具调用
-                    messages.append({
-                        "role": "assistant",
-                        "content": None,
-                        "tool_calls": valid_tool_calls
-                    })
-                    
-                    # 处理所有工具调用
-                    for tool_call in valid_tool_calls:
-                        function_name = tool_call["function"]["name"]
-                        function_args_str = tool_call["function"]["arguments"]
-                        tool_call_id = tool_call["id"]
-                        
-                        # 发送工具调用开始标记
-                        tool_step_id = f"tool-{uuid.uuid4()}"
-                        
-                        try:
-                            # 解析参数
-                            function_args = json.loads(function_args_str)
-                        except json.JSONDecodeError as e:
-                            logger.error(f"JSON解析错误: {e}, 参数字符串: {function_args_str}")
-                            function_args = {}
-                        
-                        yield {
-                            "thinking_step": {
-                                "type": "tool_call",
-                                "tool": function_name,
-                                "id": tool_step_id,
-                                "params": function_args,
-                                "status": "start"
-                            },
-                            "is_final": False
-                        }
-                        
-                        # 执行工具调用
-                        try:
-                            # 使用注册表或客户端调用工具
-                            logger.info(f"Executing tool '{function_name}', parameters: {function_args}")
-                            result = await self._call_tool_with_registry(function_name, function_args)
-                            logger.info(f"Tool '{function_name}' returned result: {result}")
-                            
-                            # 处理工具返回结果
-                            tool_result = str(result)
-                        except Exception as e:
-                            tool_result = f"Error: An internal error occurred while calling tool '{function_name}': {str(e)}"
-                            logger.error(f"Tool call error: {e}", exc_info=True)
-                        
-                        # 发送工具调用完成标记
-                        yield {
-                            "thinking_step": {
-                                "type": "tool_call",
-                                "tool": function_name,
-                                "id": tool_step_id,
-                                "params": function_args,
-                                "result": tool_result,
-                                "status": "complete"
-                            },
-                            "is_final": False
-                        }
-                        
-                        # 添加工具结果到消息历史
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call_id,
-                            "content": tool_result
-                        })
-                    
-                    # 继续下一次迭代
+        def render(segments: List[Tuple[str, str]]):
+            """将分段结果转换为流式响应"""
+            nonlocal current_thinking_id
+            for kind, text in segments:
+                if kind == "content":
+                    # 普通回答token，合并后发送
+                    answer_parts.append(text)
+                    yield from batcher.add("content", text)
+                    continue
+                if not emit_thinking:
+                    # 不下发思考过程，思考内容仅被拆分丢弃
+                    continue
+                if kind == "thinking":
+                    # 思考内容token，合并后发送
+                    thinking_parts.append(text)
+                    yield from batcher.add("thinking", text, current_thinking_id)
                     continue
-                else:
-                    # 没有工具调用，更新历史记录
-                    messages.append(current_message)
-                    
-                    # 发送最终结果
-                    yield {
-                        "token_chunk": None,
-                        "is_final": True,
-                        "result": final_answer
-                    }
-                    return
                 
-            except Exception as e:
-                error_msg = f"Error during token streaming: {type(e).__name__}: {e}"
-                logger.error(error_msg, exc_info=True)
-                yield {
-                    "token_chunk": None,
-                    "is_final": True,
-                    "result": f"Error processing your request. ({error_msg})"
-                }
-                return
+                # 发送思考步骤前先下发已合并的token，保持顺序
+                pending = batcher.flush()
+                if pending is not None:
+                    yield pending
+                if kind == "open":
+                    current_thinking_id = _new_id("think-")
+                    thinking_parts.clear()
+                    # 发送思考开始标记
+                    yield _thinking_step_event(current_thinking_id, "", "start")
+                else:
+                    # 发送思考结束标记
+                    yield _thinking_step_event(current_thinking_id, "".join(thinking_parts), "complete")
+                    current_thinking_id = None
         
-        # 达到最大迭代次数
-        logger.warning(f"Maximum ReAct iterations reached ({self.max_iterations})")
-        yield {
-            "token_chunk": None,
-            "is_final": True,
-            "result": final_answer or f"Processing exceeded maximum iteration limit ({self.max_iterations})."
-        } 
+        async for event in self._react_engine(query, "token"):
+            if event.kind == "token":
+                # 按<think>标记拆分token，标记本身不会下发
+                for chunk in render(splitter.feed(event.data)):
+                    yield chunk
+            elif event.kind == "assistant":
+                # 本轮结束，下发被暂存的可能是标记开头的尾部字符以及已合并的token
+                for chunk in render(splitter.flush()):
+                    yield chunk
+                pending = batcher.flush()
+                if pending is not None:
+                    yield pending
+            elif event.kind == "tool_start":
+                tool_call, function_args = event.data
+                # 发送工具调用开始标记
+                tool_step_ids[tool_call["id"]] = tool_step_id = _new_id("tool-")
+                yield _tool_step_event(tool_call["function"]["name"], tool_step_id, function_args)
+            elif event.kind == "tool_progress":
+                tool_call, partial = event.data
+                # 发送流式工具的部分输出
+                yield _tool_progress_event(tool_call["function"]["name"], tool_step_ids[tool_call["id"]], partial)
+            elif event.kind == "tool_result":
+                tool_call, function_args, tool_result = event.data
+                # 发送工具调用完成标记
+                yield _tool_step_event(
+                    tool_call["function"]["name"], tool_step_ids.pop(tool_call["id"]), function_args, tool_result
+                )
+            elif event.kind == "final":
+                # 发送最终结果
+                yield _token_final_event("".join(answer_parts))
+                return
+            elif event.kind == "fail":
+                yield _token_final_event(event.data)
+                return
+            elif event.kind == "error":
+                error = event.data
+                pending = batcher.flush()
+                if pending is not None:
+                    yield pending
+                yield _token_final_event(
+                    f"Error processing your request. (Error during token streaming: {type(error).__name__}: {error})"
+                )
+                return
+            elif event.kind == "limit":
+                # 达到最大迭代次数
+                yield _token_final_event(
+                    "".join(answer_parts) or f"Processing exceeded maximum iteration limit ({self.max_iterations})."
+                )
+                return
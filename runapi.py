@@ -1,5 +1,8 @@
 from api.app import app
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run("runapi:app", host="0.0.0.0", port=18200, reload=True) 
+    # 限制单进程并发连接数，避免大量SSE流同时编码时事件循环失去响应（0或未设置表示不限制）
+    limit_concurrency = int(os.environ.get("API_LIMIT_CONCURRENCY", "0")) or None
+    uvicorn.run("runapi:app", host="0.0.0.0", port=18200, reload=True, limit_concurrency=limit_concurrency) 